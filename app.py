@@ -87,6 +87,11 @@ app.register_blueprint(observaciones_bp)
 app.register_blueprint(estadisticas_bp)
 app.register_blueprint(calendario_bp)
 
+# Cola de escritura diferida: el hilo de vaciado arranca con cada worker, no con el primer request,
+# para que los envíos pendientes de antes de un reinicio se guarden de inmediato
+from utils.cola_asistencia import obtener_cola
+obtener_cola(app)
+
 if __name__ == '__main__':
     try:
         with app.app_context():
@@ -0,0 +1,58 @@
+"""
+Script para archivar un año escolar cerrado de asistencia_estudiante
+Ejecutar: python archivar_asistencia.py <año>          (ej. 2024 archiva 2024-09-01 a 2025-08-31)
+          python archivar_asistencia.py --particiones [hasta_año]
+
+Las filas se copian a asistencia_estudiante_archivo y se eliminan de la tabla vigente
+(DROP PARTITION si el año tiene partición propia). El resumen diario no cambia.
+Los años se archivan del más antiguo al más reciente.
+"""
+
+import sys
+
+from app import app, db
+from models import AsistenciaEstudianteArchivo, ArchivoAsistencia
+from utils.archivo_asistencia import archivar_anio_escolar, asegurar_particiones, limite_archivo
+
+def archivar(anio):
+    """Crea las tablas del archivo si no existen y mueve el año escolar indicado"""
+    try:
+        with app.app_context():
+            print(f"🔄 Archivando año escolar {anio}-{anio + 1}...")
+
+            # Crear las tablas si no existen
+            AsistenciaEstudianteArchivo.__table__.create(db.engine, checkfirst=True)
+            ArchivoAsistencia.__table__.create(db.engine, checkfirst=True)
+
+            total = archivar_anio_escolar(anio)
+            db.session.commit()
+            limite_archivo(recargar=True)
+
+            print(f"✅ Registros archivados: {total}")
+
+    except Exception as e:
+        db.session.rollback()
+        print(f"❌ Error al archivar asistencia: {e}")
+        import traceback
+        traceback.print_exc()
+
+def crear_particiones(hasta_anio=None):
+    """Divide pmax para crear las particiones de los próximos años escolares"""
+    try:
+        with app.app_context():
+            creadas = asegurar_particiones(hasta_anio)
+            db.session.commit()
+            print(f"✅ Particiones creadas: {', '.join(creadas) if creadas else 'ninguna'}")
+
+    except Exception as e:
+        print(f"❌ Error al crear particiones: {e}")
+        import traceback
+        traceback.print_exc()
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print(__doc__)
+    elif sys.argv[1] == '--particiones':
+        crear_particiones(int(sys.argv[2]) if len(sys.argv) > 2 else None)
+    else:
+        archivar(int(sys.argv[1]))
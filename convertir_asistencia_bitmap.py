@@ -0,0 +1,38 @@
+"""
+Script para copiar asistencia_estudiante al almacenamiento compacto (asistencia_bitmap)
+Ejecutar: python convertir_asistencia_bitmap.py [fecha_inicio] [fecha_fin]
+
+No borra asistencia_estudiante. Después de convertir, definir ASISTENCIA_ALMACEN=bitmap
+y reiniciar la aplicación.
+"""
+
+import sys
+from datetime import datetime
+
+from app import app, db
+from models import AsistenciaBitmap, ObservacionAsistencia
+from utils.almacen_asistencia import convertir_a_bitmap
+
+def convertir(fecha_inicio=None, fecha_fin=None):
+    """Crea las tablas si no existen y convierte los registros del rango indicado"""
+    try:
+        with app.app_context():
+            print("🔄 Convirtiendo asistencia al almacenamiento compacto...")
+
+            # Crear las tablas si no existen
+            AsistenciaBitmap.__table__.create(db.engine, checkfirst=True)
+            ObservacionAsistencia.__table__.create(db.engine, checkfirst=True)
+
+            total = convertir_a_bitmap(fecha_inicio, fecha_fin)
+            db.session.commit()
+
+            print(f"✅ Registros convertidos: {total} ({AsistenciaBitmap.query.count()} filas compactas)")
+
+    except Exception as e:
+        print(f"❌ Error al convertir asistencia: {e}")
+        import traceback
+        traceback.print_exc()
+
+if __name__ == '__main__':
+    fechas = [datetime.strptime(arg, '%Y-%m-%d').date() for arg in sys.argv[1:3]]
+    convertir(*fechas)
@@ -0,0 +1,36 @@
+-- =====================================================
+-- Migración: Índices de cobertura para estadísticas y logs
+-- Descripción: Índices compuestos según las consultas sobre asistencia_estudiante:
+--   - idx_asistencia_fecha_cobertura (fecha, bloque, id_estudiante, presente, id_usuario)
+--     Rango de fechas (+ bloque): 'Dia Completo' de /admin/estadisticas, /api/logs_asistencia,
+--     reporte de ausentismo y reconstrucción del resumen.
+--   - idx_asistencia_estudiante_cobertura (id_estudiante, fecha, bloque, presente, id_usuario)
+--     Consultas que parten de estudiante (por sección): estadísticas por sección y el
+--     reporte de ausentismo filtrado por etapa/sección.
+--   Ambos incluyen todas las columnas leídas (la clave primaria va implícita en InnoDB),
+--   así que las consultas se resuelven solo con el índice ("Using index").
+--   Se eliminan los índices que quedan cubiertos por prefijo.
+-- Verificación: python verificar_indices.py [fecha_inicio] [fecha_fin]
+-- Fecha: 2026-10-17
+-- =====================================================
+
+USE control_asistencias;
+
+ALTER TABLE asistencia_estudiante
+    ADD INDEX idx_asistencia_fecha_cobertura (fecha, bloque, id_estudiante, presente, id_usuario),
+    ADD INDEX idx_asistencia_estudiante_cobertura (id_estudiante, fecha, bloque, presente, id_usuario);
+
+-- Redundantes: prefijos de idx_asistencia_fecha_cobertura o sin uso (presente solo tiene dos valores)
+ALTER TABLE asistencia_estudiante
+    DROP INDEX IF EXISTS idx_fecha,
+    DROP INDEX IF EXISTS idx_fecha_presente,
+    DROP INDEX IF EXISTS idx_presente,
+    DROP INDEX IF EXISTS ix_asistencia_estudiante_fecha;
+
+-- Archivo de años escolares (migrations/partition_asistencia_estudiante.sql): mismo patrón
+-- de rango de fechas cuando una consulta alcanza un año archivado
+ALTER TABLE IF EXISTS asistencia_estudiante_archivo
+    ADD INDEX idx_archivo_fecha_cobertura (fecha, bloque, id_estudiante, presente, id_usuario),
+    DROP INDEX IF EXISTS idx_archivo_fecha;
+
+ANALYZE TABLE asistencia_estudiante;
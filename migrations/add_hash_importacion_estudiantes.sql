@@ -0,0 +1,14 @@
+-- =====================================================
+-- Migración: Hash de contenido en importacion_estudiantes
+-- Descripción: Los archivos subidos se guardan en data_estudiantes_akademia/ con el
+--              prefijo de su SHA-256: una copia idéntica reutiliza el archivo guardado y,
+--              si ya se está importando, la importación en curso.
+-- Fecha: 2026-10-17
+-- =====================================================
+
+USE control_asistencias;
+
+ALTER TABLE importacion_estudiantes
+    ADD COLUMN IF NOT EXISTS hash_contenido VARCHAR(64) NULL
+        COMMENT 'SHA-256 del archivo; las copias idénticas comparten ruta' AFTER ruta,
+    ADD INDEX IF NOT EXISTS idx_importacion_hash (hash_contenido, estado);
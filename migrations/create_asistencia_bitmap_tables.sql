@@ -0,0 +1,50 @@
+-- =====================================================
+-- Migración: Crear tablas asistencia_bitmap y observacion_asistencia
+-- Descripción: Almacenamiento compacto de asistencia (ASISTENCIA_ALMACEN=bitmap).
+--              Una fila por (sección, fecha, bloque) con mapas de bits de registrados
+--              y presentes; el bit i corresponde al estudiante base_estudiante + i.
+--              Las observaciones por estudiante no vacías van en observacion_asistencia.
+-- Fecha: 2026-10-17
+-- =====================================================
+
+USE control_asistencias;
+
+CREATE TABLE IF NOT EXISTS asistencia_bitmap (
+    id_bitmap INT AUTO_INCREMENT PRIMARY KEY,
+    id_seccion INT NOT NULL COMMENT 'Sección de los estudiantes al registrar',
+    fecha DATE NOT NULL,
+    bloque ENUM('completo', 'bloque_1', 'bloque_2', 'bloque_3', 'bloque_4') NOT NULL DEFAULT 'completo',
+    base_estudiante INT NOT NULL COMMENT 'id_estudiante del bit 0',
+    registrados BLOB NOT NULL COMMENT 'Mapa de bits de estudiantes con registro',
+    presentes BLOB NOT NULL COMMENT 'Mapa de bits de estudiantes presentes',
+    total_registros INT NOT NULL DEFAULT 0,
+    total_presentes INT NOT NULL DEFAULT 0,
+    id_usuario INT NULL COMMENT 'Último usuario que registró',
+    fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT unique_asistencia_bitmap UNIQUE (id_seccion, fecha, bloque),
+    CONSTRAINT fk_bitmap_seccion FOREIGN KEY (id_seccion)
+        REFERENCES seccion(id_seccion) ON DELETE CASCADE,
+    CONSTRAINT fk_bitmap_usuario FOREIGN KEY (id_usuario)
+        REFERENCES usuario(id_usuario) ON DELETE SET NULL,
+
+    INDEX idx_bitmap_fecha_bloque (fecha, bloque)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+COMMENT='Asistencia compacta por sección, fecha y bloque';
+
+CREATE TABLE IF NOT EXISTS observacion_asistencia (
+    id_observacion_asistencia INT AUTO_INCREMENT PRIMARY KEY,
+    id_estudiante INT NOT NULL,
+    fecha DATE NOT NULL,
+    bloque ENUM('completo', 'bloque_1', 'bloque_2', 'bloque_3', 'bloque_4') NOT NULL DEFAULT 'completo',
+    observaciones TEXT NOT NULL,
+
+    CONSTRAINT unique_observacion_asistencia UNIQUE (id_estudiante, fecha, bloque),
+    CONSTRAINT fk_observacion_asistencia_estudiante FOREIGN KEY (id_estudiante)
+        REFERENCES estudiante(id_estudiante) ON DELETE CASCADE,
+
+    INDEX idx_observacion_asistencia_fecha (fecha, bloque)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+COMMENT='Observaciones por estudiante del almacenamiento compacto';
+
+-- Los datos existentes se copian con: python convertir_asistencia_bitmap.py
@@ -0,0 +1,29 @@
+-- =====================================================
+-- Migración: Crear tabla importacion_estudiantes
+-- Descripción: Importaciones de estudiantes en segundo plano. /api/estudiantes/cargar-excel
+--              registra la importación y responde 202; un hilo la procesa por bloques y
+--              actualiza el progreso, que se consulta en /api/estudiantes/import/<id>.
+-- Fecha: 2026-10-17
+-- =====================================================
+
+USE control_asistencias;
+
+CREATE TABLE IF NOT EXISTS importacion_estudiantes (
+    id_importacion VARCHAR(32) PRIMARY KEY,
+    archivo VARCHAR(255) NOT NULL COMMENT 'Nombre del archivo subido',
+    ruta VARCHAR(500) NOT NULL,
+    sobrescribir BOOLEAN NOT NULL DEFAULT FALSE,
+    id_usuario INT NULL COMMENT 'Usuario que subió el archivo',
+    estado ENUM('pendiente', 'procesando', 'completada', 'error', 'cancelada') NOT NULL DEFAULT 'pendiente',
+    filas_leidas INT NOT NULL DEFAULT 0,
+    cancelar BOOLEAN NOT NULL DEFAULT FALSE COMMENT 'Cancelación solicitada; se detiene al terminar el bloque actual',
+    resultado MEDIUMTEXT NULL COMMENT 'Reporte final en JSON',
+    fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+
+    CONSTRAINT fk_importacion_usuario FOREIGN KEY (id_usuario)
+        REFERENCES usuario(id_usuario) ON DELETE SET NULL,
+
+    INDEX idx_importacion_estado (estado, fecha_creacion)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+COMMENT='Importaciones de estudiantes en segundo plano';
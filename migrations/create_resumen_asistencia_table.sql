@@ -0,0 +1,43 @@
+-- =====================================================
+-- Migración: Crear tabla resumen_asistencia
+-- Descripción: Resumen diario pre-agregado por (fecha, sección, bloque, género)
+--              que alimenta /admin/estadisticas. bloque='todos' agrega el día completo.
+-- Fecha: 2026-10-17
+-- =====================================================
+
+USE control_asistencias;
+
+CREATE TABLE IF NOT EXISTS resumen_asistencia (
+    id_resumen INT AUTO_INCREMENT PRIMARY KEY,
+    fecha DATE NOT NULL,
+    id_seccion INT NOT NULL,
+    bloque ENUM('todos', 'completo', 'bloque_1', 'bloque_2', 'bloque_3', 'bloque_4') NOT NULL COMMENT 'todos=agregado de todos los bloques del día',
+    genero ENUM('M', 'F') NOT NULL,
+    registros INT NOT NULL DEFAULT 0 COMMENT 'Registros de asistencia',
+    presentes INT NOT NULL DEFAULT 0 COMMENT 'Registros con presente=TRUE',
+    estudiantes INT NOT NULL DEFAULT 0 COMMENT 'Estudiantes distintos con registro',
+
+    CONSTRAINT unique_resumen_asistencia UNIQUE (fecha, id_seccion, bloque, genero),
+    CONSTRAINT fk_resumen_seccion FOREIGN KEY (id_seccion)
+        REFERENCES seccion(id_seccion) ON DELETE CASCADE,
+
+    INDEX idx_resumen_bloque_fecha (bloque, fecha)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+COMMENT='Resumen diario de asistencia por sección, bloque y género';
+
+-- Carga inicial desde asistencia_estudiante (solo estudiantes activos, sección actual)
+INSERT INTO resumen_asistencia (fecha, id_seccion, bloque, genero, registros, presentes, estudiantes)
+SELECT a.fecha, e.id_seccion, a.bloque, e.genero,
+       COUNT(*), SUM(a.presente = TRUE), COUNT(DISTINCT a.id_estudiante)
+FROM asistencia_estudiante a
+JOIN estudiante e ON e.id_estudiante = a.id_estudiante
+WHERE e.activo = TRUE
+GROUP BY a.fecha, e.id_seccion, a.bloque, e.genero;
+
+INSERT INTO resumen_asistencia (fecha, id_seccion, bloque, genero, registros, presentes, estudiantes)
+SELECT a.fecha, e.id_seccion, 'todos', e.genero,
+       COUNT(*), SUM(a.presente = TRUE), COUNT(DISTINCT a.id_estudiante)
+FROM asistencia_estudiante a
+JOIN estudiante e ON e.id_estudiante = a.id_estudiante
+WHERE e.activo = TRUE
+GROUP BY a.fecha, e.id_seccion, e.genero;
@@ -0,0 +1,71 @@
+-- =====================================================
+-- Migración: Particionar asistencia_estudiante por año escolar y crear el archivo
+-- Descripción: asistencia_estudiante se particiona por RANGE COLUMNS(fecha), una
+--              partición por año escolar (1 de septiembre a 31 de agosto), para que las
+--              consultas por rango de fechas lean solo las particiones necesarias.
+--              Los años cerrados se mueven a asistencia_estudiante_archivo
+--              (ROW_FORMAT=COMPRESSED) con: python archivar_asistencia.py <año>
+-- Fecha: 2026-10-17
+-- =====================================================
+
+USE control_asistencias;
+
+-- 1. Las tablas particionadas de InnoDB no admiten claves foráneas.
+--    Verificar los nombres con SHOW CREATE TABLE asistencia_estudiante;
+--    (los estudiantes se desactivan, no se eliminan, por lo que el CASCADE no se usa)
+ALTER TABLE asistencia_estudiante
+    DROP FOREIGN KEY fk_asistest_estudiante,
+    DROP FOREIGN KEY fk_asistest_usuario;
+
+-- 2. La columna de partición debe formar parte de la clave primaria y de las únicas
+--    (unique_asistencia_estudiante_bloque ya incluye fecha)
+ALTER TABLE asistencia_estudiante
+    DROP PRIMARY KEY,
+    ADD PRIMARY KEY (id_asistencia_estudiante, fecha);
+
+-- 3. Una partición por año escolar; pmax recibe los años siguientes hasta que
+--    archivar_asistencia.py --particiones la divida
+ALTER TABLE asistencia_estudiante
+PARTITION BY RANGE COLUMNS(fecha) (
+    PARTITION p2023 VALUES LESS THAN ('2024-09-01'),
+    PARTITION p2024 VALUES LESS THAN ('2025-09-01'),
+    PARTITION p2025 VALUES LESS THAN ('2026-09-01'),
+    PARTITION p2026 VALUES LESS THAN ('2027-09-01'),
+    PARTITION pmax VALUES LESS THAN (MAXVALUE)
+);
+
+-- 4. Archivo de años escolares cerrados (mismas columnas, filas comprimidas)
+CREATE TABLE IF NOT EXISTS asistencia_estudiante_archivo (
+    id_asistencia_estudiante INT NOT NULL PRIMARY KEY,
+    id_estudiante INT NOT NULL,
+    fecha DATE NOT NULL,
+    bloque ENUM('completo', 'bloque_1', 'bloque_2', 'bloque_3', 'bloque_4') NOT NULL DEFAULT 'completo',
+    presente BOOLEAN NOT NULL DEFAULT FALSE,
+    observaciones TEXT NULL,
+    id_usuario INT NULL,
+    fecha_registro TIMESTAMP NULL,
+
+    CONSTRAINT unique_asistencia_archivo_bloque UNIQUE (id_estudiante, fecha, bloque),
+    CONSTRAINT fk_archivo_estudiante FOREIGN KEY (id_estudiante)
+        REFERENCES estudiante(id_estudiante) ON DELETE CASCADE,
+    CONSTRAINT fk_archivo_usuario FOREIGN KEY (id_usuario)
+        REFERENCES usuario(id_usuario) ON DELETE SET NULL,
+
+    INDEX idx_archivo_fecha (fecha)
+) ENGINE=InnoDB ROW_FORMAT=COMPRESSED DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+COMMENT='Asistencia de años escolares archivados';
+
+-- 5. Registro de años archivados; las consultas unen el archivo solo si el rango
+--    pedido llega hasta la última fecha_fin registrada
+CREATE TABLE IF NOT EXISTS archivo_asistencia (
+    id_archivo INT AUTO_INCREMENT PRIMARY KEY,
+    anio_escolar INT NOT NULL UNIQUE COMMENT 'Año de inicio del año escolar (2024 = 2024-2025)',
+    fecha_inicio DATE NOT NULL,
+    fecha_fin DATE NOT NULL,
+    registros INT NOT NULL DEFAULT 0,
+    fecha_archivado TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+COMMENT='Años escolares movidos a asistencia_estudiante_archivo';
+
+-- Verificar la poda de particiones:
+-- EXPLAIN PARTITIONS SELECT COUNT(*) FROM asistencia_estudiante WHERE fecha BETWEEN '2026-09-01' AND '2026-09-30';
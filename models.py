@@ -153,13 +153,39 @@ class Estudiante(db.Model):
     def __repr__(self):
         return f'<Estudiante {self.cedula} - {self.nombre} {self.apellido}>'
 
+# Importaciones de estudiantes en segundo plano (ver utils/importacion_estudiantes.py)
+# La tabla es compartida por los workers: cualquiera responde el estado de una importación
+class ImportacionEstudiantes(db.Model):
+    __tablename__ = 'importacion_estudiantes'
+
+    id_importacion = db.Column(db.String(32), primary_key=True)
+    archivo = db.Column(db.String(255), nullable=False, comment='Nombre del archivo subido')
+    ruta = db.Column(db.String(500), nullable=False)
+    hash_contenido = db.Column(db.String(64), nullable=True, comment='SHA-256 del archivo; las copias idénticas comparten ruta')
+    sobrescribir = db.Column(db.Boolean, nullable=False, default=False)
+    id_usuario = db.Column(db.Integer, db.ForeignKey('usuario.id_usuario', ondelete='SET NULL'), nullable=True, comment='Usuario que subió el archivo')
+    estado = db.Column(db.Enum('pendiente', 'procesando', 'completada', 'error', 'cancelada'), nullable=False, default='pendiente')
+    filas_leidas = db.Column(db.Integer, nullable=False, default=0)
+    cancelar = db.Column(db.Boolean, nullable=False, default=False, comment='Cancelación solicitada; se detiene al terminar el bloque actual')
+    resultado = db.Column(db.Text(16777215), nullable=True, comment='Reporte final en JSON')
+    fecha_creacion = db.Column(db.TIMESTAMP, default=datetime.utcnow)
+    fecha_actualizacion = db.Column(db.TIMESTAMP, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('idx_importacion_estado', 'estado', 'fecha_creacion'),
+        db.Index('idx_importacion_hash', 'hash_contenido', 'estado'),
+    )
+
+    def __repr__(self):
+        return f'<ImportacionEstudiantes {self.id_importacion} - {self.estado}>'
+
 # Modelo para asistencia individual por estudiante (V2)
 class AsistenciaEstudiante(db.Model):
     __tablename__ = 'asistencia_estudiante'
 
     id_asistencia_estudiante = db.Column(db.Integer, primary_key=True)
     id_estudiante = db.Column(db.Integer, db.ForeignKey('estudiante.id_estudiante', ondelete='CASCADE'), nullable=False)
-    fecha = db.Column(db.Date, nullable=False, index=True)
+    fecha = db.Column(db.Date, nullable=False)
     bloque = db.Column(db.Enum('completo', 'bloque_1', 'bloque_2', 'bloque_3', 'bloque_4'), nullable=False, default='completo', comment='Bloque de clase: completo=todo el dia')
     presente = db.Column(db.Boolean, default=False, nullable=False, comment='TRUE=Presente, FALSE=Ausente')
     observaciones = db.Column(db.Text, nullable=True, comment='Observaciones opcionales')
@@ -167,9 +193,12 @@ class AsistenciaEstudiante(db.Model):
     fecha_registro = db.Column(db.TIMESTAMP, default=datetime.utcnow)
 
     # Constraint único: un estudiante solo puede tener una asistencia por fecha y bloque
+    # Índices de cobertura para estadísticas y logs (ver migrations/add_covering_indexes_asistencia.sql):
+    # por rango de fechas y por estudiante, sin leer las filas
     __table_args__ = (
         db.UniqueConstraint('id_estudiante', 'fecha', 'bloque', name='unique_asistencia_estudiante_bloque'),
-        db.Index('idx_fecha_presente', 'fecha', 'presente')
+        db.Index('idx_asistencia_fecha_cobertura', 'fecha', 'bloque', 'id_estudiante', 'presente', 'id_usuario'),
+        db.Index('idx_asistencia_estudiante_cobertura', 'id_estudiante', 'fecha', 'bloque', 'presente', 'id_usuario')
     )
 
     @property
@@ -180,6 +209,110 @@ class AsistenciaEstudiante(db.Model):
         estado = "Presente" if self.presente else "Ausente"
         return f'<AsistenciaEstudiante {self.fecha} - Estudiante:{self.id_estudiante} - {estado}>'
 
+# Resumen diario pre-agregado de asistencia (alimenta /admin/estadisticas)
+# Una fila por (fecha, sección, bloque, género). bloque='todos' agrega el día completo
+# sin distinguir bloques; sólo cuenta estudiantes activos según su sección actual.
+class ResumenAsistencia(db.Model):
+    __tablename__ = 'resumen_asistencia'
+
+    id_resumen = db.Column(db.Integer, primary_key=True)
+    fecha = db.Column(db.Date, nullable=False)
+    id_seccion = db.Column(db.Integer, db.ForeignKey('seccion.id_seccion', ondelete='CASCADE'), nullable=False)
+    bloque = db.Column(db.Enum('todos', 'completo', 'bloque_1', 'bloque_2', 'bloque_3', 'bloque_4'), nullable=False, comment='todos=agregado de todos los bloques del día')
+    genero = db.Column(db.Enum('M', 'F'), nullable=False)
+    registros = db.Column(db.Integer, nullable=False, default=0, comment='Registros de asistencia')
+    presentes = db.Column(db.Integer, nullable=False, default=0, comment='Registros con presente=TRUE')
+    estudiantes = db.Column(db.Integer, nullable=False, default=0, comment='Estudiantes distintos con registro')
+
+    __table_args__ = (
+        db.UniqueConstraint('fecha', 'id_seccion', 'bloque', 'genero', name='unique_resumen_asistencia'),
+        db.Index('idx_resumen_bloque_fecha', 'bloque', 'fecha')
+    )
+
+    def __repr__(self):
+        return f'<ResumenAsistencia {self.fecha} - Sección:{self.id_seccion} - {self.bloque} - {self.genero}>'
+
+# Archivo de años escolares cerrados de asistencia_estudiante (mismas columnas, tabla comprimida)
+# Ver utils/archivo_asistencia.py y archivar_asistencia.py
+class AsistenciaEstudianteArchivo(db.Model):
+    __tablename__ = 'asistencia_estudiante_archivo'
+
+    id_asistencia_estudiante = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    id_estudiante = db.Column(db.Integer, db.ForeignKey('estudiante.id_estudiante', ondelete='CASCADE'), nullable=False)
+    fecha = db.Column(db.Date, nullable=False)
+    bloque = db.Column(db.Enum('completo', 'bloque_1', 'bloque_2', 'bloque_3', 'bloque_4'), nullable=False, default='completo')
+    presente = db.Column(db.Boolean, default=False, nullable=False)
+    observaciones = db.Column(db.Text, nullable=True)
+    id_usuario = db.Column(db.Integer, db.ForeignKey('usuario.id_usuario', ondelete='SET NULL'), nullable=True)
+    fecha_registro = db.Column(db.TIMESTAMP, nullable=True)
+
+    __table_args__ = (
+        db.UniqueConstraint('id_estudiante', 'fecha', 'bloque', name='unique_asistencia_archivo_bloque'),
+        db.Index('idx_archivo_fecha_cobertura', 'fecha', 'bloque', 'id_estudiante', 'presente', 'id_usuario'),
+        {'mysql_row_format': 'COMPRESSED'}
+    )
+
+    def __repr__(self):
+        return f'<AsistenciaEstudianteArchivo {self.fecha} - Estudiante:{self.id_estudiante}>'
+
+# Registro de años escolares archivados
+class ArchivoAsistencia(db.Model):
+    __tablename__ = 'archivo_asistencia'
+
+    id_archivo = db.Column(db.Integer, primary_key=True)
+    anio_escolar = db.Column(db.Integer, unique=True, nullable=False, comment='Año de inicio del año escolar (2024 = 2024-2025)')
+    fecha_inicio = db.Column(db.Date, nullable=False)
+    fecha_fin = db.Column(db.Date, nullable=False)
+    registros = db.Column(db.Integer, nullable=False, default=0)
+    fecha_archivado = db.Column(db.TIMESTAMP, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ArchivoAsistencia {self.anio_escolar}-{self.anio_escolar + 1}>'
+
+# Almacenamiento compacto de asistencia (ASISTENCIA_ALMACEN=bitmap)
+# Una fila por (sección, fecha, bloque); el bit i de cada mapa corresponde al estudiante
+# base_estudiante + i. Ver utils/almacen_asistencia.py
+class AsistenciaBitmap(db.Model):
+    __tablename__ = 'asistencia_bitmap'
+
+    id_bitmap = db.Column(db.Integer, primary_key=True)
+    id_seccion = db.Column(db.Integer, db.ForeignKey('seccion.id_seccion', ondelete='CASCADE'), nullable=False, comment='Sección de los estudiantes al registrar')
+    fecha = db.Column(db.Date, nullable=False)
+    bloque = db.Column(db.Enum('completo', 'bloque_1', 'bloque_2', 'bloque_3', 'bloque_4'), nullable=False, default='completo')
+    base_estudiante = db.Column(db.Integer, nullable=False, comment='id_estudiante del bit 0')
+    registrados = db.Column(db.LargeBinary, nullable=False, comment='Mapa de bits de estudiantes con registro')
+    presentes = db.Column(db.LargeBinary, nullable=False, comment='Mapa de bits de estudiantes presentes')
+    total_registros = db.Column(db.Integer, nullable=False, default=0)
+    total_presentes = db.Column(db.Integer, nullable=False, default=0)
+    id_usuario = db.Column(db.Integer, db.ForeignKey('usuario.id_usuario', ondelete='SET NULL'), nullable=True, comment='Último usuario que registró')
+    fecha_registro = db.Column(db.TIMESTAMP, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('id_seccion', 'fecha', 'bloque', name='unique_asistencia_bitmap'),
+        db.Index('idx_bitmap_fecha_bloque', 'fecha', 'bloque')
+    )
+
+    def __repr__(self):
+        return f'<AsistenciaBitmap {self.fecha} - Sección:{self.id_seccion} - {self.bloque}>'
+
+# Observaciones por estudiante del modo bitmap (solo se guardan las no vacías)
+class ObservacionAsistencia(db.Model):
+    __tablename__ = 'observacion_asistencia'
+
+    id_observacion_asistencia = db.Column(db.Integer, primary_key=True)
+    id_estudiante = db.Column(db.Integer, db.ForeignKey('estudiante.id_estudiante', ondelete='CASCADE'), nullable=False)
+    fecha = db.Column(db.Date, nullable=False)
+    bloque = db.Column(db.Enum('completo', 'bloque_1', 'bloque_2', 'bloque_3', 'bloque_4'), nullable=False, default='completo')
+    observaciones = db.Column(db.Text, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('id_estudiante', 'fecha', 'bloque', name='unique_observacion_asistencia'),
+        db.Index('idx_observacion_asistencia_fecha', 'fecha', 'bloque')
+    )
+
+    def __repr__(self):
+        return f'<ObservacionAsistencia {self.fecha} - Estudiante:{self.id_estudiante} - {self.bloque}>'
+
 # Modelo para observaciones generales de sección (V2 - FK a seccion)
 class ObservacionSeccion(db.Model):
     __tablename__ = 'observacion_seccion'
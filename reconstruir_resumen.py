@@ -0,0 +1,34 @@
+"""
+Script para crear y reconstruir la tabla resumen_asistencia desde asistencia_estudiante
+Ejecutar: python reconstruir_resumen.py [fecha_inicio] [fecha_fin]
+"""
+
+import sys
+from datetime import datetime
+
+from app import app, db
+from models import ResumenAsistencia
+from utils.resumen_asistencia import reconstruir_resumen
+
+def reconstruir(fecha_inicio=None, fecha_fin=None):
+    """Crea la tabla si no existe y recalcula el resumen en el rango indicado"""
+    try:
+        with app.app_context():
+            print("🔄 Reconstruyendo resumen diario de asistencia...")
+
+            # Crear la tabla si no existe
+            ResumenAsistencia.__table__.create(db.engine, checkfirst=True)
+
+            total = reconstruir_resumen(fecha_inicio, fecha_fin)
+            db.session.commit()
+
+            print(f"✅ Resumen reconstruido: {total} filas")
+
+    except Exception as e:
+        print(f"❌ Error al reconstruir resumen: {e}")
+        import traceback
+        traceback.print_exc()
+
+if __name__ == '__main__':
+    fechas = [datetime.strptime(arg, '%Y-%m-%d').date() for arg in sys.argv[1:3]]
+    reconstruir(*fechas)
@@ -1,10 +1,16 @@
 from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash, session, abort
 from datetime import datetime, timedelta
-from sqlalchemy import func, and_, extract
+from collections import namedtuple, defaultdict
+from sqlalchemy import func, and_, case, extract
 from flask_login import login_user, logout_user, login_required, current_user
 from functools import wraps
+import hashlib
 from models import db, Etapa, Grado, Usuario, Seccion, ProfesorSeccion, Matricula, Asistencia, Calendario, Estudiante, AsistenciaEstudiante, SeccionLegacy
 from app import bcrypt
+from utils.estructura_escolar import obtener_estructura, recargar_estructura
+from utils.idempotencia import idempotente
+from utils.almacen_asistencia import modo_bitmap, leer_marcas
+from utils.archivo_asistencia import asistencia_para_rango
 
 # Decorador para verificar roles
 def admin_required(f):
@@ -50,41 +56,45 @@ def index():
 @login_required
 def obtener_secciones():
     """API para obtener lista de secciones con su matrícula"""
+    estructura = obtener_estructura()
+
     # Si es administrador, mostrar todas las secciones
     if current_user.is_admin:
-        secciones = db.session.query(Seccion, Grado, Etapa, Matricula).select_from(Seccion).join(
-            Grado, Seccion.id_grado == Grado.id_grado
-        ).join(
-            Etapa, Grado.id_etapa == Etapa.id_etapa
-        ).outerjoin(
-            Matricula, Seccion.id_seccion == Matricula.id_seccion
-        ).all()
+        ids_secciones = list(estructura.secciones)
     else:
         # Si es profesor, solo mostrar sus secciones asignadas
-        secciones = db.session.query(Seccion, Grado, Etapa, Matricula).select_from(Seccion).join(
-            Grado, Seccion.id_grado == Grado.id_grado
-        ).join(
-            Etapa, Grado.id_etapa == Etapa.id_etapa
-        ).outerjoin(
-            Matricula, Seccion.id_seccion == Matricula.id_seccion
-        ).join(
-            ProfesorSeccion, Seccion.id_seccion == ProfesorSeccion.id_seccion
-        ).filter(
+        ids_secciones = [a.id_seccion for a in db.session.query(ProfesorSeccion.id_seccion).filter(
             ProfesorSeccion.id_profesor == current_user.id_usuario
-        ).all()
+        ).all()]
+        estructura = obtener_estructura(requeridas=ids_secciones)
+
+    # Nombres desde el índice de estructura; solo la matrícula se consulta
+    matriculas = {}
+    if ids_secciones:
+        for m in Matricula.query.filter(Matricula.id_seccion.in_(ids_secciones)).all():
+            matriculas.setdefault(m.id_seccion, []).append(m)
+
+    resultado = []
+    for id_seccion in ids_secciones:
+        info = estructura.get(id_seccion)
+        if not info:
+            continue
+        for m in matriculas.get(id_seccion, [None]):
+            resultado.append({
+                'id_seccion': info.id_seccion,
+                'nombre_seccion': info.nombre_completo,
+                'etapa': info.nombre_etapa,
+                'seccion': info.nombre_seccion,
+                'grado': info.nombre_grado,
+                'matricula_h': m.num_estudiantes_h if m else 0,
+                'matricula_m': m.num_estudiantes_m if m else 0,
+                'total_matricula': (m.num_estudiantes_h + m.num_estudiantes_m) if m else 0
+            })
 
-    return jsonify([{
-        'id_seccion': s.Seccion.id_seccion,
-        'nombre_seccion': f"{s.Etapa.nombre_etapa} - {s.Grado.nombre_grado} {s.Seccion.nombre_seccion}",
-        'etapa': s.Etapa.nombre_etapa,
-        'seccion': s.Seccion.nombre_seccion,
-        'grado': s.Grado.nombre_grado,
-        'matricula_h': s.Matricula.num_estudiantes_h if s.Matricula else 0,
-        'matricula_m': s.Matricula.num_estudiantes_m if s.Matricula else 0,
-        'total_matricula': (s.Matricula.num_estudiantes_h + s.Matricula.num_estudiantes_m) if s.Matricula else 0
-    } for s in secciones])
+    return jsonify(resultado)
 
 @main_bp.route('/guardar_asistencia', methods=['POST'])
+@idempotente
 @login_required
 def guardar_asistencia():
     """API para guardar asistencias diarias por sección"""
@@ -223,6 +233,50 @@ def logs_asistencia():
     """Vista de logs de asistencia - Solo administradores"""
     return render_template('logs_asistencia.html')
 
+def _logs_asistencia_filas(fecha_inicio, fecha_fin):
+    """Asistencias agrupadas por fecha, sección y usuario que registró"""
+    asistencia = asistencia_para_rango(fecha_inicio, fecha_fin)
+    query = db.session.query(
+        asistencia.fecha,
+        Estudiante.id_seccion,
+        asistencia.id_usuario,
+        func.sum(case((and_(asistencia.presente == True, Estudiante.genero == 'M'), 1), else_=0)).label('asistentes_h'),
+        func.sum(case((and_(asistencia.presente == True, Estudiante.genero == 'F'), 1), else_=0)).label('asistentes_m')
+    ).join(
+        Estudiante, asistencia.id_estudiante == Estudiante.id_estudiante
+    ).group_by(
+        asistencia.fecha,
+        Estudiante.id_seccion,
+        asistencia.id_usuario
+    ).order_by(asistencia.fecha.desc())
+    
+    # Aplicar filtros de fecha si se proporcionan
+    if fecha_inicio:
+        query = query.filter(asistencia.fecha >= fecha_inicio)
+    if fecha_fin:
+        query = query.filter(asistencia.fecha <= fecha_fin)
+    
+    return query.all()
+
+LogAsistencia = namedtuple('LogAsistencia', ['fecha', 'id_seccion', 'id_usuario', 'asistentes_h', 'asistentes_m'])
+
+def _logs_asistencia_bitmap(fecha_inicio, fecha_fin):
+    """Versión de _logs_asistencia_filas para el modo bitmap (usuario = último que registró)"""
+    estudiantes = {
+        e.id_estudiante: e
+        for e in db.session.query(Estudiante.id_estudiante, Estudiante.id_seccion, Estudiante.genero).all()
+    }
+    grupos = defaultdict(lambda: [0, 0])
+    for marca in leer_marcas(fecha_inicio, fecha_fin, ids_estudiantes=estudiantes):
+        estudiante = estudiantes[marca.id_estudiante]
+        grupo = grupos[(marca.fecha, estudiante.id_seccion, marca.id_usuario)]
+        if marca.presente:
+            grupo[0 if estudiante.genero == 'M' else 1] += 1
+    return sorted(
+        (LogAsistencia(*clave, h, m) for clave, (h, m) in grupos.items()),
+        key=lambda r: r.fecha, reverse=True
+    )
+
 @main_bp.route('/api/logs_asistencia')
 @login_required
 @admin_required
@@ -232,48 +286,24 @@ def api_logs_asistencia():
         # Obtener parámetros de filtro opcionales
         fecha_inicio = request.args.get('fecha_inicio')
         fecha_fin = request.args.get('fecha_fin')
+        fecha_inicio = datetime.strptime(fecha_inicio, '%Y-%m-%d').date() if fecha_inicio else None
+        fecha_fin = datetime.strptime(fecha_fin, '%Y-%m-%d').date() if fecha_fin else None
         
-        # Query para obtener asistencias agrupadas por fecha y sección
-        query = db.session.query(
-            AsistenciaEstudiante.fecha,
-            Seccion.id_seccion,
-            Seccion.nombre_seccion,
-            Grado.nombre_grado,
-            Etapa.nombre_etapa,
-            AsistenciaEstudiante.id_usuario,
-            func.sum(func.case((and_(AsistenciaEstudiante.presente == True, Estudiante.genero == 'M'), 1), else_=0)).label('asistentes_h'),
-            func.sum(func.case((and_(AsistenciaEstudiante.presente == True, Estudiante.genero == 'F'), 1), else_=0)).label('asistentes_m')
-        ).join(
-            Estudiante, AsistenciaEstudiante.id_estudiante == Estudiante.id_estudiante
-        ).join(
-            Seccion, Estudiante.id_seccion == Seccion.id_seccion
-        ).join(
-            Grado, Seccion.id_grado == Grado.id_grado
-        ).join(
-            Etapa, Grado.id_etapa == Etapa.id_etapa
-        ).group_by(
-            AsistenciaEstudiante.fecha,
-            Seccion.id_seccion,
-            Seccion.nombre_seccion,
-            Grado.nombre_grado,
-            Etapa.nombre_etapa,
-            AsistenciaEstudiante.id_usuario
-        ).order_by(AsistenciaEstudiante.fecha.desc())
-        
-        # Aplicar filtros de fecha si se proporcionan
-        if fecha_inicio:
-            fecha_inicio_obj = datetime.strptime(fecha_inicio, '%Y-%m-%d').date()
-            query = query.filter(AsistenciaEstudiante.fecha >= fecha_inicio_obj)
+        # Asistencias agrupadas por fecha, sección y usuario
         
-        if fecha_fin:
-            fecha_fin_obj = datetime.strptime(fecha_fin, '%Y-%m-%d').date()
-            query = query.filter(AsistenciaEstudiante.fecha <= fecha_fin_obj)
-        
-        resultados = query.all()
+        if modo_bitmap():
+            resultados = _logs_asistencia_bitmap(fecha_inicio, fecha_fin)
+        else:
+            resultados = _logs_asistencia_filas(fecha_inicio, fecha_fin)
+        estructura = obtener_estructura(requeridas={r.id_seccion for r in resultados})
         
         # Formatear los resultados
         logs = []
         for resultado in resultados:
+            info = estructura.get(resultado.id_seccion)
+            if not info:
+                continue
+
             # Obtener el usuario que registró la asistencia
             if resultado.id_usuario:
                 usuario = Usuario.query.get(resultado.id_usuario)
@@ -285,9 +315,9 @@ def api_logs_asistencia():
                 'id': f"{resultado.id_seccion}_{resultado.fecha.strftime('%Y%m%d')}",
                 'fecha': resultado.fecha.strftime('%Y-%m-%d'),
                 'fecha_formato': resultado.fecha.strftime('%d/%m/%Y'),
-                'etapa': resultado.nombre_etapa,
-                'seccion': f"{resultado.nombre_grado} {resultado.nombre_seccion}",
-                'seccion_completa': f"{resultado.nombre_etapa} - {resultado.nombre_grado} {resultado.nombre_seccion}",
+                'etapa': info.nombre_etapa,
+                'seccion': info.nombre,
+                'seccion_completa': info.nombre_completo,
                 'profesor': nombre_profesor,
                 'asistentes_h': int(resultado.asistentes_h or 0),
                 'asistentes_m': int(resultado.asistentes_m or 0),
@@ -465,18 +495,12 @@ def eliminar_profesor(profesor_id):
 def obtener_secciones_por_etapa(etapa):
     """API para obtener secciones por etapa educativa"""
     try:
-        secciones = db.session.query(Seccion, Grado).select_from(Seccion).join(
-            Grado, Seccion.id_grado == Grado.id_grado
-        ).join(
-            Etapa, Grado.id_etapa == Etapa.id_etapa
-        ).filter(
-            Etapa.nombre_etapa == etapa
-        ).all()
+        estructura = obtener_estructura()
 
         return jsonify([{
-            'id': s.Seccion.id_seccion,
-            'nombre': f"{s.Grado.nombre_grado} {s.Seccion.nombre_seccion}"
-        } for s in secciones])
+            'id': info.id_seccion,
+            'nombre': info.nombre
+        } for info in map(estructura.get, estructura.ids_secciones(etapa=etapa))])
         
     except Exception as e:
         return jsonify({'error': f'Error al obtener secciones: {str(e)}'}), 500
@@ -489,20 +513,15 @@ def obtener_secciones_profesor(profesor_id):
         if not profesor:
             return jsonify({'error': 'Profesor no encontrado'}), 404
         
-        # Obtener secciones asignadas al profesor
-        asignaciones = db.session.query(ProfesorSeccion, Seccion, Grado, Etapa).select_from(ProfesorSeccion).join(
-            Seccion, ProfesorSeccion.id_seccion == Seccion.id_seccion
-        ).join(
-            Grado, Seccion.id_grado == Grado.id_grado
-        ).join(
-            Etapa, Grado.id_etapa == Etapa.id_etapa
-        ).filter(ProfesorSeccion.id_profesor == profesor_id).all()
+        # Obtener secciones asignadas al profesor (nombres desde el índice de estructura)
+        ids_secciones = [a.id_seccion for a in ProfesorSeccion.query.filter_by(id_profesor=profesor_id).all()]
+        estructura = obtener_estructura(requeridas=ids_secciones)
 
         secciones = [{
-            'id': a.Seccion.id_seccion,
-            'seccion': f"{a.Grado.nombre_grado} {a.Seccion.nombre_seccion}",
-            'etapa': a.Etapa.nombre_etapa
-        } for a in asignaciones]
+            'id': info.id_seccion,
+            'seccion': info.nombre,
+            'etapa': info.nombre_etapa
+        } for info in map(estructura.get, ids_secciones) if info]
 
         return jsonify({
             'profesor': {
@@ -597,37 +616,76 @@ def asignar_secciones_profesor():
 
 @main_bp.route('/api/profesores/asignaciones', methods=['GET'])
 def obtener_todas_asignaciones():
-    """API para obtener todas las asignaciones de profesores"""
+    """
+    API para obtener todas las asignaciones de profesores
+    Query params opcionales: pagina, por_pagina (sin ellos se devuelve la lista completa)
+    Responde con ETag; si el cliente envía If-None-Match vigente se devuelve 304
+    """
     try:
-        # Obtener todos los profesores con sus asignaciones
-        profesores = Usuario.query.filter_by(rol='profesor').all()
-        
-        resultado = []
-        for profesor in profesores:
-            # Obtener secciones asignadas
-            asignaciones = db.session.query(ProfesorSeccion, Seccion, Grado, Etapa).select_from(ProfesorSeccion).join(
-                Seccion, ProfesorSeccion.id_seccion == Seccion.id_seccion
-            ).join(
-                Grado, Seccion.id_grado == Grado.id_grado
-            ).join(
-                Etapa, Grado.id_etapa == Etapa.id_etapa
-            ).filter(ProfesorSeccion.id_profesor == profesor.id_usuario).all()
-
-            secciones = [{
-                'id': a.Seccion.id_seccion,
-                'seccion': f"{a.Grado.nombre_grado} {a.Seccion.nombre_seccion}",
-                'etapa': a.Etapa.nombre_etapa
-            } for a in asignaciones]
-            
-            resultado.append({
-                'id': profesor.id_usuario,
-                'nombre': profesor.nombre,
-                'apellido': profesor.apellido,
-                'email': profesor.email,
-                'secciones': secciones
+        paginar = 'pagina' in request.args or 'por_pagina' in request.args
+        try:
+            pagina = max(int(request.args.get('pagina', 1)), 1)
+            por_pagina = min(max(int(request.args.get('por_pagina', 50)), 1), 500)
+        except ValueError:
+            return jsonify({'error': 'pagina y por_pagina deben ser numéricos'}), 400
+
+        # Profesores y sus secciones en una sola consulta (outer join para incluir profesores sin secciones)
+        columnas = [Usuario.id_usuario, Usuario.nombre, Usuario.apellido, Usuario.email, ProfesorSeccion.id_seccion]
+        if paginar:
+            # La página se resuelve en una tabla derivada; el total sale de una función de ventana
+            pagina_profesores = db.session.query(
+                Usuario.id_usuario.label('id_profesor'),
+                func.count().over().label('total')
+            ).filter(
+                Usuario.rol == 'profesor'
+            ).order_by(Usuario.id_usuario).limit(por_pagina).offset((pagina - 1) * por_pagina).subquery()
+
+            query = db.session.query(*columnas, pagina_profesores.c.total).join(
+                pagina_profesores, Usuario.id_usuario == pagina_profesores.c.id_profesor
+            )
+        else:
+            query = db.session.query(*columnas).filter(Usuario.rol == 'profesor')
+
+        filas = query.outerjoin(
+            ProfesorSeccion, Usuario.id_usuario == ProfesorSeccion.id_profesor
+        ).order_by(Usuario.id_usuario, ProfesorSeccion.id_seccion).all()
+
+        # Agrupar en memoria; los nombres de sección salen del índice de estructura
+        estructura = obtener_estructura(requeridas={f.id_seccion for f in filas if f.id_seccion})
+        profesores = {}
+        for fila in filas:
+            profesor = profesores.setdefault(fila.id_usuario, {
+                'id': fila.id_usuario,
+                'nombre': fila.nombre,
+                'apellido': fila.apellido,
+                'email': fila.email,
+                'secciones': []
             })
-        
-        return jsonify(resultado)
+            info = estructura.get(fila.id_seccion)
+            if info:
+                profesor['secciones'].append({
+                    'id': info.id_seccion,
+                    'seccion': info.nombre,
+                    'etapa': info.nombre_etapa
+                })
+
+        resultado = list(profesores.values())
+        if paginar:
+            if filas:
+                total = filas[0].total
+            else:
+                total = Usuario.query.filter_by(rol='profesor').count()
+            resultado = {
+                'profesores': resultado,
+                'total': total,
+                'pagina': pagina,
+                'por_pagina': por_pagina,
+                'total_paginas': (total + por_pagina - 1) // por_pagina
+            }
+
+        respuesta = jsonify(resultado)
+        respuesta.set_etag(hashlib.md5(respuesta.get_data()).hexdigest())
+        return respuesta.make_conditional(request)
         
     except Exception as e:
         return jsonify({'error': f'Error al obtener asignaciones: {str(e)}'}), 500
@@ -1139,6 +1197,29 @@ def gestionar_matricula():
         'fecha_actualizacion': m.Matricula.fecha_actualizacion.isoformat() if m.Matricula.fecha_actualizacion else None
     } for m in matriculas])
 
+@admin_bp.route('/estructura', methods=['GET'])
+@login_required
+@admin_required
+def obtener_estructura_escolar():
+    """API para consultar la versión vigente del índice de estructura escolar"""
+    estructura = obtener_estructura()
+    return jsonify({
+        'version': estructura.version,
+        'creado': datetime.fromtimestamp(estructura.creado).isoformat(),
+        'secciones': [info._asdict() for info in estructura]
+    })
+
+@admin_bp.route('/estructura/recargar', methods=['POST'])
+@login_required
+@admin_required
+def recargar_estructura_escolar():
+    """API para reconstruir el índice de estructura tras editar etapas, grados o secciones"""
+    try:
+        estructura = recargar_estructura()
+        return jsonify({'success': True, 'version': estructura.version, 'secciones': len(estructura)})
+    except Exception as e:
+        return jsonify({'error': f'Error al recargar la estructura: {str(e)}'}), 500
+
 # ==================== RUTAS DE NAVEGACIÓN ====================
 
 @main_bp.route('/ir_admin')
@@ -5,10 +5,16 @@ Rutas y endpoints para estadísticas basadas en asistencia individual
 from flask import Blueprint, request, jsonify
 from flask_login import login_required
 from datetime import datetime, timedelta
-from sqlalchemy import func, and_, case
+from sqlalchemy import func, and_, case, literal, null
 from functools import wraps
 
-from models import db, Etapa, Grado, Seccion, Estudiante, AsistenciaEstudiante, Usuario
+from models import db, Estudiante, Usuario, ResumenAsistencia
+from utils.estadisticas_vectorizadas import calcular_estadisticas_dia_completo
+from utils.cache_estadisticas import obtener_cache
+from utils.estructura_escolar import obtener_estructura
+from utils.calendario_utils import GRANULARIDADES, agrupar_tendencia
+from utils.almacen_asistencia import modo_bitmap, leer_marcas
+from utils.archivo_asistencia import asistencia_para_rango
 
 # Blueprint para estadísticas
 estadisticas_bp = Blueprint('estadisticas', __name__, url_prefix='/admin')
@@ -27,6 +33,28 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def _filtrar_asistencia_dia_completo(query, asistencia, fecha_inicio, fecha_fin, etapa, seccion_id):
+    """Aplica joins y filtros comunes a las consultas de 'Dia Completo'"""
+    query = query.join(
+        Estudiante, asistencia.id_estudiante == Estudiante.id_estudiante
+    ).filter(
+        and_(
+            asistencia.fecha >= fecha_inicio,
+            asistencia.fecha <= fecha_fin,
+            Estudiante.activo == True
+        )
+    )
+
+    # Etapa y sección se resuelven con el índice de estructura, sin joins a seccion/grado/etapa
+    if etapa or seccion_id:
+        query = query.filter(Estudiante.id_seccion.in_(obtener_estructura().ids_secciones(etapa, seccion_id)))
+
+    return query
+
+def _usar_sql_dia_completo():
+    """La resolución en SQL se usa en MariaDB/MySQL; otros motores (SQLite en pruebas) usan Python"""
+    return db.session.get_bind().dialect.name in ('mysql', 'mariadb')
+
 def _calcular_presencia_dia_completo(fecha_inicio, fecha_fin, etapa, seccion_id):
     """
     Para el filtro 'Dia Completo', calcula presencia virtual:
@@ -35,34 +63,24 @@ def _calcular_presencia_dia_completo(fecha_inicio, fecha_fin, etapa, seccion_id)
       si asistio a mas de la mitad de los bloques registrados ese dia
     Retorna un set de tuplas (id_estudiante, fecha) de los que se consideran presentes
     """
-    # Obtener todos los registros de asistencia en el rango
-    query = db.session.query(
-        AsistenciaEstudiante.id_estudiante,
-        AsistenciaEstudiante.fecha,
-        AsistenciaEstudiante.bloque,
-        AsistenciaEstudiante.presente
-    ).join(
-        Estudiante, AsistenciaEstudiante.id_estudiante == Estudiante.id_estudiante
-    ).join(
-        Seccion, Estudiante.id_seccion == Seccion.id_seccion
-    ).join(
-        Grado, Seccion.id_grado == Grado.id_grado
-    ).join(
-        Etapa, Grado.id_etapa == Etapa.id_etapa
-    ).filter(
-        and_(
-            AsistenciaEstudiante.fecha >= fecha_inicio,
-            AsistenciaEstudiante.fecha <= fecha_fin,
-            Estudiante.activo == True
+    if modo_bitmap():
+        registros = _registros_dia_completo_bitmap(fecha_inicio, fecha_fin, etapa, seccion_id)
+    elif _usar_sql_dia_completo():
+        return _calcular_presencia_dia_completo_sql(fecha_inicio, fecha_fin, etapa, seccion_id)
+    else:
+        # Obtener todos los registros de asistencia en el rango (con el archivo si el rango lo alcanza)
+        asistencia = asistencia_para_rango(fecha_inicio, fecha_fin)
+        query = _filtrar_asistencia_dia_completo(
+            db.session.query(
+                asistencia.id_estudiante,
+                asistencia.fecha,
+                asistencia.bloque,
+                asistencia.presente
+            ),
+            asistencia, fecha_inicio, fecha_fin, etapa, seccion_id
         )
-    )
 
-    if etapa:
-        query = query.filter(Etapa.nombre_etapa == etapa)
-    if seccion_id:
-        query = query.filter(Seccion.id_seccion == int(seccion_id))
-
-    registros = query.all()
+        registros = query.all()
 
     # Agrupar por (estudiante, fecha)
     from collections import defaultdict
@@ -90,6 +108,281 @@ def _calcular_presencia_dia_completo(fecha_inicio, fecha_fin, etapa, seccion_id)
 
     return presentes, fechas_con_datos
 
+def _registros_dia_completo_bitmap(fecha_inicio, fecha_fin, etapa, seccion_id):
+    """Marcas del rango de los estudiantes activos que cumplen los filtros, desde los mapas de bits"""
+    query = db.session.query(Estudiante.id_estudiante).filter(Estudiante.activo == True)
+    if etapa or seccion_id:
+        query = query.filter(Estudiante.id_seccion.in_(obtener_estructura().ids_secciones(etapa, seccion_id)))
+    return leer_marcas(fecha_inicio, fecha_fin, ids_estudiantes=[e.id_estudiante for e in query.all()])
+
+def _calcular_presencia_dia_completo_sql(fecha_inicio, fecha_fin, etapa, seccion_id):
+    """
+    Versión en base de datos de _calcular_presencia_dia_completo
+    Resuelve la regla por (estudiante, fecha) con agregación condicional y solo
+    transfiere los pares presentes, en lugar de todos los registros por bloque
+    """
+    asistencia = asistencia_para_rango(fecha_inicio, fecha_fin)
+    es_completo = asistencia.bloque == 'completo'
+    tiene_completo = func.max(case((es_completo, 1), else_=0))
+    presente_completo = func.max(case((and_(es_completo, asistencia.presente == True), 1), else_=0))
+    bloques_presentes = func.sum(case((asistencia.presente == True, 1), else_=0))
+    total_bloques = func.count(asistencia.id_asistencia_estudiante)
+
+    presente_dia = case(
+        (tiene_completo == 1, presente_completo),
+        (bloques_presentes * 2 > total_bloques, 1),
+        else_=0
+    )
+
+    presentes_query = _filtrar_asistencia_dia_completo(
+        db.session.query(asistencia.id_estudiante, asistencia.fecha),
+        asistencia, fecha_inicio, fecha_fin, etapa, seccion_id
+    ).group_by(
+        asistencia.id_estudiante, asistencia.fecha
+    ).having(presente_dia == 1)
+
+    fechas_query = _filtrar_asistencia_dia_completo(
+        db.session.query(asistencia.fecha),
+        asistencia, fecha_inicio, fecha_fin, etapa, seccion_id
+    ).distinct()
+
+    presentes = {(r.id_estudiante, r.fecha) for r in presentes_query.all()}
+    fechas_con_datos = {r.fecha for r in fechas_query.all()}
+
+    return presentes, fechas_con_datos
+
+def _consulta_unica_resumen(fecha_inicio, fecha_fin, nivel_bloque):
+    """
+    Obtiene en un solo viaje a la base de datos todo lo necesario para el flujo normal:
+    - Filas del resumen diario del rango para el nivel de bloque ('todos' o un bloque)
+    - Matrícula activa por (sección, género); los nombres salen del índice de estructura
+    MariaDB no soporta GROUPING SETS, así que ambos conjuntos se combinan con UNION ALL
+    y los desgloses se derivan en una sola pasada (ver _estadisticas_desde_resumen)
+    """
+    filas_resumen = db.session.query(
+        literal('resumen').label('tipo'),
+        ResumenAsistencia.fecha,
+        ResumenAsistencia.id_seccion,
+        ResumenAsistencia.genero,
+        ResumenAsistencia.registros,
+        ResumenAsistencia.presentes,
+        ResumenAsistencia.estudiantes
+    ).filter(
+        and_(
+            ResumenAsistencia.fecha >= fecha_inicio,
+            ResumenAsistencia.fecha <= fecha_fin,
+            ResumenAsistencia.bloque == nivel_bloque
+        )
+    )
+
+    filas_matricula = db.session.query(
+        literal('matricula'),
+        null(),
+        Estudiante.id_seccion,
+        Estudiante.genero,
+        func.count(Estudiante.id_estudiante),
+        literal(0),
+        literal(0)
+    ).filter(Estudiante.activo == True).group_by(
+        Estudiante.id_seccion, Estudiante.genero
+    )
+
+    return filas_resumen.union_all(filas_matricula).all()
+
+def _estadisticas_desde_resumen(filas, etapa, seccion_id):
+    """
+    Deriva todos los desgloses del flujo normal recorriendo una sola vez las filas
+    de _consulta_unica_resumen. El desglose por etapa no aplica los filtros de etapa/sección.
+    """
+    from collections import defaultdict
+
+    matricula = defaultdict(int)
+    resumen = []
+    for fila in filas:
+        if fila[0] == 'matricula':
+            matricula[(fila.id_seccion, fila.genero)] += int(fila.registros)
+        else:
+            resumen.append(fila)
+
+    estructura = obtener_estructura(requeridas={id_seccion for id_seccion, _ in matricula})
+    secciones = {
+        id_seccion: (info.nombre_grado, info.nombre_seccion, info.nombre_etapa)
+        for id_seccion, info in estructura.secciones.items()
+    }
+
+    def incluida(id_seccion):
+        if id_seccion not in secciones:
+            return False
+        if seccion_id and id_seccion != int(seccion_id):
+            return False
+        return not etapa or secciones[id_seccion][2] == etapa
+
+    # Matrícula por género, sección y etapa
+    matricula_genero = defaultdict(int)
+    matricula_seccion = defaultdict(int)
+    matricula_etapa = defaultdict(int)
+    for (id_seccion, genero), total in matricula.items():
+        matricula_etapa[secciones[id_seccion][2]] += total
+        if incluida(id_seccion):
+            matricula_genero[genero] += total
+            matricula_seccion[id_seccion] += total
+
+    # Presentes por cada dimensión en una sola pasada
+    total_asistencias = 0
+    total_asistentes = 0
+    fechas = set()
+    secciones_con_datos = set()
+    presentes_genero = defaultdict(int)
+    presentes_seccion = defaultdict(int)
+    presentes_etapa = defaultdict(int)
+    tendencia = defaultdict(lambda: [0, 0])
+    for fila in resumen:
+        if fila.id_seccion in secciones:
+            presentes_etapa[secciones[fila.id_seccion][2]] += fila.presentes
+        if not incluida(fila.id_seccion):
+            continue
+        total_asistencias += fila.registros
+        total_asistentes += fila.presentes
+        fechas.add(fila.fecha)
+        secciones_con_datos.add(fila.id_seccion)
+        presentes_genero[fila.genero] += fila.presentes
+        presentes_seccion[fila.id_seccion] += fila.presentes
+        tendencia[fila.fecha][0] += fila.estudiantes
+        tendencia[fila.fecha][1] += fila.presentes
+
+    return {
+        'total_estudiantes': sum(matricula_seccion.values()),
+        'total_asistencias': total_asistencias,
+        'total_asistentes': total_asistentes,
+        'dias_analizados': len(fechas) or 1,
+        'total_secciones': len(secciones_con_datos),
+        'secciones': secciones,
+        'matricula_genero': matricula_genero,
+        'presentes_genero': presentes_genero,
+        'matricula_seccion': matricula_seccion,
+        'presentes_seccion': presentes_seccion,
+        'matricula_etapa': matricula_etapa,
+        'presentes_etapa': presentes_etapa,
+        'tendencia': tendencia
+    }
+
+def _calcular_estadisticas(fecha_inicio, fecha_fin, etapa, seccion_id, bloque, granularidad='dia'):
+    """Calcula la respuesta de /estadisticas para los filtros dados (sin caché)"""
+    # Para dia completo, calcular presencia virtual
+    if bloque == 'completo':
+        presentes_set, fechas_con_datos = _calcular_presencia_dia_completo(
+            fecha_inicio, fecha_fin, etapa, seccion_id
+        )
+
+        # Matrícula en una sola consulta; los nombres salen del índice de estructura
+        estructura = obtener_estructura()
+        filas_roster = db.session.query(
+            Estudiante.id_estudiante,
+            Estudiante.id_seccion,
+            Estudiante.genero
+        ).filter(Estudiante.activo == True)
+
+        if etapa or seccion_id:
+            filas_roster = filas_roster.filter(Estudiante.id_seccion.in_(estructura.ids_secciones(etapa, seccion_id)))
+
+        matricula = filas_roster.all()
+        estructura = obtener_estructura(requeridas={fila.id_seccion for fila in matricula})
+        filas_roster = []
+        for fila in matricula:
+            info = estructura.get(fila.id_seccion)
+            if info:
+                filas_roster.append((fila.id_estudiante, fila.id_seccion, fila.genero,
+                                     info.nombre_grado, info.nombre_seccion, info.nombre_etapa))
+
+        resultado = calcular_estadisticas_dia_completo(filas_roster, presentes_set, fechas_con_datos, granularidad)
+
+        return {
+            'success': True,
+            **resultado,
+            'periodo': GRANULARIDADES[granularidad],
+            'fecha_inicio': fecha_inicio.isoformat(),
+            'fecha_fin': fecha_fin.isoformat()
+        }
+
+    # ===== FLUJO NORMAL: sin filtro o bloque específico =====
+    # Se lee del resumen diario pre-agregado (resumen_asistencia). Sin filtro de bloque
+    # se usan las filas bloque='todos', que agregan todos los bloques del día.
+    nivel_bloque = bloque if bloque in ('bloque_1', 'bloque_2', 'bloque_3', 'bloque_4') else 'todos'
+
+    stats = _estadisticas_desde_resumen(
+        _consulta_unica_resumen(fecha_inicio, fecha_fin, nivel_bloque), etapa, seccion_id
+    )
+    total_estudiantes = stats['total_estudiantes']
+    dias_analizados = stats['dias_analizados']
+
+    porcentaje_total = round(
+        (stats['total_asistentes'] / (total_estudiantes * dias_analizados) * 100)
+        if total_estudiantes > 0 else 0, 1
+    )
+
+    # ===== ESTADÍSTICAS POR GÉNERO =====
+    genero_data = {}
+    for clave, genero in (('masculino', 'M'), ('femenino', 'F')):
+        total = stats['presentes_genero'][genero]
+        matricula = stats['matricula_genero'][genero]
+        genero_data[clave] = {
+            'total': total, 'matricula': matricula,
+            'porcentaje': round((total / (matricula * dias_analizados) * 100) if matricula and dias_analizados else 0, 1)
+        }
+
+    # ===== ESTADÍSTICAS POR SECCIÓN =====
+    # Secciones con el mismo nombre de grado y sección se acumulan en una sola entrada
+    acumulado_seccion = {}
+    for id_seccion, matricula in stats['matricula_seccion'].items():
+        nombre_grado, nombre_seccion, _ = stats['secciones'][id_seccion]
+        acumulado = acumulado_seccion.setdefault(f"{nombre_grado} {nombre_seccion}", {'total': 0, 'matricula': 0})
+        acumulado['total'] += stats['presentes_seccion'][id_seccion]
+        acumulado['matricula'] += matricula
+
+    seccion_data = {}
+    for nombre_completo, acumulado in acumulado_seccion.items():
+        total_esperado = acumulado['matricula'] * dias_analizados
+        seccion_data[nombre_completo] = {
+            'total': acumulado['total'],
+            'matricula': acumulado['matricula'],
+            'porcentaje': round((acumulado['total'] / total_esperado * 100) if total_esperado > 0 else 0, 1)
+        }
+
+    # ===== ESTADÍSTICAS POR ETAPA =====
+    etapa_data = {}
+    for nombre_etapa, matricula in stats['matricula_etapa'].items():
+        total = stats['presentes_etapa'][nombre_etapa]
+        total_esperado = matricula * dias_analizados
+        etapa_data[nombre_etapa] = {
+            'total': total,
+            'matricula': matricula,
+            'porcentaje': round((total / total_esperado * 100) if total_esperado > 0 else 0, 1)
+        }
+
+    # ===== TENDENCIA TEMPORAL =====
+    tendencia_data = agrupar_tendencia(
+        ((fecha, esperado, asistentes) for fecha, (esperado, asistentes) in stats['tendencia'].items()),
+        granularidad
+    )
+
+    return {
+        'success': True,
+        'estadisticas_generales': {
+            'total_estudiantes': total_estudiantes,
+            'total_asistencias': stats['total_asistencias'],
+            'total_asistentes': stats['total_asistentes'],
+            'porcentaje_total': porcentaje_total,
+            'dias_analizados': dias_analizados,
+            'total_secciones': stats['total_secciones']
+        },
+        'por_genero': genero_data,
+        'por_seccion': seccion_data,
+        'por_etapa': etapa_data,
+        'tendencia_temporal': tendencia_data,
+        'periodo': GRANULARIDADES[granularidad],
+        'fecha_inicio': fecha_inicio.isoformat(),
+        'fecha_fin': fecha_fin.isoformat()
+    }
 
 @estadisticas_bp.route('/estadisticas')
 @login_required
@@ -102,6 +395,13 @@ def obtener_estadisticas():
         etapa = request.args.get('etapa', '')
         seccion_id = request.args.get('seccion', '')
         bloque = request.args.get('bloque', '')
+        granularidad = request.args.get('granularidad', '') or 'dia'
+
+        if granularidad not in GRANULARIDADES:
+            return jsonify({
+                'success': False,
+                'message': f"Granularidad inválida. Use: {', '.join(GRANULARIDADES)}"
+            }), 400
 
         # Convertir fechas
         if fecha_inicio:
@@ -114,453 +414,31 @@ def obtener_estadisticas():
         else:
             fecha_fin = datetime.now().date()
 
-        # Filtro de bloque para queries directas (bloques individuales)
-        bloque_filter = None
-        usar_dia_completo = False
-        if bloque in ('bloque_1', 'bloque_2', 'bloque_3', 'bloque_4'):
-            bloque_filter = bloque
-        elif bloque == 'completo':
-            usar_dia_completo = True
-
-        # Query base para estudiantes con filtros
-        estudiantes_query = db.session.query(Estudiante).join(
-            Seccion, Estudiante.id_seccion == Seccion.id_seccion
-        ).join(
-            Grado, Seccion.id_grado == Grado.id_grado
-        ).join(
-            Etapa, Grado.id_etapa == Etapa.id_etapa
-        ).filter(Estudiante.activo == True)
-
-        if etapa:
-            estudiantes_query = estudiantes_query.filter(Etapa.nombre_etapa == etapa)
-        if seccion_id:
-            estudiantes_query = estudiantes_query.filter(Seccion.id_seccion == int(seccion_id))
-
-        total_estudiantes = estudiantes_query.count()
-
-        # Para dia completo, calcular presencia virtual
-        if usar_dia_completo:
-            presentes_set, fechas_con_datos = _calcular_presencia_dia_completo(
-                fecha_inicio, fecha_fin, etapa, seccion_id
-            )
-            dias_analizados = len(fechas_con_datos) or 1
-            total_asistentes = len(presentes_set)
-            total_asistencias = total_asistentes  # cada entrada en presentes_set es un registro virtual
-
-            porcentaje_total = round(
-                (total_asistentes / (total_estudiantes * dias_analizados) * 100)
-                if total_estudiantes > 0 else 0, 1
-            )
-
-            # Obtener info de estudiantes para género y sección
-            estudiantes_info = {e.id_estudiante: e for e in estudiantes_query.all()}
-
-            # Estadísticas por género
-            total_h = sum(1 for (eid, f) in presentes_set if estudiantes_info.get(eid) and estudiantes_info[eid].genero == 'M')
-            total_m = sum(1 for (eid, f) in presentes_set if estudiantes_info.get(eid) and estudiantes_info[eid].genero == 'F')
-            matricula_h = sum(1 for e in estudiantes_info.values() if e.genero == 'M')
-            matricula_m = sum(1 for e in estudiantes_info.values() if e.genero == 'F')
-
-            genero_data = {
-                'masculino': {
-                    'total': total_h, 'matricula': matricula_h,
-                    'porcentaje': round((total_h / (matricula_h * dias_analizados) * 100) if matricula_h else 0, 1)
-                },
-                'femenino': {
-                    'total': total_m, 'matricula': matricula_m,
-                    'porcentaje': round((total_m / (matricula_m * dias_analizados) * 100) if matricula_m else 0, 1)
-                }
-            }
-
-            # Estadísticas por sección
-            seccion_data = {}
-            from collections import defaultdict
-            seccion_presentes = defaultdict(int)
-            seccion_matricula = defaultdict(int)
-            seccion_nombres = {}
-            for e in estudiantes_info.values():
-                sec = e.seccion
-                nombre = f"{sec.grado.nombre_grado} {sec.nombre_seccion}" if sec.grado else sec.nombre_seccion
-                seccion_nombres[sec.id_seccion] = nombre
-                seccion_matricula[sec.id_seccion] += 1
-            for (eid, f) in presentes_set:
-                e = estudiantes_info.get(eid)
-                if e:
-                    seccion_presentes[e.id_seccion] += 1
-            for sid, nombre in seccion_nombres.items():
-                mat = seccion_matricula[sid]
-                tot = seccion_presentes.get(sid, 0)
-                total_esperado = mat * dias_analizados
-                seccion_data[nombre] = {
-                    'total': tot, 'matricula': mat,
-                    'porcentaje': round((tot / total_esperado * 100) if total_esperado > 0 else 0, 1)
-                }
-
-            # Estadísticas por etapa
-            etapa_data = {}
-            etapa_presentes = defaultdict(int)
-            etapa_matricula = defaultdict(int)
-            for e in estudiantes_info.values():
-                nombre_etapa = e.seccion.grado.etapa.nombre_etapa if e.seccion.grado else 'N/A'
-                etapa_matricula[nombre_etapa] += 1
-            for (eid, f) in presentes_set:
-                e = estudiantes_info.get(eid)
-                if e:
-                    nombre_etapa = e.seccion.grado.etapa.nombre_etapa if e.seccion.grado else 'N/A'
-                    etapa_presentes[nombre_etapa] += 1
-            for nombre_etapa in etapa_matricula:
-                mat = etapa_matricula[nombre_etapa]
-                tot = etapa_presentes.get(nombre_etapa, 0)
-                total_esperado = mat * dias_analizados
-                etapa_data[nombre_etapa] = {
-                    'total': tot, 'matricula': mat,
-                    'porcentaje': round((tot / total_esperado * 100) if total_esperado > 0 else 0, 1)
-                }
-
-            # Tendencia temporal
-            tendencia_por_fecha = defaultdict(lambda: {'presentes': 0, 'estudiantes': set()})
-            for (eid, f) in presentes_set:
-                tendencia_por_fecha[f]['presentes'] += 1
-            # Contar estudiantes por fecha
-            for f in fechas_con_datos:
-                tendencia_por_fecha[f]['total'] = total_estudiantes
-            tendencia_data = []
-            for f in sorted(fechas_con_datos):
-                tot_est = total_estudiantes
-                tot_pres = tendencia_por_fecha[f]['presentes']
-                tendencia_data.append({
-                    'periodo': str(f),
-                    'total_asistentes': tot_pres,
-                    'total_esperado': tot_est,
-                    'porcentaje': round((tot_pres / tot_est * 100) if tot_est > 0 else 0, 1)
-                })
-
-            # Contar secciones con datos
-            secciones_con_datos = set()
-            for (eid, f) in presentes_set:
-                e = estudiantes_info.get(eid)
-                if e:
-                    secciones_con_datos.add(e.id_seccion)
-            total_secciones = len(secciones_con_datos) or len(seccion_nombres)
-
-            return jsonify({
-                'success': True,
-                'estadisticas_generales': {
-                    'total_estudiantes': total_estudiantes,
-                    'total_asistencias': total_asistencias,
-                    'total_asistentes': total_asistentes,
-                    'porcentaje_total': porcentaje_total,
-                    'dias_analizados': dias_analizados,
-                    'total_secciones': total_secciones
-                },
-                'por_genero': genero_data,
-                'por_seccion': seccion_data,
-                'por_etapa': etapa_data,
-                'tendencia_temporal': tendencia_data,
-                'fecha_inicio': fecha_inicio.isoformat(),
-                'fecha_fin': fecha_fin.isoformat()
-            })
-
-        # ===== FLUJO NORMAL: sin filtro o bloque específico =====
-
-        # Query base para asistencias
-        asistencias_query = db.session.query(AsistenciaEstudiante).join(
-            Estudiante, AsistenciaEstudiante.id_estudiante == Estudiante.id_estudiante
-        ).join(
-            Seccion, Estudiante.id_seccion == Seccion.id_seccion
-        ).join(
-            Grado, Seccion.id_grado == Grado.id_grado
-        ).join(
-            Etapa, Grado.id_etapa == Etapa.id_etapa
-        ).filter(
-            and_(
-                AsistenciaEstudiante.fecha >= fecha_inicio,
-                AsistenciaEstudiante.fecha <= fecha_fin,
-                Estudiante.activo == True
-            )
-        )
-
-        if etapa:
-            asistencias_query = asistencias_query.filter(Etapa.nombre_etapa == etapa)
-        if seccion_id:
-            asistencias_query = asistencias_query.filter(Seccion.id_seccion == int(seccion_id))
-        if bloque_filter:
-            asistencias_query = asistencias_query.filter(AsistenciaEstudiante.bloque == bloque_filter)
-
-        total_asistencias = asistencias_query.count()
-        total_asistentes = asistencias_query.filter(AsistenciaEstudiante.presente == True).count()
-
-        # Dias analizados
-        dias_query = db.session.query(
-            func.count(func.distinct(AsistenciaEstudiante.fecha))
-        ).join(
-            Estudiante, AsistenciaEstudiante.id_estudiante == Estudiante.id_estudiante
-        ).join(
-            Seccion, Estudiante.id_seccion == Seccion.id_seccion
-        ).join(
-            Grado, Seccion.id_grado == Grado.id_grado
-        ).join(
-            Etapa, Grado.id_etapa == Etapa.id_etapa
-        ).filter(
-            and_(
-                AsistenciaEstudiante.fecha >= fecha_inicio,
-                AsistenciaEstudiante.fecha <= fecha_fin,
-                Estudiante.activo == True
-            )
-        )
-
-        if etapa:
-            dias_query = dias_query.filter(Etapa.nombre_etapa == etapa)
-        if seccion_id:
-            dias_query = dias_query.filter(Seccion.id_seccion == int(seccion_id))
-        if bloque_filter:
-            dias_query = dias_query.filter(AsistenciaEstudiante.bloque == bloque_filter)
-
-        dias_analizados = dias_query.scalar() or 1
+        cache = obtener_cache()
+        filtros = cache.normalizar_filtros(fecha_inicio, fecha_fin, etapa, seccion_id, bloque, granularidad)
+        respuesta = cache.obtener(filtros)
+        if respuesta is None:
+            respuesta = _calcular_estadisticas(fecha_inicio, fecha_fin, etapa, seccion_id, bloque, granularidad)
+            cache.guardar(filtros, respuesta)
 
-        porcentaje_total = round(
-            (total_asistentes / (total_estudiantes * dias_analizados) * 100)
-            if total_estudiantes > 0 else 0, 1
-        )
-
-        # ===== ESTADÍSTICAS POR GÉNERO =====
-        estudiantes_por_genero = db.session.query(
-            Estudiante.genero,
-            func.count(Estudiante.id_estudiante).label('total')
-        ).join(
-            Seccion, Estudiante.id_seccion == Seccion.id_seccion
-        ).join(
-            Grado, Seccion.id_grado == Grado.id_grado
-        ).join(
-            Etapa, Grado.id_etapa == Etapa.id_etapa
-        ).filter(Estudiante.activo == True)
-
-        if etapa:
-            estudiantes_por_genero = estudiantes_por_genero.filter(Etapa.nombre_etapa == etapa)
-        if seccion_id:
-            estudiantes_por_genero = estudiantes_por_genero.filter(Seccion.id_seccion == int(seccion_id))
-
-        estudiantes_por_genero = estudiantes_por_genero.group_by(Estudiante.genero).all()
-
-        matricula_h = 0
-        matricula_m = 0
-        for genero, total in estudiantes_por_genero:
-            if genero == 'M':
-                matricula_h = total
-            elif genero == 'F':
-                matricula_m = total
-
-        asistentes_genero_query = db.session.query(
-            Estudiante.genero,
-            func.count(AsistenciaEstudiante.id_asistencia_estudiante).label('total')
-        ).join(
-            AsistenciaEstudiante, Estudiante.id_estudiante == AsistenciaEstudiante.id_estudiante
-        ).join(
-            Seccion, Estudiante.id_seccion == Seccion.id_seccion
-        ).join(
-            Grado, Seccion.id_grado == Grado.id_grado
-        ).join(
-            Etapa, Grado.id_etapa == Etapa.id_etapa
-        ).filter(
-            and_(
-                AsistenciaEstudiante.fecha >= fecha_inicio,
-                AsistenciaEstudiante.fecha <= fecha_fin,
-                AsistenciaEstudiante.presente == True,
-                Estudiante.activo == True
-            )
-        )
-
-        if etapa:
-            asistentes_genero_query = asistentes_genero_query.filter(Etapa.nombre_etapa == etapa)
-        if seccion_id:
-            asistentes_genero_query = asistentes_genero_query.filter(Seccion.id_seccion == int(seccion_id))
-        if bloque_filter:
-            asistentes_genero_query = asistentes_genero_query.filter(AsistenciaEstudiante.bloque == bloque_filter)
-
-        asistentes_por_genero = asistentes_genero_query.group_by(Estudiante.genero).all()
-
-        total_h = 0
-        total_m = 0
-        for genero, total in asistentes_por_genero:
-            if genero == 'M':
-                total_h = total
-            elif genero == 'F':
-                total_m = total
-
-        genero_data = {
-            'masculino': {
-                'total': total_h, 'matricula': matricula_h,
-                'porcentaje': round((total_h / (matricula_h * dias_analizados) * 100) if matricula_h and dias_analizados else 0, 1)
-            },
-            'femenino': {
-                'total': total_m, 'matricula': matricula_m,
-                'porcentaje': round((total_m / (matricula_m * dias_analizados) * 100) if matricula_m and dias_analizados else 0, 1)
-            }
-        }
-
-        # ===== ESTADÍSTICAS POR SECCIÓN =====
-        seccion_join_cond = [
-            AsistenciaEstudiante.id_estudiante == Estudiante.id_estudiante,
-            AsistenciaEstudiante.fecha >= fecha_inicio,
-            AsistenciaEstudiante.fecha <= fecha_fin
-        ]
-        if bloque_filter:
-            seccion_join_cond.append(AsistenciaEstudiante.bloque == bloque_filter)
-
-        stats_seccion = db.session.query(
-            Grado.nombre_grado,
-            Seccion.nombre_seccion,
-            func.count(func.distinct(Estudiante.id_estudiante)).label('total_estudiantes'),
-            func.sum(case((AsistenciaEstudiante.presente == True, 1), else_=0)).label('total_asistentes')
-        ).join(
-            Estudiante, Seccion.id_seccion == Estudiante.id_seccion
-        ).join(
-            Grado, Seccion.id_grado == Grado.id_grado
-        ).join(
-            Etapa, Grado.id_etapa == Etapa.id_etapa
-        ).outerjoin(
-            AsistenciaEstudiante, and_(*seccion_join_cond)
-        ).filter(Estudiante.activo == True)
-
-        if etapa:
-            stats_seccion = stats_seccion.filter(Etapa.nombre_etapa == etapa)
-        if seccion_id:
-            stats_seccion = stats_seccion.filter(Seccion.id_seccion == int(seccion_id))
-
-        stats_seccion = stats_seccion.group_by(Grado.nombre_grado, Seccion.nombre_seccion).all()
-
-        seccion_data = {}
-        for stat in stats_seccion:
-            nombre_completo = f"{stat.nombre_grado} {stat.nombre_seccion}"
-            total_esperado = stat.total_estudiantes * dias_analizados
-            porcentaje = round((stat.total_asistentes / total_esperado * 100) if total_esperado > 0 else 0, 1)
-            seccion_data[nombre_completo] = {
-                'total': int(stat.total_asistentes or 0),
-                'matricula': stat.total_estudiantes or 0,
-                'porcentaje': porcentaje
-            }
-
-        # ===== ESTADÍSTICAS POR ETAPA =====
-        etapa_join_cond = [
-            AsistenciaEstudiante.id_estudiante == Estudiante.id_estudiante,
-            AsistenciaEstudiante.fecha >= fecha_inicio,
-            AsistenciaEstudiante.fecha <= fecha_fin
-        ]
-        if bloque_filter:
-            etapa_join_cond.append(AsistenciaEstudiante.bloque == bloque_filter)
-
-        stats_etapa = db.session.query(
-            Etapa.nombre_etapa,
-            func.count(func.distinct(Estudiante.id_estudiante)).label('total_estudiantes'),
-            func.sum(case((AsistenciaEstudiante.presente == True, 1), else_=0)).label('total_asistentes')
-        ).join(
-            Grado, Etapa.id_etapa == Grado.id_etapa
-        ).join(
-            Seccion, Grado.id_grado == Seccion.id_grado
-        ).join(
-            Estudiante, Seccion.id_seccion == Estudiante.id_seccion
-        ).outerjoin(
-            AsistenciaEstudiante, and_(*etapa_join_cond)
-        ).filter(Estudiante.activo == True).group_by(Etapa.nombre_etapa).all()
-
-        etapa_data = {}
-        for stat in stats_etapa:
-            total_esperado = stat.total_estudiantes * dias_analizados
-            porcentaje = round((stat.total_asistentes / total_esperado * 100) if total_esperado > 0 else 0, 1)
-            etapa_data[stat.nombre_etapa] = {
-                'total': int(stat.total_asistentes or 0),
-                'matricula': stat.total_estudiantes or 0,
-                'porcentaje': porcentaje
-            }
-
-        # ===== TENDENCIA TEMPORAL =====
-        tendencia_query = db.session.query(
-            AsistenciaEstudiante.fecha,
-            func.count(func.distinct(Estudiante.id_estudiante)).label('total_estudiantes'),
-            func.sum(case((AsistenciaEstudiante.presente == True, 1), else_=0)).label('total_asistentes')
-        ).join(
-            Estudiante, AsistenciaEstudiante.id_estudiante == Estudiante.id_estudiante
-        ).join(
-            Seccion, Estudiante.id_seccion == Seccion.id_seccion
-        ).join(
-            Grado, Seccion.id_grado == Grado.id_grado
-        ).join(
-            Etapa, Grado.id_etapa == Etapa.id_etapa
-        ).filter(
-            and_(
-                AsistenciaEstudiante.fecha >= fecha_inicio,
-                AsistenciaEstudiante.fecha <= fecha_fin,
-                Estudiante.activo == True
-            )
-        )
-
-        if etapa:
-            tendencia_query = tendencia_query.filter(Etapa.nombre_etapa == etapa)
-        if seccion_id:
-            tendencia_query = tendencia_query.filter(Seccion.id_seccion == int(seccion_id))
-        if bloque_filter:
-            tendencia_query = tendencia_query.filter(AsistenciaEstudiante.bloque == bloque_filter)
-
-        tendencia_query = tendencia_query.group_by(AsistenciaEstudiante.fecha).order_by(AsistenciaEstudiante.fecha)
-
-        tendencia_data = []
-        for item in tendencia_query.all():
-            total_esperado = item.total_estudiantes or 0
-            porcentaje = round((item.total_asistentes / total_esperado * 100) if total_esperado > 0 else 0, 1)
-            tendencia_data.append({
-                'periodo': str(item.fecha),
-                'total_asistentes': int(item.total_asistentes or 0),
-                'total_esperado': int(total_esperado),
-                'porcentaje': porcentaje
-            })
-
-        # Contar secciones
-        secciones_query = db.session.query(
-            func.count(func.distinct(Seccion.id_seccion))
-        ).join(
-            Estudiante, Seccion.id_seccion == Estudiante.id_seccion
-        ).join(
-            AsistenciaEstudiante, Estudiante.id_estudiante == AsistenciaEstudiante.id_estudiante
-        ).join(
-            Grado, Seccion.id_grado == Grado.id_grado
-        ).join(
-            Etapa, Grado.id_etapa == Etapa.id_etapa
-        ).filter(
-            and_(
-                AsistenciaEstudiante.fecha >= fecha_inicio,
-                AsistenciaEstudiante.fecha <= fecha_fin,
-                Estudiante.activo == True
-            )
-        )
-
-        if etapa:
-            secciones_query = secciones_query.filter(Etapa.nombre_etapa == etapa)
-        if seccion_id:
-            secciones_query = secciones_query.filter(Seccion.id_seccion == int(seccion_id))
-        if bloque_filter:
-            secciones_query = secciones_query.filter(AsistenciaEstudiante.bloque == bloque_filter)
-
-        total_secciones = secciones_query.scalar() or 0
-
-        return jsonify({
-            'success': True,
-            'estadisticas_generales': {
-                'total_estudiantes': total_estudiantes,
-                'total_asistencias': total_asistencias,
-                'total_asistentes': total_asistentes,
-                'porcentaje_total': porcentaje_total,
-                'dias_analizados': dias_analizados,
-                'total_secciones': total_secciones
-            },
-            'por_genero': genero_data,
-            'por_seccion': seccion_data,
-            'por_etapa': etapa_data,
-            'tendencia_temporal': tendencia_data,
-            'fecha_inicio': fecha_inicio.isoformat(),
-            'fecha_fin': fecha_fin.isoformat()
-        })
+        return jsonify(respuesta)
 
     except Exception as e:
         import traceback
         traceback.print_exc()
         return jsonify({'success': False, 'message': f'Error al obtener estadísticas: {str(e)}'})
+
+@estadisticas_bp.route('/estadisticas/cache', methods=['GET'])
+@login_required
+@admin_required
+def metricas_cache_estadisticas():
+    """API para consultar aciertos, fallos e invalidaciones de la caché de estadísticas"""
+    return jsonify({'success': True, **obtener_cache().metricas()})
+
+@estadisticas_bp.route('/estadisticas/cache', methods=['DELETE'])
+@login_required
+@admin_required
+def limpiar_cache_estadisticas():
+    """API para vaciar la caché de estadísticas"""
+    eliminadas = obtener_cache().limpiar()
+    return jsonify({'success': True, 'message': f'{eliminadas} entradas eliminadas'})
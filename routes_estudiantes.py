@@ -2,15 +2,29 @@
 Rutas y endpoints para gestión de estudiantes y asistencia individual
 """
 
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, url_for
 from flask_login import login_required, current_user
 from functools import wraps
 from datetime import datetime, date
+from collections import namedtuple, defaultdict
+import io
 import os
 from werkzeug.utils import secure_filename
+import ijson
+from sqlalchemy import func, case, and_
 
-from models import db, Estudiante, Seccion, Grado, Etapa, AsistenciaEstudiante, ObservacionSeccion
-from utils.excel_processor import procesar_excel_estudiantes, obtener_estadisticas_carga
+from models import db, Estudiante, Seccion, Grado, Etapa, AsistenciaEstudiante, ObservacionSeccion, ProfesorSeccion
+from utils.excel_processor import obtener_estadisticas_carga
+from utils.importacion_estudiantes import guardar_archivo, encolar_importacion, cancelar_importacion, estado_importacion
+from utils.resumen_asistencia import actualizar_resumen, actualizar_resumen_secciones, actualizar_resumen_estudiantes
+from utils.cache_estadisticas import invalidar_estadisticas, obtener_cache
+from utils.estructura_escolar import obtener_estructura
+from utils.asistencia_masiva import guardar_asistencias, BLOQUES_VALIDOS
+from utils.cola_asistencia import obtener_cola
+from utils.idempotencia import idempotente
+from utils.padron_seccion import obtener_padron, invalidar_padron
+from utils.almacen_asistencia import modo_bitmap, leer_marcas, totales_por_estudiante
+from utils.archivo_asistencia import asistencia_para_rango
 
 # Blueprint para estudiantes
 estudiantes_bp = Blueprint('estudiantes', __name__, url_prefix='/api/estudiantes')
@@ -34,8 +48,9 @@ def admin_required(f):
 @admin_required
 def cargar_estudiantes_excel():
     """
-    Carga estudiantes desde un archivo Excel
+    Carga estudiantes desde un archivo Excel o CSV
     Espera un archivo con columnas: Grado, Sección, Nombre, Apellido, Cédula de identidad, Género
+    Responde 202 con el id de la importación; el progreso se consulta en /import/<id>
     """
     try:
         # Verificar que se envió un archivo
@@ -48,54 +63,107 @@ def cargar_estudiantes_excel():
             return jsonify({'error': 'Nombre de archivo vacío'}), 400
         
         # Validar extensión
-        extensiones_permitidas = {'.xlsx', '.xls'}
+        extensiones_permitidas = {'.xlsx', '.xls', '.csv'}
         ext = os.path.splitext(archivo.filename)[1].lower()
         
         if ext not in extensiones_permitidas:
             return jsonify({'error': f'Extensión no permitida. Use: {", ".join(extensiones_permitidas)}'}), 400
         
-        # Guardar archivo temporalmente
+        # Guardar archivo con el prefijo de su hash: una copia idéntica reutiliza el archivo guardado
         filename = secure_filename(archivo.filename)
         upload_dir = os.path.join(current_app.root_path, 'data_estudiantes_akademia')
-        temp_path = os.path.join(upload_dir, filename)
-
-        # Crear directorio si no existe
-        os.makedirs(upload_dir, exist_ok=True)
-        
-        archivo.save(temp_path)
+        ruta, hash_contenido = guardar_archivo(archivo, upload_dir, filename)
         
-        # Procesar archivo
+        # Procesar en segundo plano: se responde de inmediato con la URL para consultar el progreso
         sobrescribir = request.form.get('sobrescribir', 'false').lower() == 'true'
-        resultado = procesar_excel_estudiantes(temp_path, sobrescribir=sobrescribir)
-        
-        # Eliminar archivo temporal (opcional)
-        # os.remove(temp_path)
+        id_importacion, duplicado = encolar_importacion(
+            ruta, filename, sobrescribir, current_user.id_usuario, hash_contenido=hash_contenido
+        )
         
-        if resultado['success']:
-            return jsonify({
-                'success': True,
-                'message': f'Archivo procesado correctamente',
-                'total_filas': resultado['total_filas'],
-                'procesados': resultado['procesados'],
-                'actualizados': resultado['actualizados'],
-                'duplicados': resultado['duplicados'],
-                'errores': resultado['errores'],
-                'detalle': {
-                    'procesados': resultado['detalle_procesados'],
-                    'actualizados': resultado['detalle_actualizados'],
-                    'duplicados': resultado['detalle_duplicados'],
-                    'errores': resultado['detalle_errores']
-                }
-            }), 200
-        else:
-            return jsonify({
-                'success': False,
-                'error': resultado.get('error', 'Error desconocido')
-            }), 400
+        return jsonify({
+            'success': True,
+            'id_importacion': id_importacion,
+            'duplicado': duplicado,
+            'message': 'El mismo archivo ya se está importando' if duplicado else 'Archivo recibido; la importación se procesa en segundo plano',
+            'estado_url': url_for('estudiantes.estado_importacion_estudiantes', id_importacion=id_importacion),
+            'cancelar_url': url_for('estudiantes.cancelar_importacion_estudiantes', id_importacion=id_importacion)
+        }), 202
             
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': f'Error al procesar archivo: {str(e)}'}), 500
 
+def _respuesta_importacion(resultado):
+    """Reporte final de una importación con el formato de respuesta de la carga de Excel"""
+    if resultado['success']:
+        return {
+            'success': True,
+            'message': 'Archivo procesado correctamente',
+            'total_filas': resultado['total_filas'],
+            'procesados': resultado['procesados'],
+            'actualizados': resultado['actualizados'],
+            'duplicados': resultado['duplicados'],
+            'errores': resultado['errores'],
+            'sin_cambios': resultado.get('sin_cambios', 0),
+            'detalle': {
+                'procesados': resultado['detalle_procesados'],
+                'actualizados': resultado['detalle_actualizados'],
+                'duplicados': resultado['detalle_duplicados'],
+                'errores': resultado['detalle_errores']
+            },
+            'detalle_truncado': resultado.get('detalle_truncado', False)
+        }
+    return {
+        'success': False,
+        'error': resultado.get('error', 'Error desconocido'),
+        **{clave: resultado[clave] for clave in ('filas_confirmadas', 'columnas_encontradas', 'cancelada') if clave in resultado}
+    }
+
+@estudiantes_bp.route('/import/<id_importacion>', methods=['GET'])
+@login_required
+@admin_required
+def estado_importacion_estudiantes(id_importacion):
+    """
+    Consulta el progreso de una importación en segundo plano
+    Estados: pendiente, procesando, completada, error o cancelada (las tres últimas con el reporte final)
+    """
+    try:
+        importacion = estado_importacion(id_importacion)
+        if not importacion:
+            return jsonify({'error': 'Importación no encontrada'}), 404
+        
+        if importacion['resultado'] is not None:
+            importacion['resultado'] = _respuesta_importacion(importacion['resultado'])
+        return jsonify(importacion), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Error al consultar importación: {str(e)}'}), 500
+
+@estudiantes_bp.route('/import/<id_importacion>/cancelar', methods=['POST'])
+@login_required
+@admin_required
+def cancelar_importacion_estudiantes(id_importacion):
+    """
+    Cancela una importación: si está pendiente no se procesa; si está en proceso se detiene
+    al terminar el bloque actual (los bloques ya guardados se conservan)
+    """
+    try:
+        importacion = cancelar_importacion(id_importacion)
+        if not importacion:
+            return jsonify({'error': 'Importación no encontrada'}), 404
+        
+        return jsonify({
+            'success': True,
+            'id_importacion': importacion.id_importacion,
+            'estado': importacion.estado,
+            'cancelacion_solicitada': importacion.cancelar
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Error al cancelar importación: {str(e)}'}), 500
+
 @estudiantes_bp.route('/seccion/<int:id_seccion>', methods=['GET'])
 @login_required
 def obtener_estudiantes_seccion(id_seccion):
@@ -183,6 +251,8 @@ def crear_estudiante():
 
         db.session.add(nuevo_estudiante)
         db.session.commit()
+        invalidar_estadisticas(secciones=[id_seccion])
+        invalidar_padron([id_seccion])
 
         return jsonify({
             'success': True,
@@ -255,6 +325,7 @@ def actualizar_estudiante(id_estudiante):
             return jsonify({'error': 'Estudiante no encontrado'}), 404
         
         data = request.get_json()
+        seccion_anterior = estudiante.id_seccion
         
         # Actualizar campos permitidos
         if 'nombre' in data:
@@ -270,7 +341,15 @@ def actualizar_estudiante(id_estudiante):
         if 'activo' in data:
             estudiante.activo = bool(data['activo'])
         
+        # Sección, género y estado activo alteran el resumen diario de asistencia
+        afecta_estadisticas = any(campo in data for campo in ('genero', 'id_seccion', 'activo'))
+        if afecta_estadisticas:
+            actualizar_resumen_estudiantes([estudiante.id_estudiante], [seccion_anterior])
+        
         db.session.commit()
+        if afecta_estadisticas:
+            invalidar_estadisticas(secciones={seccion_anterior, estudiante.id_seccion})
+        invalidar_padron({seccion_anterior, estudiante.id_seccion})
         
         return jsonify({
             'success': True,
@@ -301,7 +380,10 @@ def eliminar_estudiante(id_estudiante):
         
         # Desactivar en lugar de eliminar
         estudiante.activo = False
+        actualizar_resumen_estudiantes([estudiante.id_estudiante], [estudiante.id_seccion])
         db.session.commit()
+        invalidar_estadisticas(secciones=[estudiante.id_seccion])
+        invalidar_padron([estudiante.id_seccion])
         
         return jsonify({
             'success': True,
@@ -314,76 +396,113 @@ def eliminar_estudiante(id_estudiante):
 
 # ==================== ENDPOINTS DE ASISTENCIA INDIVIDUAL ====================
 
+# Tamaño de lote para escribir asistencias mientras se lee el cuerpo de /registrar
+LOTE_REGISTRO = 500
+
+def _leer_registro():
+    """
+    Recorre el cuerpo JSON de /registrar sin cargarlo completo en memoria
+    Genera ('campo', nombre, valor) por cada campo de primer nivel y ('asistencia', dict)
+    por cada elemento de asistencias
+    """
+    constructor = None
+    # BufferedReader evita que la lectura de prueba read(0) de ijson se tome como desconexión
+    for prefijo, evento, valor in ijson.parse(io.BufferedReader(request.stream)):
+        if constructor is not None:
+            constructor.event(evento, valor)
+            if prefijo == 'asistencias.item' and evento == 'end_map':
+                yield 'asistencia', constructor.value
+                constructor = None
+        elif prefijo == 'asistencias.item' and evento == 'start_map':
+            constructor = ijson.ObjectBuilder()
+            constructor.event(evento, valor)
+        elif prefijo == 'asistencias' and evento == 'start_array':
+            yield 'campo', 'asistencias', None
+        elif prefijo and '.' not in prefijo and evento in ('string', 'number', 'boolean', 'null'):
+            yield 'campo', prefijo, valor
+
 @asistencia_individual_bp.route('/registrar', methods=['POST'])
 @login_required
 def registrar_asistencia():
     """
     Registra asistencia individual de estudiantes
-    Espera: { fecha: 'YYYY-MM-DD', asistencias: [{id_estudiante: 1, presente: true, observaciones: ''}] }
+    Espera: { fecha: 'YYYY-MM-DD', bloque: 'completo', asistencias: [{id_estudiante: 1, presente: true, observaciones: ''}] }
+    El bloque es opcional (default: completo). Las asistencias se escriben por lotes a medida
+    que se leen, en una sola transacción. Si fecha llega después de asistencias se acumula como
+    máximo un lote (LOTE_REGISTRO); un envío mayor debe enviar fecha y bloque antes de asistencias.
     """
     try:
-        data = request.get_json()
-        
-        if not data or 'fecha' not in data or 'asistencias' not in data:
-            return jsonify({'error': 'Datos incompletos'}), 400
-        
-        fecha_str = data['fecha']
-        asistencias_data = data['asistencias']
-        
-        # Convertir fecha
-        try:
-            fecha = datetime.strptime(fecha_str, '%Y-%m-%d').date()
-        except ValueError:
-            return jsonify({'error': 'Formato de fecha inválido. Use YYYY-MM-DD'}), 400
-        
+        fecha = None
+        bloque = None
+        bloque_escrito = None
+        recibio_asistencias = False
+        pendientes = []
         registros_creados = 0
         registros_actualizados = 0
         errores = []
-        
-        for asistencia_data in asistencias_data:
-            try:
-                id_estudiante = asistencia_data.get('id_estudiante')
-                presente = asistencia_data.get('presente', False)
-                observaciones = asistencia_data.get('observaciones', '')
-                
-                if not id_estudiante:
-                    continue
-                
-                # Verificar que el estudiante existe
-                estudiante = Estudiante.query.get(id_estudiante)
-                if not estudiante:
-                    errores.append(f'Estudiante {id_estudiante} no encontrado')
+        secciones_afectadas = set()
+
+        def escribir_lote():
+            nonlocal registros_creados, registros_actualizados, bloque_escrito
+            bloque_escrito = bloque or 'completo'
+            resultado = guardar_asistencias(
+                fecha, [(None, bloque_escrito, pendientes)], current_user.id_usuario, solo_activos=False
+            )[0]
+            registros_creados += resultado['creados']
+            registros_actualizados += resultado['actualizados']
+            errores.extend(resultado['errores'])
+            secciones_afectadas.update(resultado['secciones'])
+            pendientes.clear()
+
+        try:
+            for evento in _leer_registro():
+                if evento[0] == 'asistencia':
+                    # Sin fecha no se puede escribir: se acumula como máximo un lote
+                    if fecha is None and len(pendientes) >= LOTE_REGISTRO:
+                        db.session.rollback()
+                        return jsonify({
+                            'error': f'El campo fecha debe enviarse antes de asistencias (envíos de más de {LOTE_REGISTRO} registros)'
+                        }), 400
+                    pendientes.append(evento[1] if isinstance(evento[1], dict) else {})
+                    if fecha and len(pendientes) >= LOTE_REGISTRO:
+                        escribir_lote()
                     continue
-                
-                # Buscar asistencia existente
-                asistencia_existente = AsistenciaEstudiante.query.filter_by(
-                    id_estudiante=id_estudiante,
-                    fecha=fecha
-                ).first()
-                
-                if asistencia_existente:
-                    # Actualizar
-                    asistencia_existente.presente = presente
-                    asistencia_existente.observaciones = observaciones
-                    asistencia_existente.id_usuario = current_user.id_usuario
-                    registros_actualizados += 1
-                else:
-                    # Crear nuevo registro
-                    nueva_asistencia = AsistenciaEstudiante(
-                        id_estudiante=id_estudiante,
-                        fecha=fecha,
-                        presente=presente,
-                        observaciones=observaciones,
-                        id_usuario=current_user.id_usuario
-                    )
-                    db.session.add(nueva_asistencia)
-                    registros_creados += 1
-                    
-            except Exception as e:
-                errores.append(f'Error en estudiante {id_estudiante}: {str(e)}')
+
+                _, nombre, valor = evento
+                if nombre == 'asistencias':
+                    recibio_asistencias = True
+                elif nombre == 'fecha':
+                    # Convertir fecha
+                    try:
+                        fecha = datetime.strptime(str(valor), '%Y-%m-%d').date()
+                    except ValueError:
+                        db.session.rollback()
+                        return jsonify({'error': 'Formato de fecha inválido. Use YYYY-MM-DD'}), 400
+                elif nombre == 'bloque':
+                    if valor not in BLOQUES_VALIDOS:
+                        db.session.rollback()
+                        return jsonify({'error': 'Bloque inválido'}), 400
+                    if bloque_escrito and valor != bloque_escrito:
+                        db.session.rollback()
+                        return jsonify({'error': 'El campo bloque debe enviarse antes de asistencias'}), 400
+                    bloque = valor
+        except ijson.JSONError as e:
+            db.session.rollback()
+            return jsonify({'error': f'JSON inválido: {str(e)}'}), 400
+
+        if fecha is None or not recibio_asistencias:
+            db.session.rollback()
+            return jsonify({'error': 'Datos incompletos'}), 400
+
+        if pendientes:
+            escribir_lote()
+
+        # Mantener el resumen diario en la misma transacción
+        actualizar_resumen_secciones({id_seccion: [fecha] for id_seccion in secciones_afectadas})
         
         # Guardar cambios
         db.session.commit()
+        invalidar_estadisticas(fechas=[fecha], secciones=secciones_afectadas, bloque=bloque_escrito)
         
         return jsonify({
             'success': True,
@@ -410,21 +529,27 @@ def obtener_asistencia_seccion(fecha, id_seccion):
         except ValueError:
             return jsonify({'error': 'Formato de fecha inválido'}), 400
         
-        # Verificar sección
-        seccion = Seccion.query.get(id_seccion)
+        # Verificar sección (índice en memoria)
+        seccion = obtener_estructura(requeridas=[id_seccion]).get(id_seccion)
         if not seccion:
             return jsonify({'error': 'Sección no encontrada'}), 404
         
-        # Obtener estudiantes de la sección
-        estudiantes = Estudiante.query.filter_by(
-            id_seccion=id_seccion,
-            activo=True
-        ).order_by(Estudiante.apellido, Estudiante.nombre).all()
+        # Padrón de la sección desde la caché
+        estudiantes = obtener_padron(id_seccion)
         
         # Obtener asistencias del día
-        asistencias = AsistenciaEstudiante.query.filter_by(fecha=fecha_obj).filter(
-            AsistenciaEstudiante.id_estudiante.in_([e.id_estudiante for e in estudiantes])
-        ).all()
+        ids_estudiantes = [e[0] for e in estudiantes]
+        if modo_bitmap():
+            asistencias = leer_marcas(fechas=[fecha_obj], ids_estudiantes=ids_estudiantes, con_observaciones=True)
+        else:
+            asistencias = db.session.query(
+                AsistenciaEstudiante.id_estudiante,
+                AsistenciaEstudiante.presente,
+                AsistenciaEstudiante.observaciones
+            ).filter(
+                AsistenciaEstudiante.fecha == fecha_obj,
+                AsistenciaEstudiante.id_estudiante.in_(ids_estudiantes)
+            ).all() if estudiantes else []
         
         # Crear diccionario de asistencias
         asistencias_dict = {a.id_estudiante: a for a in asistencias}
@@ -433,18 +558,18 @@ def obtener_asistencia_seccion(fecha, id_seccion):
         resultado = []
         total_presentes = 0
         
-        for estudiante in estudiantes:
-            asistencia = asistencias_dict.get(estudiante.id_estudiante)
+        for id_estudiante, cedula, nombre_completo, genero in estudiantes:
+            asistencia = asistencias_dict.get(id_estudiante)
             presente = asistencia.presente if asistencia else False
             
             if presente:
                 total_presentes += 1
             
             resultado.append({
-                'id_estudiante': estudiante.id_estudiante,
-                'cedula': estudiante.cedula,
-                'nombre_completo': estudiante.nombre_completo,
-                'genero': estudiante.genero,
+                'id_estudiante': id_estudiante,
+                'cedula': cedula,
+                'nombre_completo': nombre_completo,
+                'genero': genero,
                 'presente': presente,
                 'observaciones': asistencia.observaciones if asistencia else '',
                 'registrado': asistencia is not None
@@ -454,7 +579,7 @@ def obtener_asistencia_seccion(fecha, id_seccion):
             'fecha': fecha,
             'seccion': {
                 'id': seccion.id_seccion,
-                'nombre': seccion.nombre_completo
+                'nombre': seccion.nombre
             },
             'total_estudiantes': len(estudiantes),
             'total_presentes': total_presentes,
@@ -502,21 +627,26 @@ def verificar_asistencia_existente():
 
         estudiantes_ids = [e.id_estudiante for e in estudiantes]
 
-        # Buscar asistencias existentes para este bloque
-        asistencias = AsistenciaEstudiante.query.filter(
-            AsistenciaEstudiante.fecha == fecha,
-            AsistenciaEstudiante.bloque == bloque,
-            AsistenciaEstudiante.id_estudiante.in_(estudiantes_ids)
-        ).all()
+        if modo_bitmap():
+            marcas = leer_marcas(fechas=[fecha], ids_estudiantes=estudiantes_ids, con_observaciones=True)
+            asistencias = [m for m in marcas if m.bloque == bloque]
+            bloques_registrados = list(dict.fromkeys(m.bloque for m in marcas))
+        else:
+            # Buscar asistencias existentes para este bloque
+            asistencias = AsistenciaEstudiante.query.filter(
+                AsistenciaEstudiante.fecha == fecha,
+                AsistenciaEstudiante.bloque == bloque,
+                AsistenciaEstudiante.id_estudiante.in_(estudiantes_ids)
+            ).all()
 
-        # Verificar qué bloques ya tienen asistencia registrada
-        bloques_registrados = db.session.query(
-            AsistenciaEstudiante.bloque
-        ).filter(
-            AsistenciaEstudiante.fecha == fecha,
-            AsistenciaEstudiante.id_estudiante.in_(estudiantes_ids)
-        ).distinct().all()
-        bloques_registrados = [b[0] for b in bloques_registrados]
+            # Verificar qué bloques ya tienen asistencia registrada
+            bloques_registrados = db.session.query(
+                AsistenciaEstudiante.bloque
+            ).filter(
+                AsistenciaEstudiante.fecha == fecha,
+                AsistenciaEstudiante.id_estudiante.in_(estudiantes_ids)
+            ).distinct().all()
+            bloques_registrados = [b[0] for b in bloques_registrados]
 
         if not asistencias:
             return jsonify({
@@ -547,7 +677,158 @@ def verificar_asistencia_existente():
     except Exception as e:
         return jsonify({'error': f'Error al verificar asistencia: {str(e)}'}), 500
 
+FilaPlanilla = namedtuple('FilaPlanilla', [
+    'id_estudiante', 'cedula', 'nombre', 'apellido', 'genero', 'bloque', 'presente', 'observaciones'
+])
+
+def _filas_planilla_bitmap(id_seccion, fecha):
+    """Mismas filas que el join de la planilla, leyendo las marcas de los mapas de bits"""
+    estudiantes = db.session.query(
+        Estudiante.id_estudiante,
+        Estudiante.cedula,
+        Estudiante.nombre,
+        Estudiante.apellido,
+        Estudiante.genero
+    ).filter(
+        Estudiante.id_seccion == id_seccion,
+        Estudiante.activo == True
+    ).order_by(Estudiante.apellido, Estudiante.nombre, Estudiante.id_estudiante).all()
+
+    marcas = defaultdict(list)
+    for marca in leer_marcas(fechas=[fecha], ids_estudiantes=[e.id_estudiante for e in estudiantes], con_observaciones=True):
+        marcas[marca.id_estudiante].append(marca)
+
+    filas = []
+    for e in estudiantes:
+        for marca in marcas.get(e.id_estudiante) or [None]:
+            filas.append(FilaPlanilla(
+                *e,
+                marca.bloque if marca else None,
+                marca.presente if marca else None,
+                marca.observaciones if marca else None
+            ))
+    return filas
+
+@asistencia_individual_bp.route('/planilla/<fecha>/<int:id_seccion>', methods=['GET'])
+@login_required
+def obtener_planilla_asistencia(fecha, id_seccion):
+    """
+    Planilla completa de una sección en una fecha: padrón, marcas de todos los bloques,
+    bloques registrados y observación de la sección
+    Reemplaza las llamadas a /estudiantes/seccion, /verificar y /observaciones/verificar
+    al abrir la pantalla de asistencia (dos consultas en total)
+    Query: bloque (default: completo) para los totales y la lista 'asistencias'
+    """
+    try:
+        try:
+            fecha_obj = datetime.strptime(fecha, '%Y-%m-%d').date()
+        except ValueError:
+            return jsonify({'error': 'Formato de fecha inválido'}), 400
+
+        bloque = request.args.get('bloque', 'completo')
+        if bloque not in BLOQUES_VALIDOS:
+            return jsonify({'error': 'Bloque inválido'}), 400
+
+        seccion = obtener_estructura(requeridas=[id_seccion]).get(id_seccion)
+        if not seccion:
+            return jsonify({'error': 'Sección no encontrada'}), 404
+
+        # Padrón y marcas del día en una sola consulta: una fila por (estudiante, bloque registrado)
+        if modo_bitmap():
+            filas = _filas_planilla_bitmap(id_seccion, fecha_obj)
+        else:
+            filas = db.session.query(
+                Estudiante.id_estudiante,
+                Estudiante.cedula,
+                Estudiante.nombre,
+                Estudiante.apellido,
+                Estudiante.genero,
+                AsistenciaEstudiante.bloque,
+                AsistenciaEstudiante.presente,
+                AsistenciaEstudiante.observaciones
+            ).outerjoin(
+                AsistenciaEstudiante, and_(
+                    AsistenciaEstudiante.id_estudiante == Estudiante.id_estudiante,
+                    AsistenciaEstudiante.fecha == fecha_obj
+                )
+            ).filter(
+                Estudiante.id_seccion == id_seccion,
+                Estudiante.activo == True
+            ).order_by(Estudiante.apellido, Estudiante.nombre, Estudiante.id_estudiante).all()
+
+        observacion = db.session.query(ObservacionSeccion.observaciones).filter_by(
+            id_seccion=id_seccion,
+            fecha=fecha_obj
+        ).first()
+
+        estudiantes = {}
+        registrados = set()
+        for fila in filas:
+            estudiante = estudiantes.get(fila.id_estudiante)
+            if estudiante is None:
+                estudiante = estudiantes[fila.id_estudiante] = {
+                    'id_estudiante': fila.id_estudiante,
+                    'cedula': fila.cedula,
+                    'nombre_completo': f"{fila.nombre} {fila.apellido}",
+                    'genero': fila.genero,
+                    'marcas': {}
+                }
+            if fila.bloque:
+                registrados.add(fila.bloque)
+                estudiante['marcas'][fila.bloque] = {
+                    'presente': bool(fila.presente),
+                    'observaciones': fila.observaciones or ''
+                }
+
+        asistencias = [{
+            'id_estudiante': e['id_estudiante'],
+            'presente': e['marcas'][bloque]['presente'],
+            'observaciones': e['marcas'][bloque]['observaciones']
+        } for e in estudiantes.values() if bloque in e['marcas']]
+        total_presentes = sum(1 for a in asistencias if a['presente'])
+
+        return jsonify({
+            'fecha': fecha,
+            'bloque': bloque,
+            'seccion': {
+                'id': seccion.id_seccion,
+                'nombre': seccion.nombre
+            },
+            'total_estudiantes': len(estudiantes),
+            'estudiantes': list(estudiantes.values()),
+            'bloques_registrados': [b for b in BLOQUES_VALIDOS if b in registrados],
+            'existe': bool(asistencias),
+            'total_presentes': total_presentes,
+            'total_ausentes': len(estudiantes) - total_presentes,
+            'asistencias': asistencias,
+            'observacion': {
+                'existe': observacion is not None,
+                'observaciones': (observacion.observaciones or '') if observacion else ''
+            }
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': f'Error al obtener planilla: {str(e)}'}), 500
+
+def _encolar_asistencia(cola, fecha, grupos, data):
+    """Encola un envío ya validado y responde 202 con la URL para consultar su estado"""
+    clave = request.headers.get('Idempotency-Key') or data.get('clave_idempotencia')
+    id_envio, duplicado = cola.encolar(
+        {'fecha': fecha.isoformat(), 'grupos': [list(g) for g in grupos]},
+        current_user.id_usuario,
+        clave
+    )
+    return jsonify({
+        'success': True,
+        'encolado': True,
+        'duplicado': duplicado,
+        'id_envio': id_envio,
+        'message': 'Asistencia recibida; se guardará en unos segundos',
+        'estado_url': url_for('asistencia_individual.estado_envio_asistencia', id_envio=id_envio)
+    }), 202
+
 @asistencia_individual_bp.route('/guardar', methods=['POST'])
+@idempotente
 @login_required
 def guardar_asistencia_individual():
     """
@@ -557,7 +838,7 @@ def guardar_asistencia_individual():
     try:
         data = request.get_json()
 
-        if not data or 'fecha' not in data or 'id_seccion' not in data or 'asistencias' not in data:
+        if not isinstance(data, dict) or 'fecha' not in data or 'id_seccion' not in data or 'asistencias' not in data:
             return jsonify({'error': 'Datos incompletos'}), 400
 
         fecha_str = data['fecha']
@@ -570,73 +851,46 @@ def guardar_asistencia_individual():
         if bloque not in bloques_validos:
             return jsonify({'error': 'Bloque inválido'}), 400
 
-        # Convertir fecha
+        # Convertir fecha (TypeError si no es texto)
         try:
             fecha = datetime.strptime(fecha_str, '%Y-%m-%d').date()
-        except ValueError:
+        except (TypeError, ValueError):
             return jsonify({'error': 'Formato de fecha inválido'}), 400
 
+        # Validar la forma antes de encolar: un envío confirmado no debe fallar después en el worker
+        if not isinstance(asistencias_data, list) or not all(isinstance(a, dict) for a in asistencias_data):
+            return jsonify({'error': 'asistencias debe ser una lista de objetos {id_estudiante, presente}'}), 400
+
+        # Modo de escritura diferida: validar, encolar y confirmar de inmediato
+        cola = obtener_cola()
+        if cola is not None:
+            try:
+                id_seccion = int(id_seccion)
+            except (TypeError, ValueError):
+                return jsonify({'error': 'Sección no encontrada'}), 404
+            if id_seccion not in obtener_estructura(requeridas=[id_seccion]):
+                return jsonify({'error': 'Sección no encontrada'}), 404
+            return _encolar_asistencia(cola, fecha, [(id_seccion, bloque, asistencias_data)], data)
+
         # Verificar sección
         seccion = Seccion.query.get(id_seccion)
         if not seccion:
             return jsonify({'error': 'Sección no encontrada'}), 404
 
-        registros_creados = 0
-        registros_actualizados = 0
-        errores = []
-
-        for asistencia_data in asistencias_data:
-            try:
-                id_estudiante = asistencia_data.get('id_estudiante')
-                presente = asistencia_data.get('presente', False)
-                observaciones = asistencia_data.get('observaciones', '')
-
-                if not id_estudiante:
-                    continue
-
-                # Verificar que el estudiante existe y pertenece a la sección
-                estudiante = Estudiante.query.filter_by(
-                    id_estudiante=id_estudiante,
-                    id_seccion=id_seccion,
-                    activo=True
-                ).first()
+        # Pertenencia y registros existentes en una consulta; escritura con un solo upsert
+        resultado = guardar_asistencias(fecha, [(seccion.id_seccion, bloque, asistencias_data)], current_user.id_usuario)[0]
+        registros_creados = resultado['creados']
+        registros_actualizados = resultado['actualizados']
+        errores = resultado['errores']
 
-                if not estudiante:
-                    errores.append(f'Estudiante {id_estudiante} no encontrado en esta sección')
-                    continue
-
-                # Buscar asistencia existente para este bloque
-                asistencia_existente = AsistenciaEstudiante.query.filter_by(
-                    id_estudiante=id_estudiante,
-                    fecha=fecha,
-                    bloque=bloque
-                ).first()
-
-                if asistencia_existente:
-                    # Actualizar
-                    asistencia_existente.presente = presente
-                    asistencia_existente.observaciones = observaciones
-                    asistencia_existente.id_usuario = current_user.id_usuario
-                    registros_actualizados += 1
-                else:
-                    # Crear nuevo registro
-                    nueva_asistencia = AsistenciaEstudiante(
-                        id_estudiante=id_estudiante,
-                        fecha=fecha,
-                        bloque=bloque,
-                        presente=presente,
-                        observaciones=observaciones,
-                        id_usuario=current_user.id_usuario
-                    )
-                    db.session.add(nueva_asistencia)
-                    registros_creados += 1
-
-            except Exception as e:
-                errores.append(f'Error procesando estudiante {id_estudiante}: {str(e)}')
-                continue
+        # Mantener el resumen diario en la misma transacción
+        if registros_creados or registros_actualizados:
+            actualizar_resumen(seccion.id_seccion, [fecha])
 
         # Guardar cambios
         db.session.commit()
+        if registros_creados or registros_actualizados:
+            invalidar_estadisticas(fechas=[fecha], secciones=[seccion.id_seccion], bloque=bloque)
 
         mensaje = f'Asistencia guardada: {registros_creados} nuevos, {registros_actualizados} actualizados'
         if errores:
@@ -657,12 +911,209 @@ def guardar_asistencia_individual():
             'error': f'Error al guardar asistencia: {str(e)}'
         }), 500
 
+@asistencia_individual_bp.route('/guardar-lote', methods=['POST'])
+@idempotente
+@login_required
+def guardar_asistencia_lote():
+    """
+    Guarda la asistencia de varias secciones y bloques de una fecha en una sola transacción
+    Espera: { fecha: 'YYYY-MM-DD', grupos: [{id_seccion: 1, bloque: 'bloque_1', asistencias: [{id_estudiante: 1, presente: true}]}] }
+    """
+    try:
+        data = request.get_json()
+
+        if not isinstance(data, dict) or 'fecha' not in data or not isinstance(data.get('grupos'), list) or not data['grupos']:
+            return jsonify({'error': 'Datos incompletos'}), 400
+
+        # Convertir fecha (TypeError si no es texto)
+        try:
+            fecha = datetime.strptime(data['fecha'], '%Y-%m-%d').date()
+        except (TypeError, ValueError):
+            return jsonify({'error': 'Formato de fecha inválido'}), 400
+
+        # Validar todos los grupos antes de escribir
+        grupos = []
+        for grupo in data['grupos']:
+            if not isinstance(grupo, dict):
+                return jsonify({'error': 'Cada grupo debe ser un objeto con id_seccion, bloque y asistencias'}), 400
+            asistencias = grupo.get('asistencias') or []
+            if not isinstance(asistencias, list) or not all(isinstance(a, dict) for a in asistencias):
+                return jsonify({'error': 'asistencias debe ser una lista de objetos {id_estudiante, presente}'}), 400
+            bloque = grupo.get('bloque', 'completo')
+            if bloque not in BLOQUES_VALIDOS:
+                return jsonify({'error': f'Bloque inválido: {bloque}'}), 400
+            try:
+                id_seccion = int(grupo.get('id_seccion'))
+            except (TypeError, ValueError):
+                return jsonify({'error': 'Cada grupo requiere un id_seccion válido'}), 400
+            grupos.append((id_seccion, bloque, asistencias))
+
+        ids_secciones = {id_seccion for id_seccion, _, _ in grupos}
+        estructura = obtener_estructura(requeridas=ids_secciones)
+        no_encontradas = sorted(s for s in ids_secciones if s not in estructura)
+        if no_encontradas:
+            return jsonify({'error': f'Secciones no encontradas: {", ".join(map(str, no_encontradas))}'}), 404
+
+        # Asignaciones del profesor validadas una sola vez para todo el lote
+        if not current_user.is_admin:
+            asignadas = {a.id_seccion for a in db.session.query(ProfesorSeccion.id_seccion).filter(
+                ProfesorSeccion.id_profesor == current_user.id_usuario,
+                ProfesorSeccion.id_seccion.in_(ids_secciones)
+            ).all()}
+            no_asignadas = sorted(ids_secciones - asignadas)
+            if no_asignadas:
+                return jsonify({'error': f'Secciones no asignadas: {", ".join(map(str, no_asignadas))}'}), 403
+
+        # Modo de escritura diferida: encolar y confirmar de inmediato
+        cola = obtener_cola()
+        if cola is not None:
+            return _encolar_asistencia(cola, fecha, grupos, data)
+
+        resultados = guardar_asistencias(fecha, grupos, current_user.id_usuario)
+
+        # Mantener el resumen diario en la misma transacción
+        modificados = [
+            (id_seccion, bloque) for (id_seccion, bloque, _), r in zip(grupos, resultados)
+            if r['creados'] or r['actualizados']
+        ]
+        actualizar_resumen_secciones({id_seccion: [fecha] for id_seccion, _ in modificados})
+
+        # Guardar cambios
+        db.session.commit()
+        if modificados:
+            bloques = {bloque for _, bloque in modificados}
+            invalidar_estadisticas(
+                fechas=[fecha],
+                secciones={id_seccion for id_seccion, _ in modificados},
+                bloque=bloques.pop() if len(bloques) == 1 else None
+            )
+
+        total_creados = sum(r['creados'] for r in resultados)
+        total_actualizados = sum(r['actualizados'] for r in resultados)
+        total_errores = sum(len(r['errores']) for r in resultados)
+
+        mensaje = f'Asistencia guardada: {total_creados} nuevos, {total_actualizados} actualizados'
+        if total_errores:
+            mensaje += f'. {total_errores} errores'
+
+        return jsonify({
+            'success': True,
+            'message': mensaje,
+            'registros_creados': total_creados,
+            'registros_actualizados': total_actualizados,
+            'grupos': [{
+                'id_seccion': id_seccion,
+                'bloque': bloque,
+                'registros_creados': r['creados'],
+                'registros_actualizados': r['actualizados'],
+                'errores': r['errores']
+            } for (id_seccion, bloque, _), r in zip(grupos, resultados)]
+        }), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'error': f'Error al guardar asistencia: {str(e)}'
+        }), 500
+
+@asistencia_individual_bp.route('/cola/<id_envio>', methods=['GET'])
+@login_required
+def estado_envio_asistencia(id_envio):
+    """
+    Consulta el estado de un envío de la cola de escritura diferida
+    Estados: pendiente, procesando, procesado (con el resultado por grupo) o error
+    """
+    cola = obtener_cola()
+    if cola is None:
+        return jsonify({'error': 'La cola de asistencia no está habilitada'}), 404
+
+    envio = cola.estado(id_envio)
+    if not envio or (envio['id_usuario'] != current_user.id_usuario and not current_user.is_admin):
+        return jsonify({'error': 'Envío no encontrado'}), 404
+
+    return jsonify(envio), 200
+
+@asistencia_individual_bp.route('/cola', methods=['GET'])
+@login_required
+@admin_required
+def metricas_cola_asistencia():
+    """Cantidad de envíos por estado en la cola de escritura diferida"""
+    cola = obtener_cola()
+    if cola is None:
+        return jsonify({'habilitada': False}), 200
+    return jsonify({'habilitada': True, **cola.metricas()}), 200
+
+def _estadisticas_asistencia_secciones(ids_secciones, fecha_inicio, fecha_fin):
+    """
+    Totales de asistencia por sección con dos agregados (matrícula y registros),
+    sin materializar estudiantes ni registros de asistencia
+    """
+    estadisticas = {id_seccion: {
+        'total_estudiantes': 0, 'total_registros': 0, 'total_presentes': 0
+    } for id_seccion in ids_secciones}
+
+    matricula = db.session.query(
+        Estudiante.id_seccion, func.count(Estudiante.id_estudiante)
+    ).filter(
+        Estudiante.id_seccion.in_(ids_secciones),
+        Estudiante.activo == True
+    ).group_by(Estudiante.id_seccion).all()
+
+    for id_seccion, total in matricula:
+        estadisticas[id_seccion]['total_estudiantes'] = total
+
+    if modo_bitmap():
+        seccion_de = dict(db.session.query(Estudiante.id_estudiante, Estudiante.id_seccion).filter(
+            Estudiante.id_seccion.in_(ids_secciones),
+            Estudiante.activo == True
+        ).all())
+        for id_estudiante, (registros, presentes) in totales_por_estudiante(
+                fecha_inicio, fecha_fin, ids_estudiantes=seccion_de).items():
+            estadisticas[seccion_de[id_estudiante]]['total_registros'] += registros
+            estadisticas[seccion_de[id_estudiante]]['total_presentes'] += presentes
+        return _completar_estadisticas(estadisticas)
+
+    asistencia = asistencia_para_rango(fecha_inicio, fecha_fin)
+    query = db.session.query(
+        Estudiante.id_seccion,
+        func.count(asistencia.id_asistencia_estudiante),
+        func.sum(case((asistencia.presente == True, 1), else_=0))
+    ).join(
+        Estudiante, asistencia.id_estudiante == Estudiante.id_estudiante
+    ).filter(
+        Estudiante.id_seccion.in_(ids_secciones),
+        Estudiante.activo == True
+    )
+
+    if fecha_inicio:
+        query = query.filter(asistencia.fecha >= fecha_inicio)
+    if fecha_fin:
+        query = query.filter(asistencia.fecha <= fecha_fin)
+
+    for id_seccion, registros, presentes in query.group_by(Estudiante.id_seccion).all():
+        estadisticas[id_seccion]['total_registros'] = registros
+        estadisticas[id_seccion]['total_presentes'] = int(presentes or 0)
+
+    return _completar_estadisticas(estadisticas)
+
+def _completar_estadisticas(estadisticas):
+    """Agrega ausentes y porcentaje de asistencia a los totales por sección"""
+    for datos in estadisticas.values():
+        datos['total_ausentes'] = datos['total_registros'] - datos['total_presentes']
+        datos['porcentaje_asistencia'] = round(
+            (datos['total_presentes'] / datos['total_registros'] * 100) if datos['total_registros'] > 0 else 0, 2
+        )
+
+    return estadisticas
+
+@asistencia_individual_bp.route('/estadisticas', methods=['GET'])
 @asistencia_individual_bp.route('/estadisticas/<int:id_seccion>', methods=['GET'])
 @login_required
-def obtener_estadisticas_asistencia(id_seccion):
+def obtener_estadisticas_asistencia(id_seccion=None):
     """
-    Obtiene estadísticas de asistencia de una sección
-    Query params: fecha_inicio, fecha_fin
+    Obtiene estadísticas de asistencia de una o varias secciones
+    Query params: fecha_inicio, fecha_fin, secciones (ej: 1,2,3 cuando no se indica id_seccion)
     """
     try:
         fecha_inicio = request.args.get('fecha_inicio')
@@ -673,48 +1124,210 @@ def obtener_estadisticas_asistencia(id_seccion):
             fecha_inicio = datetime.strptime(fecha_inicio, '%Y-%m-%d').date()
         if fecha_fin:
             fecha_fin = datetime.strptime(fecha_fin, '%Y-%m-%d').date()
-        
-        # Verificar sección
-        seccion = Seccion.query.get(id_seccion)
-        if not seccion:
+
+        if id_seccion is not None:
+            ids_secciones = [id_seccion]
+        else:
+            try:
+                ids_secciones = list(dict.fromkeys(
+                    int(s) for s in request.args.get('secciones', '').split(',') if s.strip()
+                ))
+            except ValueError:
+                return jsonify({'error': 'secciones debe ser una lista de IDs separados por coma'}), 400
+            if not ids_secciones:
+                return jsonify({'error': 'Debe indicar al menos una sección'}), 400
+
+        # Verificar secciones
+        estructura = obtener_estructura(requeridas=ids_secciones)
+        no_encontradas = [s for s in ids_secciones if s not in estructura]
+        if id_seccion is not None and no_encontradas:
             return jsonify({'error': 'Sección no encontrada'}), 404
-        
-        # Obtener estudiantes
-        estudiantes = Estudiante.query.filter_by(
-            id_seccion=id_seccion,
-            activo=True
-        ).all()
-        
-        estudiantes_ids = [e.id_estudiante for e in estudiantes]
-        
-        # Query base de asistencias
-        query = AsistenciaEstudiante.query.filter(
-            AsistenciaEstudiante.id_estudiante.in_(estudiantes_ids)
-        )
-        
-        if fecha_inicio:
-            query = query.filter(AsistenciaEstudiante.fecha >= fecha_inicio)
-        if fecha_fin:
-            query = query.filter(AsistenciaEstudiante.fecha <= fecha_fin)
-        
-        asistencias = query.all()
-        
-        # Calcular estadísticas
-        total_registros = len(asistencias)
-        total_presentes = sum(1 for a in asistencias if a.presente)
-        total_ausentes = total_registros - total_presentes
-        
-        return jsonify({
+        if no_encontradas:
+            return jsonify({'error': f'Secciones no encontradas: {", ".join(map(str, no_encontradas))}'}), 404
+
+        estadisticas = _estadisticas_asistencia_secciones(ids_secciones, fecha_inicio, fecha_fin)
+        resultado = [{
             'seccion': {
-                'id': seccion.id_seccion,
-                'nombre': seccion.nombre_completo
+                'id': id_seccion,
+                'nombre': estructura.get(id_seccion).nombre
             },
-            'total_estudiantes': len(estudiantes),
+            **estadisticas[id_seccion]
+        } for id_seccion in ids_secciones]
+
+        if id_seccion is not None:
+            return jsonify(resultado[0]), 200
+
+        total_registros = sum(r['total_registros'] for r in resultado)
+        total_presentes = sum(r['total_presentes'] for r in resultado)
+        return jsonify({
+            'secciones': resultado,
+            'total_estudiantes': sum(r['total_estudiantes'] for r in resultado),
             'total_registros': total_registros,
             'total_presentes': total_presentes,
-            'total_ausentes': total_ausentes,
+            'total_ausentes': total_registros - total_presentes,
             'porcentaje_asistencia': round((total_presentes / total_registros * 100) if total_registros > 0 else 0, 2)
         }), 200
         
     except Exception as e:
         return jsonify({'error': f'Error al obtener estadísticas: {str(e)}'}), 500
+
+@asistencia_individual_bp.route('/reporte-ausentismo', methods=['GET'])
+@login_required
+@admin_required
+def reporte_ausentismo():
+    """
+    Reporte de porcentaje de asistencia por estudiante para todo el colegio
+    Query params: fecha_inicio, fecha_fin (default: inicio del año escolar hasta hoy),
+    umbral (solo estudiantes con porcentaje menor), etapa, seccion, bloque,
+    orden (porcentaje | ausencias | apellido), pagina, por_pagina
+    """
+    try:
+        hoy = date.today()
+        try:
+            fecha_fin = datetime.strptime(request.args['fecha_fin'], '%Y-%m-%d').date() \
+                if request.args.get('fecha_fin') else hoy
+            fecha_inicio = datetime.strptime(request.args['fecha_inicio'], '%Y-%m-%d').date() \
+                if request.args.get('fecha_inicio') else date(fecha_fin.year if fecha_fin.month >= 9 else fecha_fin.year - 1, 9, 1)
+            umbral = float(request.args['umbral']) if request.args.get('umbral') else None
+            pagina = max(int(request.args.get('pagina', 1)), 1)
+            por_pagina = min(max(int(request.args.get('por_pagina', 50)), 1), 500)
+        except ValueError:
+            return jsonify({'error': 'Parámetros inválidos. Fechas en formato YYYY-MM-DD; umbral, pagina y por_pagina numéricos'}), 400
+
+        orden = request.args.get('orden', 'porcentaje')
+        if orden not in ('porcentaje', 'ausencias', 'apellido'):
+            return jsonify({'error': 'orden debe ser porcentaje, ausencias o apellido'}), 400
+
+        etapa = request.args.get('etapa', '')
+        seccion_id = request.args.get('seccion', '')
+        bloque = request.args.get('bloque', '')
+
+        if modo_bitmap():
+            filas, total = _reporte_ausentismo_bitmap(
+                fecha_inicio, fecha_fin, etapa, seccion_id, bloque, umbral, orden, pagina, por_pagina
+            )
+            return _respuesta_reporte_ausentismo(fecha_inicio, fecha_fin, umbral, orden, pagina, por_pagina, filas, total)
+
+        # Un solo agregado agrupado por estudiante; el total de filas sale de una función de ventana
+        asistencia = asistencia_para_rango(fecha_inicio, fecha_fin)
+        total_registros = func.count(asistencia.id_asistencia_estudiante)
+        total_presentes = func.sum(case((asistencia.presente == True, 1), else_=0))
+        porcentaje = total_presentes * 100.0 / total_registros
+
+        query = db.session.query(
+            Estudiante.id_estudiante,
+            Estudiante.cedula,
+            Estudiante.nombre,
+            Estudiante.apellido,
+            Estudiante.genero,
+            Estudiante.id_seccion,
+            total_registros.label('total_registros'),
+            total_presentes.label('total_presentes'),
+            func.count().over().label('total_filas')
+        ).join(
+            asistencia, asistencia.id_estudiante == Estudiante.id_estudiante
+        ).filter(
+            Estudiante.activo == True,
+            asistencia.fecha >= fecha_inicio,
+            asistencia.fecha <= fecha_fin
+        )
+
+        if etapa or seccion_id:
+            query = query.filter(Estudiante.id_seccion.in_(obtener_estructura().ids_secciones(etapa, seccion_id)))
+        if bloque:
+            query = query.filter(asistencia.bloque == bloque)
+
+        query = query.group_by(
+            Estudiante.id_estudiante, Estudiante.cedula, Estudiante.nombre,
+            Estudiante.apellido, Estudiante.genero, Estudiante.id_seccion
+        )
+        if umbral is not None:
+            query = query.having(porcentaje < umbral)
+
+        if orden == 'ausencias':
+            query = query.order_by((total_registros - total_presentes).desc(), Estudiante.apellido, Estudiante.nombre, Estudiante.id_estudiante)
+        elif orden == 'apellido':
+            query = query.order_by(Estudiante.apellido, Estudiante.nombre, Estudiante.id_estudiante)
+        else:
+            query = query.order_by(porcentaje, Estudiante.apellido, Estudiante.nombre, Estudiante.id_estudiante)
+
+        filas = query.limit(por_pagina).offset((pagina - 1) * por_pagina).all()
+        total = filas[0].total_filas if filas else (0 if pagina == 1 else query.count())
+
+        return _respuesta_reporte_ausentismo(fecha_inicio, fecha_fin, umbral, orden, pagina, por_pagina, filas, total)
+
+    except Exception as e:
+        return jsonify({'error': f'Error al generar el reporte de ausentismo: {str(e)}'}), 500
+
+FilaAusentismo = namedtuple('FilaAusentismo', [
+    'id_estudiante', 'cedula', 'nombre', 'apellido', 'genero', 'id_seccion', 'total_registros', 'total_presentes'
+])
+
+def _reporte_ausentismo_bitmap(fecha_inicio, fecha_fin, etapa, seccion_id, bloque, umbral, orden, pagina, por_pagina):
+    """Versión del reporte para el modo bitmap: agrega las marcas por estudiante en Python"""
+    query = db.session.query(
+        Estudiante.id_estudiante,
+        Estudiante.cedula,
+        Estudiante.nombre,
+        Estudiante.apellido,
+        Estudiante.genero,
+        Estudiante.id_seccion
+    ).filter(Estudiante.activo == True)
+    if etapa or seccion_id:
+        query = query.filter(Estudiante.id_seccion.in_(obtener_estructura().ids_secciones(etapa, seccion_id)))
+    estudiantes = {e.id_estudiante: e for e in query.all()}
+
+    totales = totales_por_estudiante(
+        fecha_inicio, fecha_fin, bloques=[bloque] if bloque else None, ids_estudiantes=estudiantes
+    )
+    filas = [
+        FilaAusentismo(*estudiantes[id_estudiante], registros, presentes)
+        for id_estudiante, (registros, presentes) in totales.items()
+        if umbral is None or presentes * 100.0 / registros < umbral
+    ]
+
+    if orden == 'ausencias':
+        filas.sort(key=lambda f: (-(f.total_registros - f.total_presentes), f.apellido, f.nombre, f.id_estudiante))
+    elif orden == 'apellido':
+        filas.sort(key=lambda f: (f.apellido, f.nombre, f.id_estudiante))
+    else:
+        filas.sort(key=lambda f: (f.total_presentes * 100.0 / f.total_registros, f.apellido, f.nombre, f.id_estudiante))
+
+    inicio = (pagina - 1) * por_pagina
+    return filas[inicio:inicio + por_pagina], len(filas)
+
+def _respuesta_reporte_ausentismo(fecha_inicio, fecha_fin, umbral, orden, pagina, por_pagina, filas, total):
+    """Arma la respuesta JSON del reporte de ausentismo a partir de una página de filas"""
+    estructura = obtener_estructura(requeridas={f.id_seccion for f in filas})
+    estudiantes = []
+    for f in filas:
+        info = estructura.get(f.id_seccion)
+        presentes = int(f.total_presentes or 0)
+        estudiantes.append({
+            'id_estudiante': f.id_estudiante,
+            'cedula': f.cedula,
+            'nombre': f.nombre,
+            'apellido': f.apellido,
+            'genero': f.genero,
+            'seccion': {
+                'id': f.id_seccion,
+                'nombre': info.nombre_completo if info else None
+            },
+            'total_registros': f.total_registros,
+            'total_presentes': presentes,
+            'total_ausentes': f.total_registros - presentes,
+            'porcentaje_asistencia': round(presentes / f.total_registros * 100, 2)
+        })
+
+    return jsonify({
+        'fecha_inicio': fecha_inicio.isoformat(),
+        'fecha_fin': fecha_fin.isoformat(),
+        'umbral': umbral,
+        'orden': orden,
+        'pagina': pagina,
+        'por_pagina': por_pagina,
+        'total': total,
+        'total_paginas': (total + por_pagina - 1) // por_pagina,
+        'estudiantes': estudiantes
+    }), 200
+
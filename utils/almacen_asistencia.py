@@ -0,0 +1,383 @@
+"""
+Almacenamiento compacto de asistencia_estudiante (modo bitmap)
+En lugar de una fila por estudiante, fecha y bloque, se guarda una fila por
+(sección, fecha, bloque) con dos mapas de bits empaquetados (registrados y presentes)
+y las observaciones no vacías en la tabla observacion_asistencia.
+
+El bit i de cada mapa corresponde al estudiante base_estudiante + i; como los IDs de una
+sección suelen ser contiguos (se cargan juntos desde Excel), cada mapa ocupa pocos bytes.
+
+Se activa con ASISTENCIA_ALMACEN=bitmap (default: filas). Las rutas y el resumen diario
+consultan este adaptador cuando el modo está activo, por lo que la API no cambia.
+El último usuario que registra una (sección, fecha, bloque) queda como id_usuario de la fila.
+
+Concurrencia: una escritura crea con upsert los mapas que faltan y bloquea (FOR UPDATE) solo los
+de sus secciones y los de la sección anterior de estudiantes que se cambiaron. Las lecturas por
+estudiante filtran en SQL los mapas cuyo rango de IDs puede contenerlos y solo prueban sus bits.
+
+Para pasar los datos existentes al modo bitmap: python convertir_asistencia_bitmap.py
+"""
+
+import os
+from collections import namedtuple, defaultdict
+from datetime import datetime
+
+from sqlalchemy import func
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import db, Estudiante, AsistenciaEstudiante, AsistenciaBitmap, ObservacionAsistencia
+
+MODOS = ('filas', 'bitmap')
+
+Marca = namedtuple('Marca', ['id_estudiante', 'fecha', 'bloque', 'presente', 'observaciones', 'id_usuario'])
+
+
+def modo_bitmap():
+    return os.environ.get('ASISTENCIA_ALMACEN', 'filas') == 'bitmap'
+
+
+def empaquetar(estados):
+    """
+    Empaqueta {id_estudiante: presente} en (base_estudiante, registrados, presentes)
+    """
+    base = min(estados)
+    registrados = presentes = 0
+    for id_estudiante, presente in estados.items():
+        bit = 1 << (id_estudiante - base)
+        registrados |= bit
+        if presente:
+            presentes |= bit
+    largo = (max(estados) - base) // 8 + 1
+    return base, registrados.to_bytes(largo, 'little'), presentes.to_bytes(largo, 'little')
+
+
+def desempaquetar(base, registrados, presentes):
+    """Inversa de empaquetar: devuelve {id_estudiante: presente}"""
+    pendientes = int.from_bytes(registrados, 'little')
+    presentes = int.from_bytes(presentes, 'little')
+    estados = {}
+    while pendientes:
+        bit = pendientes & -pendientes
+        estados[base + bit.bit_length() - 1] = bool(presentes & bit)
+        pendientes ^= bit
+    return estados
+
+
+def _marcas_de(base, registrados, presentes, ids=None):
+    """
+    {id_estudiante: presente} de un mapa; con ids solo se prueban los bits de esos estudiantes
+    (más barato que desempaquetar el mapa completo cuando son pocos)
+    """
+    if ids is None or len(ids) * 4 > len(registrados) * 8:
+        estados = desempaquetar(base, registrados, presentes)
+        return estados if ids is None else {i: p for i, p in estados.items() if i in ids}
+
+    bits = len(registrados) * 8
+    registrados = int.from_bytes(registrados, 'little')
+    presentes = int.from_bytes(presentes, 'little')
+    estados = {}
+    for id_estudiante in ids:
+        desplazamiento = id_estudiante - base
+        if 0 <= desplazamiento < bits and registrados >> desplazamiento & 1:
+            estados[id_estudiante] = bool(presentes >> desplazamiento & 1)
+    return estados
+
+
+def _cubre(query, ids):
+    """Solo los mapas cuyo rango de bits [base, base + 8 * bytes) puede incluir a los estudiantes"""
+    return query.filter(
+        AsistenciaBitmap.base_estudiante <= max(ids),
+        AsistenciaBitmap.base_estudiante + func.length(AsistenciaBitmap.registrados) * 8 > min(ids)
+    )
+
+
+def _filtrar(query, modelo, fecha_inicio=None, fecha_fin=None, fechas=None, bloques=None):
+    if fecha_inicio:
+        query = query.filter(modelo.fecha >= fecha_inicio)
+    if fecha_fin:
+        query = query.filter(modelo.fecha <= fecha_fin)
+    if fechas is not None:
+        query = query.filter(modelo.fecha.in_(list(fechas)))
+    if bloques is not None:
+        query = query.filter(modelo.bloque.in_(list(bloques)))
+    return query
+
+
+def leer_marcas(fecha_inicio=None, fecha_fin=None, fechas=None, bloques=None,
+                ids_estudiantes=None, con_observaciones=False):
+    """
+    Marcas de asistencia guardadas en modo bitmap
+
+    Args:
+        fecha_inicio, fecha_fin: Rango de fechas (opcional)
+        fechas: Fechas exactas (opcional)
+        bloques: Bloques a incluir (None = todos)
+        ids_estudiantes: Limita el resultado a estos estudiantes (None = todos)
+        con_observaciones: Si True, carga también las observaciones por estudiante
+
+    Returns:
+        list: Marca(id_estudiante, fecha, bloque, presente, observaciones, id_usuario)
+    """
+    ids = set(ids_estudiantes) if ids_estudiantes is not None else None
+    if ids is not None and not ids:
+        return []
+
+    query = _filtrar(db.session.query(
+        AsistenciaBitmap.fecha,
+        AsistenciaBitmap.bloque,
+        AsistenciaBitmap.base_estudiante,
+        AsistenciaBitmap.registrados,
+        AsistenciaBitmap.presentes,
+        AsistenciaBitmap.id_usuario
+    ), AsistenciaBitmap, fecha_inicio, fecha_fin, fechas, bloques)
+    if ids is not None:
+        query = _cubre(query, ids)
+    mapas = query.all()
+
+    observaciones = {}
+    if con_observaciones and mapas:
+        query = _filtrar(db.session.query(
+            ObservacionAsistencia.id_estudiante,
+            ObservacionAsistencia.fecha,
+            ObservacionAsistencia.bloque,
+            ObservacionAsistencia.observaciones
+        ), ObservacionAsistencia, fecha_inicio, fecha_fin, fechas, bloques)
+        if ids is not None:
+            query = query.filter(ObservacionAsistencia.id_estudiante.in_(ids))
+        observaciones = {(o.id_estudiante, o.fecha, o.bloque): o.observaciones for o in query.all()}
+
+    marcas = []
+    for mapa in mapas:
+        for id_estudiante, presente in _marcas_de(mapa.base_estudiante, mapa.registrados, mapa.presentes, ids).items():
+            marcas.append(Marca(
+                id_estudiante, mapa.fecha, mapa.bloque, presente,
+                observaciones.get((id_estudiante, mapa.fecha, mapa.bloque), ''),
+                mapa.id_usuario
+            ))
+    return marcas
+
+
+def totales_por_estudiante(fecha_inicio=None, fecha_fin=None, bloques=None, ids_estudiantes=None):
+    """
+    Registros y presentes por estudiante en el rango
+
+    Returns:
+        dict: id_estudiante -> [total_registros, total_presentes]
+    """
+    totales = defaultdict(lambda: [0, 0])
+    for marca in leer_marcas(fecha_inicio, fecha_fin, bloques=bloques, ids_estudiantes=ids_estudiantes):
+        total = totales[marca.id_estudiante]
+        total[0] += 1
+        if marca.presente:
+            total[1] += 1
+    return totales
+
+
+def registros_existentes(fecha, ids_estudiantes, bloques):
+    """Claves (id_estudiante, bloque) que ya tienen marca en la fecha"""
+    return {
+        (m.id_estudiante, m.bloque)
+        for m in leer_marcas(fechas=[fecha], bloques=bloques, ids_estudiantes=ids_estudiantes)
+    }
+
+
+def _escribir_observaciones(fecha, filas):
+    """Guarda las observaciones no vacías y borra las que quedaron vacías"""
+    ids = {f['id_estudiante'] for f in filas}
+    bloques = {f['bloque'] for f in filas}
+    actuales = {
+        (o.id_estudiante, o.bloque): o
+        for o in ObservacionAsistencia.query.filter(
+            ObservacionAsistencia.fecha == fecha,
+            ObservacionAsistencia.id_estudiante.in_(ids),
+            ObservacionAsistencia.bloque.in_(bloques)
+        ).all()
+    }
+
+    for fila in filas:
+        actual = actuales.get((fila['id_estudiante'], fila['bloque']))
+        if fila['observaciones']:
+            if actual:
+                actual.observaciones = fila['observaciones']
+            else:
+                db.session.add(ObservacionAsistencia(
+                    id_estudiante=fila['id_estudiante'],
+                    fecha=fecha,
+                    bloque=fila['bloque'],
+                    observaciones=fila['observaciones']
+                ))
+        elif actual:
+            db.session.delete(actual)
+
+
+def _asegurar_mapas(fecha, claves):
+    """
+    Crea vacíos los mapas (sección, bloque) de la fecha que aún no existen, con un upsert:
+    dos primeros registros simultáneos no chocan con unique_asistencia_bitmap y luego
+    ambos esperan el bloqueo de la misma fila
+    """
+    vacios = [{
+        'id_seccion': id_seccion, 'fecha': fecha, 'bloque': bloque, 'base_estudiante': 0,
+        'registrados': b'', 'presentes': b'', 'total_registros': 0, 'total_presentes': 0
+    } for id_seccion, bloque in sorted(claves)]
+
+    tabla = AsistenciaBitmap.__table__
+    if db.session.get_bind().dialect.name in ('mysql', 'mariadb'):
+        stmt = mysql_insert(tabla).values(vacios)
+        db.session.execute(stmt.on_duplicate_key_update(id_seccion=stmt.inserted.id_seccion))
+    else:
+        db.session.execute(sqlite_insert(tabla).values(vacios).on_conflict_do_nothing())
+
+
+def _bloquear_anteriores(fecha, filas_fecha, secciones):
+    """
+    Mapas de otras secciones que todavía contienen a estudiantes de las filas (cambiaron de
+    sección): se buscan sin bloqueo por rango de IDs y se bloquean solo los que los contienen
+    """
+    por_bloque = defaultdict(set)
+    for fila in filas_fecha:
+        por_bloque[fila['bloque']].add(fila['id_estudiante'])
+    ids = {i for ids_bloque in por_bloque.values() for i in ids_bloque}
+
+    candidatos = _cubre(db.session.query(
+        AsistenciaBitmap.id_bitmap,
+        AsistenciaBitmap.bloque,
+        AsistenciaBitmap.base_estudiante,
+        AsistenciaBitmap.registrados,
+        AsistenciaBitmap.presentes
+    ).filter(
+        AsistenciaBitmap.fecha == fecha,
+        AsistenciaBitmap.bloque.in_(list(por_bloque)),
+        AsistenciaBitmap.id_seccion.notin_(list(secciones))
+    ), ids).all()
+
+    ids_bitmap = [
+        m.id_bitmap for m in candidatos
+        if _marcas_de(m.base_estudiante, m.registrados, m.presentes, por_bloque[m.bloque])
+    ]
+    if not ids_bitmap:
+        return []
+    return AsistenciaBitmap.query.filter(
+        AsistenciaBitmap.id_bitmap.in_(ids_bitmap)
+    ).order_by(AsistenciaBitmap.id_bitmap).populate_existing().with_for_update().all()
+
+
+def escribir_marcas(filas, seccion_de):
+    """
+    Escribe filas con el formato de asistencia_estudiante en los mapas de bits
+    Debe llamarse dentro de la transacción del request; no hace commit
+
+    Args:
+        filas: Diccionarios {id_estudiante, fecha, bloque, presente, observaciones, id_usuario}
+        seccion_de: dict id_estudiante -> id_seccion actual
+    """
+    por_fecha = defaultdict(list)
+    for fila in filas:
+        por_fecha[fila['fecha']].append(fila)
+
+    for fecha, filas_fecha in por_fecha.items():
+        objetivos = {(seccion_de[f['id_estudiante']], f['bloque']) for f in filas_fecha}
+        secciones = {id_seccion for id_seccion, _ in objetivos}
+        _asegurar_mapas(fecha, objetivos)
+
+        # Bloquear solo los mapas de las secciones destino (cada escritura es leer-modificar-escribir)
+        # y los de la sección anterior de estudiantes que se cambiaron
+        mapas = {
+            (m.id_seccion, m.bloque): m
+            for m in AsistenciaBitmap.query.filter(
+                AsistenciaBitmap.fecha == fecha,
+                AsistenciaBitmap.id_seccion.in_(list(secciones)),
+                AsistenciaBitmap.bloque.in_(list({b for _, b in objetivos}))
+            ).order_by(AsistenciaBitmap.id_seccion, AsistenciaBitmap.bloque).populate_existing().with_for_update().all()
+        }
+        for mapa in _bloquear_anteriores(fecha, filas_fecha, secciones):
+            mapas[(mapa.id_seccion, mapa.bloque)] = mapa
+        estados = {clave: desempaquetar(m.base_estudiante, m.registrados, m.presentes) for clave, m in mapas.items()}
+        ubicacion = {
+            (id_estudiante, bloque): id_seccion
+            for (id_seccion, bloque), estado in estados.items()
+            for id_estudiante in estado
+        }
+
+        modificados = {}
+        for fila in filas_fecha:
+            id_estudiante, bloque = fila['id_estudiante'], fila['bloque']
+            id_seccion = seccion_de[id_estudiante]
+
+            # Un estudiante que cambió de sección deja de contar en el mapa anterior
+            anterior = ubicacion.get((id_estudiante, bloque))
+            if anterior is not None and anterior != id_seccion:
+                del estados[(anterior, bloque)][id_estudiante]
+                modificados.setdefault((anterior, bloque), None)
+
+            estados.setdefault((id_seccion, bloque), {})[id_estudiante] = fila['presente']
+            ubicacion[(id_estudiante, bloque)] = id_seccion
+            modificados[(id_seccion, bloque)] = fila['id_usuario']
+
+        ahora = datetime.utcnow()
+        for (id_seccion, bloque), id_usuario in modificados.items():
+            estado = estados[(id_seccion, bloque)]
+            mapa = mapas.get((id_seccion, bloque))
+            if not estado:
+                if mapa:
+                    db.session.delete(mapa)
+                continue
+
+            base, registrados, presentes = empaquetar(estado)
+            if mapa is None:
+                mapa = AsistenciaBitmap(id_seccion=id_seccion, fecha=fecha, bloque=bloque)
+                db.session.add(mapa)
+            mapa.base_estudiante = base
+            mapa.registrados = registrados
+            mapa.presentes = presentes
+            mapa.total_registros = len(estado)
+            mapa.total_presentes = sum(estado.values())
+            if id_usuario is not None:
+                mapa.id_usuario = id_usuario
+                mapa.fecha_registro = ahora
+
+        _escribir_observaciones(fecha, filas_fecha)
+
+    db.session.flush()
+
+
+def convertir_a_bitmap(fecha_inicio=None, fecha_fin=None):
+    """
+    Copia asistencia_estudiante a los mapas de bits, una fecha a la vez
+    No borra las filas originales ni hace commit; el llamador decide cuándo confirmar
+
+    Returns:
+        int: Registros convertidos
+    """
+    fechas = [f for (f,) in _filtrar(
+        db.session.query(AsistenciaEstudiante.fecha), AsistenciaEstudiante, fecha_inicio, fecha_fin
+    ).distinct().order_by(AsistenciaEstudiante.fecha).all()]
+
+    total = 0
+    for fecha in fechas:
+        # Orden por fecha_registro: el último usuario que registró queda en el mapa
+        registros = db.session.query(
+            AsistenciaEstudiante.id_estudiante,
+            AsistenciaEstudiante.bloque,
+            AsistenciaEstudiante.presente,
+            AsistenciaEstudiante.observaciones,
+            AsistenciaEstudiante.id_usuario,
+            Estudiante.id_seccion
+        ).join(
+            Estudiante, AsistenciaEstudiante.id_estudiante == Estudiante.id_estudiante
+        ).filter(
+            AsistenciaEstudiante.fecha == fecha
+        ).order_by(AsistenciaEstudiante.fecha_registro, AsistenciaEstudiante.id_asistencia_estudiante).all()
+
+        escribir_marcas([{
+            'id_estudiante': r.id_estudiante,
+            'fecha': fecha,
+            'bloque': r.bloque,
+            'presente': bool(r.presente),
+            'observaciones': r.observaciones or '',
+            'id_usuario': r.id_usuario
+        } for r in registros], {r.id_estudiante: r.id_seccion for r in registros})
+        total += len(registros)
+
+    return total
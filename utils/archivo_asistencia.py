@@ -0,0 +1,185 @@
+"""
+Particionado por año escolar y archivo de asistencia_estudiante
+En MariaDB la tabla se particiona por RANGE COLUMNS(fecha), una partición por año escolar
+(septiembre a agosto; ver migrations/partition_asistencia_estudiante.sql). Los años cerrados
+se mueven a asistencia_estudiante_archivo (ROW_FORMAT=COMPRESSED) con archivar_asistencia.py.
+
+Las consultas de estadísticas y logs obtienen la entidad a consultar con asistencia_para_rango():
+- Rango posterior al último año archivado: asistencia_estudiante (sin cambios)
+- Rango completamente archivado: asistencia_estudiante_archivo
+- Rango que cruza el límite: UNION ALL de ambas tablas
+
+El límite de lo archivado se cachea ARCHIVO_TTL segundos (default: 60). Como el límite es
+una sola fecha, los años se archivan en orden: archivar_anio_escolar rechaza un año si alguno
+anterior aún tiene registros en asistencia_estudiante.
+"""
+
+import os
+import threading
+import time
+from datetime import date
+
+from sqlalchemy import func, select, union_all, text
+from sqlalchemy.orm import aliased
+
+from models import db, AsistenciaEstudiante, AsistenciaEstudianteArchivo, ArchivoAsistencia
+from utils.calendario_utils import anio_escolar_de, rango_anio_escolar
+
+COLUMNAS = [
+    'id_asistencia_estudiante', 'id_estudiante', 'fecha', 'bloque',
+    'presente', 'observaciones', 'id_usuario', 'fecha_registro'
+]
+
+_limite = None
+_limite_leido = 0
+_lock = threading.Lock()
+
+
+def limite_archivo(recargar=False):
+    """
+    Última fecha archivada (None si no hay años archivados)
+    Se consulta con una conexión aparte para no afectar la transacción del request
+    """
+    global _limite, _limite_leido
+    ttl = int(os.environ.get('ARCHIVO_TTL', 60))
+    if recargar or time.time() - _limite_leido > ttl:
+        try:
+            with db.engine.connect() as conexion:
+                limite = conexion.execute(select(func.max(ArchivoAsistencia.fecha_fin))).scalar()
+        except Exception:
+            # Tabla archivo_asistencia aún no creada
+            limite = None
+        with _lock:
+            _limite, _limite_leido = limite, time.time()
+    return _limite
+
+
+def asistencia_para_rango(fecha_inicio=None, fecha_fin=None):
+    """
+    Entidad con las columnas de AsistenciaEstudiante para consultar un rango de fechas
+
+    Returns:
+        AsistenciaEstudiante, AsistenciaEstudianteArchivo o un alias sobre el UNION ALL de ambas
+    """
+    limite = limite_archivo()
+    if limite is None or (fecha_inicio is not None and fecha_inicio > limite):
+        return AsistenciaEstudiante
+    if fecha_fin is not None and fecha_fin <= limite:
+        return AsistenciaEstudianteArchivo
+
+    vigente = AsistenciaEstudiante.__table__
+    archivo = AsistenciaEstudianteArchivo.__table__
+    consultas = []
+    for tabla in (vigente, archivo):
+        consulta = select(*[tabla.c[c] for c in COLUMNAS])
+        if fecha_inicio is not None:
+            consulta = consulta.where(tabla.c.fecha >= fecha_inicio)
+        if fecha_fin is not None:
+            consulta = consulta.where(tabla.c.fecha <= fecha_fin)
+        consultas.append(consulta)
+
+    return aliased(AsistenciaEstudiante, union_all(*consultas).subquery('asistencia_union'), adapt_on_names=True)
+
+
+def fecha_archivada(fecha):
+    """True si la fecha pertenece a un año escolar ya archivado (no admite escrituras)"""
+    limite = limite_archivo()
+    return limite is not None and fecha <= limite
+
+
+def _usar_particiones():
+    return db.session.get_bind().dialect.name in ('mysql', 'mariadb')
+
+
+def _particiones():
+    """Particiones de asistencia_estudiante: {nombre: límite superior} (vacío si no está particionada)"""
+    filas = db.session.execute(text(
+        "SELECT PARTITION_NAME, PARTITION_DESCRIPTION FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'asistencia_estudiante' "
+        "AND PARTITION_NAME IS NOT NULL"
+    )).all()
+    return {nombre: descripcion for nombre, descripcion in filas}
+
+
+def asegurar_particiones(hasta_anio=None):
+    """
+    Crea las particiones de los años escolares hasta `hasta_anio` (default: el próximo)
+    dividiendo pmax; no hace nada si la tabla no está particionada
+
+    Returns:
+        list: Nombres de las particiones creadas
+    """
+    if not _usar_particiones():
+        return []
+    particiones = _particiones()
+    if 'pmax' not in particiones:
+        return []
+
+    hasta_anio = hasta_anio or anio_escolar_de(date.today()) + 1
+    creadas = []
+    for anio in range(anio_escolar_de(date.today()), hasta_anio + 1):
+        nombre = f'p{anio}'
+        if nombre in particiones:
+            continue
+        db.session.execute(text(
+            f"ALTER TABLE asistencia_estudiante REORGANIZE PARTITION pmax INTO ("
+            f"PARTITION {nombre} VALUES LESS THAN ('{anio + 1}-09-01'), "
+            f"PARTITION pmax VALUES LESS THAN (MAXVALUE))"
+        ))
+        creadas.append(nombre)
+    return creadas
+
+
+def archivar_anio_escolar(anio):
+    """
+    Mueve un año escolar cerrado de asistencia_estudiante al archivo
+    Copia las filas, registra el año en archivo_asistencia y las elimina de la tabla vigente
+    (DROP PARTITION si el año tiene su propia partición). No hace commit.
+    Los años anteriores con registros vigentes deben archivarse primero.
+
+    Args:
+        anio: Año de inicio del año escolar (2024 = 2024-2025)
+
+    Returns:
+        int: Registros archivados
+    """
+    inicio, fin = rango_anio_escolar(anio)
+    if fin >= date.today():
+        raise ValueError(f'El año escolar {anio}-{anio + 1} no ha terminado')
+    if ArchivoAsistencia.query.filter_by(anio_escolar=anio).first():
+        raise ValueError(f'El año escolar {anio}-{anio + 1} ya está archivado')
+
+    vigente = AsistenciaEstudiante.__table__
+    archivo = AsistenciaEstudianteArchivo.__table__
+
+    # El límite del archivo es una sola fecha: un año anterior con filas vigentes quedaría oculto
+    anterior = db.session.execute(select(func.min(vigente.c.fecha)).where(vigente.c.fecha < inicio)).scalar()
+    if anterior is not None:
+        pendiente = anio_escolar_de(anterior)
+        raise ValueError(
+            f'El año escolar {pendiente}-{pendiente + 1} aún tiene registros vigentes; '
+            f'los años se archivan del más antiguo al más reciente'
+        )
+
+    en_rango = vigente.c.fecha.between(inicio, fin)
+
+    db.session.execute(archivo.insert().from_select(
+        COLUMNAS, select(*[vigente.c[c] for c in COLUMNAS]).where(en_rango)
+    ))
+    registros = db.session.execute(
+        select(func.count()).select_from(archivo).where(archivo.c.fecha.between(inicio, fin))
+    ).scalar()
+
+    db.session.add(ArchivoAsistencia(anio_escolar=anio, fecha_inicio=inicio, fecha_fin=fin, registros=registros))
+    # DROP PARTITION confirma implícitamente la transacción: la copia y el registro van antes
+    db.session.flush()
+
+    nombre = f'p{anio}'
+    if _usar_particiones() and nombre in _particiones():
+        en_particion = db.session.execute(text(f'SELECT COUNT(*) FROM asistencia_estudiante PARTITION ({nombre})')).scalar()
+        if en_particion == registros:
+            db.session.execute(text(f'ALTER TABLE asistencia_estudiante DROP PARTITION {nombre}'))
+            return registros
+
+    db.session.execute(vigente.delete().where(en_rango))
+    return registros
@@ -0,0 +1,201 @@
+"""
+Escritura masiva de asistencia_estudiante
+Valida la pertenencia de los estudiantes y detecta los registros existentes con una sola
+consulta IN, y escribe todas las filas con un único INSERT ... ON DUPLICATE KEY UPDATE
+sobre unique_asistencia_estudiante_bloque. En otros motores (SQLite en pruebas) se usa un
+INSERT masivo para los nuevos y un UPDATE executemany para los existentes.
+Con ASISTENCIA_ALMACEN=bitmap las filas se escriben en los mapas de bits de utils/almacen_asistencia.
+"""
+
+from datetime import datetime
+from sqlalchemy import and_, bindparam
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from models import db, Estudiante, AsistenciaEstudiante
+from utils.almacen_asistencia import modo_bitmap, registros_existentes, escribir_marcas
+from utils.archivo_asistencia import fecha_archivada
+
+BLOQUES_VALIDOS = ['completo', 'bloque_1', 'bloque_2', 'bloque_3', 'bloque_4']
+
+
+def _usar_upsert_mysql():
+    return db.session.get_bind().dialect.name in ('mysql', 'mariadb')
+
+
+def _escribir(filas, existentes):
+    """
+    Escribe las filas ya validadas
+
+    Args:
+        filas: Diccionarios con las columnas de asistencia_estudiante
+        existentes: Claves (id_estudiante, bloque) que ya tienen registro en la fecha
+    """
+    if not filas:
+        return
+
+    tabla = AsistenciaEstudiante.__table__
+
+    if _usar_upsert_mysql():
+        stmt = mysql_insert(tabla).values(filas)
+        db.session.execute(stmt.on_duplicate_key_update(
+            presente=stmt.inserted.presente,
+            observaciones=stmt.inserted.observaciones,
+            id_usuario=stmt.inserted.id_usuario
+        ))
+        return
+
+    nuevas = [f for f in filas if (f['id_estudiante'], f['bloque']) not in existentes]
+    actualizadas = [{
+        'b_id_estudiante': f['id_estudiante'],
+        'b_fecha': f['fecha'],
+        'b_bloque': f['bloque'],
+        'b_presente': f['presente'],
+        'b_observaciones': f['observaciones'],
+        'b_id_usuario': f['id_usuario']
+    } for f in filas if (f['id_estudiante'], f['bloque']) in existentes]
+
+    if nuevas:
+        db.session.execute(tabla.insert(), nuevas)
+    if actualizadas:
+        db.session.execute(
+            tabla.update().where(and_(
+                tabla.c.id_estudiante == bindparam('b_id_estudiante'),
+                tabla.c.fecha == bindparam('b_fecha'),
+                tabla.c.bloque == bindparam('b_bloque')
+            )).values(
+                presente=bindparam('b_presente'),
+                observaciones=bindparam('b_observaciones'),
+                id_usuario=bindparam('b_id_usuario')
+            ),
+            actualizadas
+        )
+
+
+def _estudiantes_y_existentes(fecha, ids_estudiantes, bloques, solo_activos):
+    """
+    Sección actual de cada estudiante y claves (id_estudiante, bloque) ya registradas en la fecha
+
+    Returns:
+        tuple: (dict id_estudiante -> id_seccion, set de claves existentes)
+    """
+    if modo_bitmap():
+        query = db.session.query(Estudiante.id_estudiante, Estudiante.id_seccion).filter(
+            Estudiante.id_estudiante.in_(ids_estudiantes)
+        )
+        if solo_activos:
+            query = query.filter(Estudiante.activo == True)
+        seccion_de = {f.id_estudiante: f.id_seccion for f in query.all()}
+        return seccion_de, registros_existentes(fecha, seccion_de, bloques)
+
+    # Una sola consulta: sección de cada estudiante activo y bloques ya registrados en la fecha
+    query = db.session.query(
+        Estudiante.id_estudiante,
+        Estudiante.id_seccion,
+        AsistenciaEstudiante.bloque
+    ).outerjoin(
+        AsistenciaEstudiante, and_(
+            AsistenciaEstudiante.id_estudiante == Estudiante.id_estudiante,
+            AsistenciaEstudiante.fecha == fecha,
+            AsistenciaEstudiante.bloque.in_(bloques)
+        )
+    ).filter(Estudiante.id_estudiante.in_(ids_estudiantes))
+
+    if solo_activos:
+        query = query.filter(Estudiante.activo == True)
+
+    filas_existentes = query.all()
+
+    seccion_de = {f.id_estudiante: f.id_seccion for f in filas_existentes}
+    existentes = {(f.id_estudiante, f.bloque) for f in filas_existentes if f.bloque}
+    return seccion_de, existentes
+
+
+def guardar_asistencias(fecha, grupos, id_usuario, solo_activos=True):
+    """
+    Guarda la asistencia de uno o varios grupos (sección, bloque) de una fecha
+    Debe llamarse dentro de la transacción del request; no hace commit
+
+    Args:
+        fecha: Fecha de la asistencia (date)
+        grupos: Lista de tuplas (id_seccion, bloque, asistencias) donde asistencias es
+            la lista [{id_estudiante, presente, observaciones}] recibida del cliente;
+            id_seccion=None acepta estudiantes de cualquier sección
+        id_usuario: Usuario que registra
+        solo_activos: Si True, rechaza estudiantes inactivos
+
+    Returns:
+        list: Por cada grupo, dict con creados, actualizados, errores y las secciones escritas
+    """
+    resultados = [{'creados': 0, 'actualizados': 0, 'errores': [], 'secciones': set()} for _ in grupos]
+
+    # Normalizar los datos recibidos; la última marca de un estudiante en un grupo prevalece
+    solicitadas = []
+    for resultado, (id_seccion, bloque, asistencias_data) in zip(resultados, grupos):
+        marcas = {}
+        for asistencia_data in asistencias_data:
+            id_estudiante = asistencia_data.get('id_estudiante')
+            if not id_estudiante:
+                continue
+            try:
+                id_estudiante = int(id_estudiante)
+            except (TypeError, ValueError):
+                resultado['errores'].append(f'Error procesando estudiante {id_estudiante}: ID inválido')
+                continue
+            # Solo booleanos o 0/1, como la columna Boolean: "false" o "0" no deben contar como presente
+            presente = asistencia_data.get('presente', False)
+            if not isinstance(presente, (bool, int)) or presente not in (0, 1):
+                resultado['errores'].append(f'Error procesando estudiante {id_estudiante}: valor de presente inválido ({presente!r})')
+                continue
+            marcas[id_estudiante] = (
+                bool(presente),
+                asistencia_data.get('observaciones', '')
+            )
+        solicitadas.append(marcas)
+
+    ids_estudiantes = {i for marcas in solicitadas for i in marcas}
+    bloques = {bloque for _, bloque, _ in grupos}
+    if not ids_estudiantes:
+        return resultados
+
+    # Los años escolares archivados son de solo lectura
+    if fecha_archivada(fecha):
+        for resultado, marcas in zip(resultados, solicitadas):
+            if marcas:
+                resultado['errores'].append(f'La fecha {fecha.isoformat()} pertenece a un año escolar archivado')
+        return resultados
+
+    seccion_de, existentes = _estudiantes_y_existentes(fecha, ids_estudiantes, bloques, solo_activos)
+
+    filas = {}
+    fecha_registro = datetime.utcnow()
+    for resultado, marcas, (id_seccion, bloque, _) in zip(resultados, solicitadas, grupos):
+        for id_estudiante, (presente, observaciones) in marcas.items():
+            if id_seccion is None:
+                if id_estudiante not in seccion_de:
+                    resultado['errores'].append(f'Estudiante {id_estudiante} no encontrado')
+                    continue
+            elif seccion_de.get(id_estudiante) != int(id_seccion):
+                resultado['errores'].append(f'Estudiante {id_estudiante} no encontrado en esta sección')
+                continue
+
+            resultado['secciones'].add(seccion_de[id_estudiante])
+
+            clave = (id_estudiante, bloque)
+            if clave in existentes or clave in filas:
+                resultado['actualizados'] += 1
+            else:
+                resultado['creados'] += 1
+            filas[clave] = {
+                'id_estudiante': id_estudiante,
+                'fecha': fecha,
+                'bloque': bloque,
+                'presente': presente,
+                'observaciones': observaciones,
+                'id_usuario': id_usuario,
+                'fecha_registro': fecha_registro
+            }
+
+    if modo_bitmap():
+        escribir_marcas(list(filas.values()), seccion_de)
+    else:
+        _escribir(list(filas.values()), existentes)
+    return resultados
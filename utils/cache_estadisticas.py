@@ -0,0 +1,310 @@
+"""
+Caché de resultados para /admin/estadisticas
+Las entradas se indexan por los filtros (fecha_inicio, fecha_fin, etapa, seccion, bloque, granularidad)
+y se invalidan cuando una escritura toca una fecha o sección cubierta por la entrada.
+
+Backends:
+- BackendMemoria: LRU en proceso (por defecto)
+- BackendRedis: compartido entre workers de gunicorn (requiere el paquete redis)
+
+Configuración por variables de entorno:
+- ESTADISTICAS_CACHE_URL: redis://... para usar el backend compartido
+- ESTADISTICAS_CACHE_TTL: segundos de vida de cada entrada (default: 300)
+- ESTADISTICAS_CACHE_MAX: número máximo de entradas en memoria (default: 256)
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+BLOQUES_INDIVIDUALES = ('bloque_1', 'bloque_2', 'bloque_3', 'bloque_4')
+CONTADORES = ('aciertos', 'fallos', 'invalidaciones')
+
+
+class BackendMemoria:
+    """LRU en proceso con expiración por entrada"""
+
+    nombre = 'memoria'
+
+    def __init__(self, max_entradas=256):
+        self.max_entradas = max_entradas
+        self._entradas = OrderedDict()
+        self._contadores = dict.fromkeys(CONTADORES, 0)
+        self._lock = threading.Lock()
+
+    def obtener(self, clave):
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                return None
+            if entrada['expira'] < time.time():
+                del self._entradas[clave]
+                return None
+            self._entradas.move_to_end(clave)
+            return entrada
+
+    def guardar(self, clave, entrada, ttl):
+        with self._lock:
+            self._entradas[clave] = entrada
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def reservar(self, clave, entrada, ttl):
+        """Guarda la entrada solo si la clave no existe (o expiró); devuelve si la reservó"""
+        with self._lock:
+            actual = self._entradas.get(clave)
+            if actual is not None and actual['expira'] >= time.time():
+                return False
+            self._entradas[clave] = entrada
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+            return True
+
+    def eliminar(self, claves):
+        with self._lock:
+            for clave in claves:
+                self._entradas.pop(clave, None)
+
+    def entradas(self):
+        with self._lock:
+            return list(self._entradas.items())
+
+    def incrementar(self, contador, cantidad=1):
+        with self._lock:
+            self._contadores[contador] += cantidad
+
+    def contadores(self):
+        with self._lock:
+            return dict(self._contadores)
+
+    def total(self):
+        return len(self._entradas)
+
+
+class BackendRedis:
+    """
+    Backend compartido entre procesos; las entradas expiran con el TTL nativo de Redis
+    Con indexar=False no se mantiene el conjunto de claves (entradas() y total() quedan vacíos):
+    para usos que solo leen por clave, como la idempotencia, donde el índice crecería sin límite
+    """
+
+    nombre = 'redis'
+
+    def __init__(self, url, prefijo='estadisticas', indexar=True, variable='ESTADISTICAS_CACHE_URL'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError(f'{variable} requiere el paquete redis (pip install redis)')
+
+        self._redis = redis.Redis.from_url(url)
+        self._indexar = indexar
+        self._prefijo = prefijo
+        self._indice = f'{prefijo}:claves'
+        self._metricas = f'{prefijo}:metricas'
+
+    def _clave(self, clave):
+        return f'{self._prefijo}:entrada:{clave}'
+
+    def obtener(self, clave):
+        valor = self._redis.get(self._clave(clave))
+        return json.loads(valor) if valor else None
+
+    def guardar(self, clave, entrada, ttl):
+        pipe = self._redis.pipeline()
+        pipe.setex(self._clave(clave), ttl, json.dumps(entrada))
+        if self._indexar:
+            pipe.sadd(self._indice, clave)
+        pipe.execute()
+
+    def reservar(self, clave, entrada, ttl):
+        """Guarda la entrada solo si la clave no existe (SET NX); devuelve si la reservó"""
+        if not self._redis.set(self._clave(clave), json.dumps(entrada), ex=ttl, nx=True):
+            return False
+        if self._indexar:
+            self._redis.sadd(self._indice, clave)
+        return True
+
+    def eliminar(self, claves):
+        claves = list(claves)
+        if not claves:
+            return
+        pipe = self._redis.pipeline()
+        pipe.delete(*[self._clave(c) for c in claves])
+        if self._indexar:
+            pipe.srem(self._indice, *claves)
+        pipe.execute()
+
+    def entradas(self):
+        claves = [c.decode() for c in self._redis.smembers(self._indice)]
+        if not claves:
+            return []
+        valores = self._redis.mget([self._clave(c) for c in claves])
+
+        # Limpiar del índice las claves que ya expiraron
+        expiradas = [c for c, v in zip(claves, valores) if v is None]
+        if expiradas:
+            self._redis.srem(self._indice, *expiradas)
+
+        return [(c, json.loads(v)) for c, v in zip(claves, valores) if v is not None]
+
+    def incrementar(self, contador, cantidad=1):
+        self._redis.hincrby(self._metricas, contador, cantidad)
+
+    def contadores(self):
+        valores = self._redis.hgetall(self._metricas)
+        return {c: int(valores.get(c.encode(), 0)) for c in CONTADORES}
+
+    def total(self):
+        return self._redis.scard(self._indice)
+
+
+class CacheEstadisticas:
+    """Caché de respuestas de estadísticas con invalidación dirigida por escrituras"""
+
+    def __init__(self, backend, ttl=300):
+        self.backend = backend
+        self.ttl = ttl
+
+    @staticmethod
+    def normalizar_filtros(fecha_inicio, fecha_fin, etapa, seccion_id, bloque, granularidad='dia'):
+        """Normaliza los filtros tal como los interpreta obtener_estadisticas"""
+        if bloque not in BLOQUES_INDIVIDUALES and bloque != 'completo':
+            bloque = ''
+        return {
+            'fecha_inicio': fecha_inicio.isoformat(),
+            'fecha_fin': fecha_fin.isoformat(),
+            'etapa': etapa or '',
+            'seccion': str(seccion_id or ''),
+            'bloque': bloque,
+            'granularidad': granularidad or 'dia'
+        }
+
+    @staticmethod
+    def _clave(filtros):
+        return '|'.join(filtros[k] for k in ('fecha_inicio', 'fecha_fin', 'etapa', 'seccion', 'bloque', 'granularidad'))
+
+    def obtener(self, filtros):
+        entrada = self.backend.obtener(self._clave(filtros))
+        if entrada is None:
+            self.backend.incrementar('fallos')
+            return None
+        self.backend.incrementar('aciertos')
+        return entrada['valor']
+
+    def guardar(self, filtros, valor):
+        entrada = {'filtros': filtros, 'valor': valor, 'expira': time.time() + self.ttl}
+        self.backend.guardar(self._clave(filtros), entrada, self.ttl)
+
+    @staticmethod
+    def _afecta(filtros, fechas, id_seccion, etapa, bloque):
+        """
+        Determina si una escritura invalida una entrada
+
+        - fechas=None significa que la escritura afecta a cualquier rango (edición de estudiantes)
+        - Una entrada de un bloque individual solo depende de escrituras de ese bloque
+        - Fuera de 'completo', el desglose por etapa no filtra por etapa/sección,
+          por lo que cualquier escritura dentro del rango afecta a la entrada
+        """
+        if fechas is not None:
+            if not any(filtros['fecha_inicio'] <= f.isoformat() <= filtros['fecha_fin'] for f in fechas):
+                return False
+
+        if bloque and filtros['bloque'] in BLOQUES_INDIVIDUALES and filtros['bloque'] != bloque:
+            return False
+
+        if filtros['bloque'] != 'completo' or id_seccion is None:
+            return True
+
+        if filtros['seccion']:
+            return filtros['seccion'] == str(id_seccion)
+        if filtros['etapa']:
+            return etapa is None or filtros['etapa'] == etapa
+        return True
+
+    def invalidar(self, fechas=None, id_seccion=None, etapa=None, bloque=None):
+        """
+        Elimina las entradas afectadas por una escritura
+
+        Args:
+            fechas: Fechas modificadas (None = todas)
+            id_seccion: Sección modificada (None = todas)
+            etapa: Nombre de la etapa de la sección, si se conoce
+            bloque: Bloque modificado (None = todos)
+
+        Returns:
+            int: Número de entradas eliminadas
+        """
+        fechas = list(fechas) if fechas is not None else None
+        afectadas = [
+            clave for clave, entrada in self.backend.entradas()
+            if self._afecta(entrada['filtros'], fechas, id_seccion, etapa, bloque)
+        ]
+        self.backend.eliminar(afectadas)
+        if afectadas:
+            self.backend.incrementar('invalidaciones', len(afectadas))
+        return len(afectadas)
+
+    def limpiar(self):
+        """Elimina todas las entradas"""
+        return self.invalidar()
+
+    def metricas(self):
+        contadores = self.backend.contadores()
+        consultas = contadores['aciertos'] + contadores['fallos']
+        return {
+            'backend': self.backend.nombre,
+            'ttl': self.ttl,
+            'entradas': self.backend.total(),
+            'max_entradas': getattr(self.backend, 'max_entradas', None),
+            **contadores,
+            'tasa_aciertos': round((contadores['aciertos'] / consultas * 100) if consultas else 0, 1)
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def obtener_cache():
+    """Devuelve la caché del proceso, creándola según las variables de entorno"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                url = os.environ.get('ESTADISTICAS_CACHE_URL')
+                ttl = int(os.environ.get('ESTADISTICAS_CACHE_TTL', 300))
+                if url:
+                    backend = BackendRedis(url)
+                else:
+                    backend = BackendMemoria(int(os.environ.get('ESTADISTICAS_CACHE_MAX', 256)))
+                _cache = CacheEstadisticas(backend, ttl)
+    return _cache
+
+
+def invalidar_estadisticas(fechas=None, secciones=None, bloque=None):
+    """
+    Invalida las estadísticas en caché tras una escritura ya confirmada
+
+    Args:
+        fechas: Fechas modificadas (None = cualquier rango)
+        secciones: IDs de sección modificados (None = todas)
+        bloque: Bloque modificado (None = todos)
+    """
+    from utils.estructura_escolar import obtener_estructura
+
+    cache = obtener_cache()
+    if secciones is None:
+        cache.invalidar(fechas=fechas, bloque=bloque)
+        return
+
+    secciones = {int(s) for s in secciones if s is not None}
+    estructura = obtener_estructura(requeridas=secciones)
+
+    for id_seccion in secciones:
+        info = estructura.get(id_seccion)
+        etapa = info.nombre_etapa if info else None
+        cache.invalidar(fechas=fechas, id_seccion=id_seccion, etapa=etapa, bloque=bloque)
@@ -262,3 +262,70 @@ def obtener_estadisticas_calendario(año, mes):
         'dias_no_laborables': len(dias_no_laborables),
         'tipos_no_laborables': tipos_count
     }
+
+
+# Granularidades de la tendencia temporal y su nombre en el dashboard
+GRANULARIDADES = {'dia': 'daily', 'semana': 'weekly', 'mes': 'monthly', 'lapso': 'term'}
+
+# Lapsos del año escolar por mes: septiembre-diciembre, enero-marzo y abril-agosto
+LAPSOS = {9: 1, 10: 1, 11: 1, 12: 1, 1: 2, 2: 2, 3: 2, 4: 3, 5: 3, 6: 3, 7: 3, 8: 3}
+
+
+def anio_escolar_de(fecha):
+    """Año de inicio del año escolar (septiembre a agosto) al que pertenece una fecha"""
+    return fecha.year if fecha.month >= 9 else fecha.year - 1
+
+
+def rango_anio_escolar(anio):
+    """Primer y último día del año escolar que inicia en `anio`"""
+    return date(anio, 9, 1), date(anio + 1, 8, 31)
+
+
+def periodo_de_fecha(fecha, granularidad='dia'):
+    """
+    Obtiene la etiqueta del período al que pertenece una fecha
+    Las etiquetas ordenan cronológicamente como texto
+    
+    Args:
+        fecha: Fecha (date)
+        granularidad: 'dia', 'semana' (ISO), 'mes' o 'lapso'
+    
+    Returns:
+        str: 'YYYY-MM-DD', 'YYYY-SS', 'YYYY-MM' o 'YYYY-YYYY Lapso N'
+    """
+    if granularidad == 'semana':
+        año, semana, _ = fecha.isocalendar()
+        return f"{año}-{semana:02d}"
+    if granularidad == 'mes':
+        return f"{fecha.year}-{fecha.month:02d}"
+    if granularidad == 'lapso':
+        inicio = anio_escolar_de(fecha)
+        return f"{inicio}-{inicio + 1} Lapso {LAPSOS[fecha.month]}"
+    return fecha.isoformat()
+
+
+def agrupar_tendencia(totales_por_fecha, granularidad='dia'):
+    """
+    Agrupa la tendencia diaria por período
+    El porcentaje de cada período es la suma de asistentes sobre la suma de esperados,
+    igual que el porcentaje de un día
+    
+    Args:
+        totales_por_fecha: Iterable de tuplas (fecha, total_esperado, total_asistentes)
+        granularidad: Ver periodo_de_fecha
+    
+    Returns:
+        list: Puntos {'periodo', 'total_asistentes', 'total_esperado', 'porcentaje'} ordenados
+    """
+    periodos = {}
+    for fecha, esperado, asistentes in totales_por_fecha:
+        acumulado = periodos.setdefault(periodo_de_fecha(fecha, granularidad), [0, 0])
+        acumulado[0] += esperado
+        acumulado[1] += asistentes
+
+    return [{
+        'periodo': periodo,
+        'total_asistentes': asistentes,
+        'total_esperado': esperado,
+        'porcentaje': round((asistentes / esperado * 100) if esperado > 0 else 0, 1)
+    } for periodo, (esperado, asistentes) in sorted(periodos.items())]
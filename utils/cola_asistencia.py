@@ -0,0 +1,301 @@
+"""
+Cola de escritura diferida (write-behind) para la asistencia individual
+En la hora pico los envíos se validan, se guardan en un archivo SQLite local (modo WAL)
+y se confirman de inmediato; un hilo en segundo plano los vuelca a la base de datos en
+lotes grandes con guardar_asistencias, en orden de llegada (un upsert por cada tramo de
+envíos consecutivos de la misma fecha y usuario).
+
+Se activa con variables de entorno:
+- ASISTENCIA_COLA_PATH: ruta del archivo SQLite de la cola (sin ella la escritura es directa)
+- ASISTENCIA_COLA_INTERVALO: segundos entre vaciados (default: 2)
+- ASISTENCIA_COLA_LOTE: envíos máximos por vaciado (default: 200)
+- ASISTENCIA_COLA_RETENCION_HORAS: horas que se conservan los envíos procesados o con error
+  para consultar su estado (default: 24); luego se eliminan
+
+Varios workers de gunicorn pueden compartir el archivo: cada vaciado reclama sus envíos
+con un UPDATE atómico, y los upserts son idempotentes si un envío se procesa dos veces.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime
+
+ESTADOS = ('pendiente', 'procesando', 'procesado', 'error')
+MAX_INTENTOS = 5
+# Envíos en 'procesando' por más de este tiempo se consideran abandonados (worker caído)
+TIEMPO_RECLAMO = 300
+# Segundos entre purgas de envíos terminados
+INTERVALO_PURGA = 60
+
+
+class ColaAsistencia:
+    """Cola durable en SQLite con claves de idempotencia"""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        self._conexion = sqlite3.connect(ruta, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conexion.row_factory = sqlite3.Row
+        self._conexion.execute('PRAGMA journal_mode=WAL')
+        self._conexion.execute('PRAGMA synchronous=NORMAL')
+        self._conexion.execute('''
+            CREATE TABLE IF NOT EXISTS envio (
+                id_envio TEXT PRIMARY KEY,
+                clave_idempotencia TEXT UNIQUE,
+                id_usuario INTEGER NOT NULL,
+                datos TEXT NOT NULL,
+                estado TEXT NOT NULL DEFAULT 'pendiente',
+                intentos INTEGER NOT NULL DEFAULT 0,
+                token TEXT,
+                resultado TEXT,
+                creado REAL NOT NULL,
+                actualizado REAL NOT NULL
+            )
+        ''')
+        self._conexion.execute('CREATE INDEX IF NOT EXISTS idx_envio_estado ON envio (estado, creado)')
+
+    def _ejecutar(self, sql, parametros=()):
+        with self._lock:
+            return self._conexion.execute(sql, parametros).fetchall()
+
+    def encolar(self, datos, id_usuario, clave_idempotencia=None):
+        """
+        Agrega un envío a la cola
+
+        Args:
+            datos: dict { fecha, grupos: [[id_seccion, bloque, asistencias], ...] }
+            id_usuario: Usuario que registra
+            clave_idempotencia: Clave del cliente; un reenvío con la misma clave no se duplica
+
+        Returns:
+            tuple: (id_envio, duplicado)
+        """
+        clave = f'{id_usuario}:{clave_idempotencia}' if clave_idempotencia else None
+        id_envio = uuid.uuid4().hex
+        ahora = time.time()
+        with self._lock:
+            try:
+                self._conexion.execute(
+                    'INSERT INTO envio (id_envio, clave_idempotencia, id_usuario, datos, creado, actualizado) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (id_envio, clave, id_usuario, json.dumps(datos), ahora, ahora)
+                )
+                return id_envio, False
+            except sqlite3.IntegrityError:
+                fila = self._conexion.execute(
+                    'SELECT id_envio FROM envio WHERE clave_idempotencia = ?', (clave,)
+                ).fetchone()
+                return fila['id_envio'], True
+
+    def estado(self, id_envio):
+        """Estado y resultado de un envío (None si no existe)"""
+        filas = self._ejecutar('SELECT * FROM envio WHERE id_envio = ?', (id_envio,))
+        if not filas:
+            return None
+        fila = filas[0]
+        return {
+            'id_envio': fila['id_envio'],
+            'id_usuario': fila['id_usuario'],
+            'estado': fila['estado'],
+            'intentos': fila['intentos'],
+            'resultado': json.loads(fila['resultado']) if fila['resultado'] else None,
+            'creado': datetime.fromtimestamp(fila['creado']).isoformat(),
+            'actualizado': datetime.fromtimestamp(fila['actualizado']).isoformat()
+        }
+
+    def metricas(self):
+        """Cantidad de envíos por estado"""
+        conteo = dict.fromkeys(ESTADOS, 0)
+        for fila in self._ejecutar('SELECT estado, COUNT(*) AS total FROM envio GROUP BY estado'):
+            conteo[fila['estado']] = fila['total']
+        return conteo
+
+    def reclamar(self, limite):
+        """Marca como 'procesando' hasta `limite` envíos pendientes y los devuelve"""
+        token = uuid.uuid4().hex
+        ahora = time.time()
+        self._ejecutar(
+            "UPDATE envio SET estado = 'pendiente', token = NULL "
+            "WHERE estado = 'procesando' AND actualizado < ?",
+            (ahora - TIEMPO_RECLAMO,)
+        )
+        self._ejecutar(
+            "UPDATE envio SET estado = 'procesando', token = ?, actualizado = ? "
+            "WHERE id_envio IN (SELECT id_envio FROM envio WHERE estado = 'pendiente' ORDER BY creado LIMIT ?)",
+            (token, ahora, limite)
+        )
+        filas = self._ejecutar('SELECT * FROM envio WHERE token = ? ORDER BY creado', (token,))
+        return [{
+            'id_envio': f['id_envio'],
+            'id_usuario': f['id_usuario'],
+            'intentos': f['intentos'],
+            'datos': json.loads(f['datos'])
+        } for f in filas]
+
+    def purgar(self, horas):
+        """
+        Elimina los envíos procesados o con error sin cambios en las últimas `horas`
+        (también libera su clave de idempotencia)
+
+        Returns:
+            int: Envíos eliminados
+        """
+        with self._lock:
+            cursor = self._conexion.execute(
+                "DELETE FROM envio WHERE estado IN ('procesado', 'error') AND actualizado < ?",
+                (time.time() - horas * 3600,)
+            )
+            return cursor.rowcount
+
+    def completar(self, id_envio, resultado):
+        self._ejecutar(
+            "UPDATE envio SET estado = 'procesado', token = NULL, resultado = ?, actualizado = ? WHERE id_envio = ?",
+            (json.dumps(resultado), time.time(), id_envio)
+        )
+
+    def fallar(self, envio, mensaje):
+        """Devuelve el envío a la cola o lo marca como error al agotar los intentos"""
+        intentos = envio['intentos'] + 1
+        estado = 'error' if intentos >= MAX_INTENTOS else 'pendiente'
+        self._ejecutar(
+            'UPDATE envio SET estado = ?, intentos = ?, token = NULL, resultado = ?, actualizado = ? WHERE id_envio = ?',
+            (estado, intentos, json.dumps({'error': mensaje}), time.time(), envio['id_envio'])
+        )
+
+
+def _aplicar(envios):
+    """
+    Escribe un conjunto de envíos en una sola transacción
+    Los envíos se aplican en orden de llegada: los consecutivos de la misma fecha y usuario
+    se unen en un único upsert, así la marca más reciente de un estudiante siempre prevalece
+
+    Returns:
+        dict: id_envio -> resultado por grupo
+    """
+    from models import db
+    from utils.asistencia_masiva import guardar_asistencias
+    from utils.resumen_asistencia import actualizar_resumen_secciones
+    from utils.cache_estadisticas import invalidar_estadisticas
+
+    por_lote = []
+    # reclamar devuelve los envíos ordenados por creado
+    for envio in envios:
+        fecha = datetime.strptime(envio['datos']['fecha'], '%Y-%m-%d').date()
+        clave = (fecha, envio['id_usuario'])
+        if not por_lote or por_lote[-1][0] != clave:
+            por_lote.append((clave, []))
+        for indice, (id_seccion, bloque, asistencias) in enumerate(envio['datos']['grupos']):
+            por_lote[-1][1].append((envio['id_envio'], indice, (id_seccion, bloque, asistencias)))
+
+    resultados = {envio['id_envio']: [None] * len(envio['datos']['grupos']) for envio in envios}
+    fechas_seccion = defaultdict(set)
+    for (fecha, id_usuario), entradas in por_lote:
+        salida = guardar_asistencias(fecha, [grupo for _, _, grupo in entradas], id_usuario)
+        for (id_envio, indice, (id_seccion, bloque, _)), r in zip(entradas, salida):
+            resultados[id_envio][indice] = {
+                'id_seccion': id_seccion,
+                'bloque': bloque,
+                'registros_creados': r['creados'],
+                'registros_actualizados': r['actualizados'],
+                'errores': r['errores']
+            }
+            if r['creados'] or r['actualizados']:
+                fechas_seccion[id_seccion].add(fecha)
+
+    # Mantener el resumen diario en la misma transacción
+    actualizar_resumen_secciones(fechas_seccion)
+    db.session.commit()
+
+    for id_seccion, fechas in fechas_seccion.items():
+        invalidar_estadisticas(fechas=fechas, secciones=[id_seccion])
+
+    return resultados
+
+
+def vaciar_cola(cola, limite):
+    """
+    Procesa un lote de envíos pendientes
+    Si el lote completo falla, se reintenta cada envío por separado para aislar al culpable
+
+    Returns:
+        int: Envíos procesados
+    """
+    from models import db
+
+    envios = cola.reclamar(limite)
+    if not envios:
+        return 0
+
+    try:
+        resultados = _aplicar(envios)
+        for id_envio, resultado in resultados.items():
+            cola.completar(id_envio, resultado)
+        return len(envios)
+    except Exception:
+        db.session.rollback()
+
+    procesados = 0
+    for envio in envios:
+        try:
+            cola.completar(envio['id_envio'], _aplicar([envio])[envio['id_envio']])
+            procesados += 1
+        except Exception as e:
+            db.session.rollback()
+            cola.fallar(envio, str(e))
+    return procesados
+
+
+def _trabajador(app, cola, intervalo, limite, retencion_horas):
+    from models import db
+
+    ultima_purga = 0
+    while True:
+        try:
+            with app.app_context():
+                while vaciar_cola(cola, limite) >= limite:
+                    pass
+                db.session.remove()
+            if time.time() - ultima_purga >= INTERVALO_PURGA:
+                cola.purgar(retencion_horas)
+                ultima_purga = time.time()
+        except Exception as e:
+            print(f'❌ Error vaciando la cola de asistencia: {e}')
+        time.sleep(intervalo)
+
+
+_cola = None
+_cola_lock = threading.Lock()
+
+
+def obtener_cola(app=None):
+    """
+    Devuelve la cola del proceso (None si ASISTENCIA_COLA_PATH no está definido)
+    Al crearla arranca el hilo que la vacía en segundo plano; app.py la crea al iniciar
+    """
+    global _cola
+    ruta = os.environ.get('ASISTENCIA_COLA_PATH')
+    if not ruta:
+        return None
+    if _cola is None:
+        with _cola_lock:
+            if _cola is None:
+                if app is None:
+                    from flask import current_app
+                    app = current_app._get_current_object()
+                cola = ColaAsistencia(ruta)
+                threading.Thread(
+                    target=_trabajador,
+                    args=(app, cola,
+                          float(os.environ.get('ASISTENCIA_COLA_INTERVALO', 2)),
+                          int(os.environ.get('ASISTENCIA_COLA_LOTE', 200)),
+                          float(os.environ.get('ASISTENCIA_COLA_RETENCION_HORAS', 24))),
+                    name='cola-asistencia',
+                    daemon=True
+                ).start()
+                _cola = cola
+    return _cola
@@ -0,0 +1,136 @@
+"""
+Motor vectorizado para las estadísticas de 'Dia Completo'
+Carga la matrícula y los pares (estudiante, fecha) presentes una sola vez en arreglos
+NumPy/pandas con sección, etapa y género codificados como enteros, y calcula todos los
+desgloses con bincount en lugar de recorrer el set de presentes por cada dimensión
+"""
+
+import numpy as np
+import pandas as pd
+
+from utils.calendario_utils import agrupar_tendencia
+
+COLUMNAS_ROSTER = ['id_estudiante', 'id_seccion', 'genero', 'nombre_grado', 'nombre_seccion', 'nombre_etapa']
+GENEROS = ['M', 'F']
+
+
+def _porcentaje(total, esperado):
+    """Porcentaje redondeado a un decimal (0 si no hay esperado)"""
+    return round((total / esperado * 100) if esperado > 0 else 0, 1)
+
+
+def construir_roster(filas):
+    """
+    Construye el DataFrame de matrícula con columnas codificadas como enteros
+
+    Args:
+        filas: Tuplas (id_estudiante, id_seccion, genero, nombre_grado, nombre_seccion, nombre_etapa)
+
+    Returns:
+        DataFrame con las columnas originales más cod_seccion, cod_etapa y cod_genero,
+        junto con las categorías (nombres) de cada código
+    """
+    roster = pd.DataFrame(list(filas), columns=COLUMNAS_ROSTER)
+
+    nombres_seccion = roster['nombre_grado'] + ' ' + roster['nombre_seccion']
+    roster['cod_seccion'], secciones = pd.factorize(nombres_seccion, sort=True)
+    roster['cod_etapa'], etapas = pd.factorize(roster['nombre_etapa'].fillna('N/A'), sort=True)
+    roster['cod_genero'] = pd.Categorical(roster['genero'], categories=GENEROS).codes
+
+    return roster, list(secciones), list(etapas)
+
+
+def calcular_estadisticas_dia_completo(filas_roster, presentes, fechas_con_datos, granularidad='dia'):
+    """
+    Calcula todos los desgloses de 'Dia Completo' en una sola pasada vectorizada
+
+    Args:
+        filas_roster: Filas de matrícula (ver construir_roster)
+        presentes: Iterable de tuplas (id_estudiante, fecha) consideradas presentes
+        fechas_con_datos: Fechas con al menos un registro de asistencia
+        granularidad: Agrupación de la tendencia temporal (ver agrupar_tendencia)
+
+    Returns:
+        dict con estadisticas_generales, por_genero, por_seccion, por_etapa y tendencia_temporal
+    """
+    roster, secciones, etapas = construir_roster(filas_roster)
+    total_estudiantes = len(roster)
+    fechas = sorted(fechas_con_datos)
+    dias_analizados = len(fechas) or 1
+
+    # Cargar los presentes una sola vez como arreglos
+    presentes = list(presentes)
+    ids_presentes = np.fromiter((p[0] for p in presentes), dtype=np.int64, count=len(presentes))
+    fechas_presentes = pd.Index([p[1] for p in presentes], dtype=object)
+
+    # Posición de cada presente dentro de la matrícula (-1 si no pertenece al filtro)
+    posicion = pd.Index(roster['id_estudiante']).get_indexer(ids_presentes)
+    posicion = posicion[posicion >= 0]
+
+    cod_seccion = roster['cod_seccion'].to_numpy()
+    cod_etapa = roster['cod_etapa'].to_numpy()
+    cod_genero = roster['cod_genero'].to_numpy()
+
+    # Matrícula y presentes por dimensión con bincount
+    matricula_seccion = np.bincount(cod_seccion, minlength=len(secciones))
+    matricula_etapa = np.bincount(cod_etapa, minlength=len(etapas))
+    matricula_genero = np.bincount(cod_genero[cod_genero >= 0], minlength=len(GENEROS))
+
+    presentes_seccion = np.bincount(cod_seccion[posicion], minlength=len(secciones))
+    presentes_etapa = np.bincount(cod_etapa[posicion], minlength=len(etapas))
+    genero_posicion = cod_genero[posicion]
+    presentes_genero = np.bincount(genero_posicion[genero_posicion >= 0], minlength=len(GENEROS))
+
+    cod_fecha = pd.Index(fechas, dtype=object).get_indexer(fechas_presentes)
+    presentes_fecha = np.bincount(cod_fecha[cod_fecha >= 0], minlength=len(fechas))
+
+    total_asistentes = len(presentes)
+    secciones_con_datos = np.unique(roster['id_seccion'].to_numpy()[posicion]).size
+    total_secciones = secciones_con_datos or roster['id_seccion'].nunique()
+
+    genero_data = {}
+    for i, clave in enumerate(('masculino', 'femenino')):
+        total = int(presentes_genero[i])
+        matricula = int(matricula_genero[i])
+        genero_data[clave] = {
+            'total': total, 'matricula': matricula,
+            'porcentaje': _porcentaje(total, matricula * dias_analizados)
+        }
+
+    seccion_data = {}
+    for i, nombre in enumerate(secciones):
+        total = int(presentes_seccion[i])
+        matricula = int(matricula_seccion[i])
+        seccion_data[nombre] = {
+            'total': total, 'matricula': matricula,
+            'porcentaje': _porcentaje(total, matricula * dias_analizados)
+        }
+
+    etapa_data = {}
+    for i, nombre in enumerate(etapas):
+        total = int(presentes_etapa[i])
+        matricula = int(matricula_etapa[i])
+        etapa_data[nombre] = {
+            'total': total, 'matricula': matricula,
+            'porcentaje': _porcentaje(total, matricula * dias_analizados)
+        }
+
+    tendencia_data = agrupar_tendencia(
+        ((fecha, total_estudiantes, int(presentes_fecha[i])) for i, fecha in enumerate(fechas)),
+        granularidad
+    )
+
+    return {
+        'estadisticas_generales': {
+            'total_estudiantes': total_estudiantes,
+            'total_asistencias': total_asistentes,
+            'total_asistentes': total_asistentes,
+            'porcentaje_total': _porcentaje(total_asistentes, total_estudiantes * dias_analizados),
+            'dias_analizados': dias_analizados,
+            'total_secciones': int(total_secciones)
+        },
+        'por_genero': genero_data,
+        'por_seccion': seccion_data,
+        'por_etapa': etapa_data,
+        'tendencia_temporal': tendencia_data
+    }
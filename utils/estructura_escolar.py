@@ -0,0 +1,112 @@
+"""
+Índice en memoria de la estructura escolar (etapa → grado → sección)
+La jerarquía cambia muy pocas veces al año, así que se construye con una sola consulta
+y se comparte como un objeto inmutable y versionado. Las rutas y las estadísticas
+resuelven nombres desde aquí en lugar de repetir los joins Seccion/Grado/Etapa.
+
+Se reconstruye al expirar ESTRUCTURA_TTL (segundos, default: 600) o al llamar
+recargar_estructura() tras editar etapas, grados o secciones.
+"""
+
+import os
+import threading
+import time
+from collections import namedtuple
+from types import MappingProxyType
+
+SeccionInfo = namedtuple('SeccionInfo', [
+    'id_seccion', 'nombre_seccion', 'activa',
+    'id_grado', 'nombre_grado', 'orden',
+    'id_etapa', 'nombre_etapa',
+    'nombre', 'nombre_completo'
+])
+
+
+class IndiceEstructura:
+    """Índice inmutable id_seccion → SeccionInfo"""
+
+    def __init__(self, secciones, version):
+        ordenadas = sorted(secciones, key=lambda s: s.id_seccion)
+        self.secciones = MappingProxyType({s.id_seccion: s for s in ordenadas})
+        self.version = version
+        self.creado = time.time()
+
+    def get(self, id_seccion):
+        return self.secciones.get(int(id_seccion)) if id_seccion not in (None, '') else None
+
+    def __contains__(self, id_seccion):
+        return id_seccion in self.secciones
+
+    def __iter__(self):
+        return iter(self.secciones.values())
+
+    def __len__(self):
+        return len(self.secciones)
+
+    def ids_secciones(self, etapa='', seccion_id=''):
+        """IDs de sección que cumplen los filtros de etapa (nombre) y sección"""
+        return [
+            s.id_seccion for s in self.secciones.values()
+            if (not etapa or s.nombre_etapa == etapa)
+            and (not seccion_id or s.id_seccion == int(seccion_id))
+        ]
+
+    def etapas(self):
+        """Nombres de etapa presentes en la estructura"""
+        return sorted({s.nombre_etapa for s in self.secciones.values()})
+
+
+_indice = None
+_version = 0
+_lock = threading.Lock()
+
+
+def _construir():
+    from models import db, Seccion, Grado, Etapa
+
+    filas = db.session.query(
+        Seccion.id_seccion,
+        Seccion.nombre_seccion,
+        Seccion.activa,
+        Grado.id_grado,
+        Grado.nombre_grado,
+        Grado.orden,
+        Etapa.id_etapa,
+        Etapa.nombre_etapa
+    ).join(
+        Grado, Seccion.id_grado == Grado.id_grado
+    ).join(
+        Etapa, Grado.id_etapa == Etapa.id_etapa
+    ).all()
+
+    return [SeccionInfo(
+        *fila,
+        nombre=f"{fila.nombre_grado} {fila.nombre_seccion}",
+        nombre_completo=f"{fila.nombre_etapa} - {fila.nombre_grado} {fila.nombre_seccion}"
+    ) for fila in filas]
+
+
+def recargar_estructura():
+    """Reconstruye el índice (llamar tras editar etapas, grados o secciones)"""
+    global _indice, _version
+    secciones = _construir()
+    with _lock:
+        _version += 1
+        _indice = IndiceEstructura(secciones, _version)
+    return _indice
+
+
+def obtener_estructura(requeridas=()):
+    """
+    Devuelve el índice vigente, construyéndolo si no existe o si expiró
+
+    Args:
+        requeridas: IDs de sección que el llamador necesita resolver; si alguno no está
+            en el índice (sección creada después de construirlo) se reconstruye
+    """
+    indice = _indice
+    ttl = int(os.environ.get('ESTRUCTURA_TTL', 600))
+    if (indice is None or time.time() - indice.creado > ttl
+            or any(id_seccion not in indice for id_seccion in requeridas)):
+        indice = recargar_estructura()
+    return indice
@@ -9,9 +9,40 @@ Estructura esperada del Excel:
 - Género: M o F
 """
 
+import codecs
+import csv
+import hashlib
+import itertools
+import os
+import unicodedata
+from collections import defaultdict
+
+import openpyxl
 import pandas as pd
+from sqlalchemy import insert, update
 from models import db, Estudiante, Seccion, Grado, Etapa
-from sqlalchemy import or_
+from utils.resumen_asistencia import actualizar_resumen_estudiantes
+
+# Valores aceptados para el género
+GENEROS = {
+    'M': 'M', 'MASCULINO': 'M', 'HOMBRE': 'M', 'H': 'M', 'MALE': 'M', 'MASC': 'M',
+    'F': 'F', 'FEMENINO': 'F', 'MUJER': 'F', 'FEMALE': 'F', 'FEM': 'F'
+}
+
+# Variaciones de sección única
+SECCION_UNICA = ['U', 'UNICA', 'ÚNICA']
+
+# Variaciones comunes de nombres de grado
+MAPEO_GRADOS = {
+    '1er grupo': 'nivel 1',
+    '2do grupo': 'nivel 2',
+    '3er grupo': 'nivel 3',
+    'primer grupo': 'nivel 1',
+    'segundo grupo': 'nivel 2',
+    'tercer grupo': 'nivel 3',
+}
+
+COLUMNAS_REQUERIDAS = ['Grado', 'Sección', 'Nombre', 'Apellido', 'Cédula de identidad', 'Género']
 
 def limpiar_texto(texto):
     """Limpia y normaliza texto"""
@@ -21,28 +52,17 @@ def limpiar_texto(texto):
 
 def normalizar_genero(genero):
     """Normaliza el género a M o F"""
-    genero = limpiar_texto(genero).upper()
-    
-    # Mapeo de posibles valores
-    if genero in ['M', 'MASCULINO', 'HOMBRE', 'H', 'MALE', 'MASC']:
-        return 'M'
-    elif genero in ['F', 'FEMENINO', 'MUJER', 'FEMALE', 'FEM']:
-        return 'F'
-    else:
-        return None
+    return GENEROS.get(limpiar_texto(genero).upper())
 
 def normalizar_seccion(seccion):
     """Normaliza el nombre de la sección"""
     seccion = limpiar_texto(seccion).upper()
     
     # Mapeo de posibles valores
-    if seccion in ['U', 'UNICA', 'ÚNICA']:
+    if seccion in SECCION_UNICA:
         return 'Única'
     
-    # Si es una letra simple (A, B, C), retornarla en mayúscula
-    if len(seccion) == 1 and seccion.isalpha():
-        return seccion.upper()
-    
+    # Letras simples (A, B, C) y demás nombres quedan en mayúscula
     return seccion
 
 def normalizar_nombre_grado(nombre_grado):
@@ -50,65 +70,374 @@ def normalizar_nombre_grado(nombre_grado):
     Normaliza nombres de grados para manejar variaciones
     Ejemplos: 1er Grupo -> Nivel 1, 2do Grupo -> Nivel 2, 1er. Grado -> 1er grado
     """
-    nombre_grado = limpiar_texto(nombre_grado).lower()
-    
-    # Eliminar puntos
-    nombre_grado = nombre_grado.replace('.', '')
-    
-    # Mapeo de variaciones comunes
-    mapeo = {
-        '1er grupo': 'nivel 1',
-        '2do grupo': 'nivel 2',
-        '3er grupo': 'nivel 3',
-        'primer grupo': 'nivel 1',
-        'segundo grupo': 'nivel 2',
-        'tercer grupo': 'nivel 3',
-    }
-    
-    return mapeo.get(nombre_grado, nombre_grado)
+    nombre_grado = limpiar_texto(nombre_grado).lower().replace('.', '')
+    return MAPEO_GRADOS.get(nombre_grado, nombre_grado)
+
+def _clave(texto):
+    """Texto sin acentos y en minúsculas, como compara ILIKE con la collation utf8mb4_unicode_ci"""
+    return ''.join(c for c in unicodedata.normalize('NFD', texto) if not unicodedata.combining(c)).casefold()
 
-def buscar_seccion(nombre_grado, nombre_seccion):
+def huella_estudiante(cedula, nombre, apellido, genero, id_seccion, activo=True):
     """
-    Busca una sección basándose en el nombre del grado y la sección
-    Retorna el objeto Seccion o None si no se encuentra
+    Huella de un estudiante: cédula (sin distinguir mayúsculas) y campos normalizados
+    Una fila del archivo con la misma huella que el registro actual no requiere cambios
     """
-    # Limpiar y normalizar inputs
-    nombre_grado = normalizar_nombre_grado(nombre_grado)
-    nombre_seccion = limpiar_texto(nombre_seccion).lower()
-    
-    # Buscar grado que contenga el nombre
-    grado = db.session.query(Grado).filter(
-        Grado.nombre_grado.ilike(f'%{nombre_grado}%')
-    ).first()
-    
-    if not grado:
-        return None
-    
-    # Buscar sección dentro del grado
-    seccion = db.session.query(Seccion).filter(
-        Seccion.id_grado == grado.id_grado,
-        Seccion.nombre_seccion.ilike(f'%{nombre_seccion}%')
-    ).first()
+    campos = (cedula.casefold(), nombre, apellido, genero, str(id_seccion), '1' if activo else '0')
+    return hashlib.sha1('\x1f'.join(campos).encode('utf-8')).hexdigest()
+
+def _texto(columna):
+    """Versión vectorizada de limpiar_texto"""
+    return columna.where(columna.notna(), '').astype(str).str.strip()
+
+def normalizar_filas(df):
+    """
+    Normaliza las columnas del Excel con operaciones vectorizadas de pandas
     
-    return seccion
+    Returns:
+        DataFrame con cedula, nombre, apellido, genero ('' si es inválido), grado (texto original),
+        grado_busqueda, seccion y genero_original, con el mismo índice que df
+    """
+    # Cédula: quitar V-, E-, guiones y espacios; sin prefijo se asume venezolana
+    cedula = _texto(df['Cédula de identidad'])
+    for quitar in ('V-', 'E-', '-', ' '):
+        cedula = cedula.str.replace(quitar, '', regex=False)
+    cedula = cedula.where(cedula.eq('') | cedula.str.match('[VE]'), 'V' + cedula)
+
+    grado = _texto(df['Grado'])
+    seccion = _texto(df['Sección']).str.upper()
+
+    return pd.DataFrame({
+        'cedula': cedula,
+        'nombre': _texto(df['Nombre']),
+        'apellido': _texto(df['Apellido']),
+        'genero': _texto(df['Género']).str.upper().map(GENEROS).fillna(''),
+        'grado': grado,
+        'grado_busqueda': grado.str.lower().str.replace('.', '', regex=False).replace(MAPEO_GRADOS),
+        'seccion': seccion.mask(seccion.isin(SECCION_UNICA), 'Única'),
+        'genero_original': df['Género']
+    }, index=df.index)
 
-def detectar_fila_encabezado(file_path):
+def cargar_secciones():
     """
-    Detecta en qué fila están los encabezados del Excel
-    Busca la fila que contiene 'Grado' o 'Nombre'
+    Grados y secciones en dos consultas para resolver las filas del Excel en memoria
+
+    Returns:
+        tuple: (grados [(id_grado, clave)], secciones {id_grado: [(id_seccion, clave)]},
+                nombres {id_seccion: 'grado sección'})
     """
-    df_temp = pd.read_excel(file_path, header=None, nrows=10)
-    
-    for idx, row in df_temp.iterrows():
+    grados = db.session.query(Grado.id_grado, Grado.nombre_grado).order_by(Grado.id_grado).all()
+    nombre_grado = {g.id_grado: g.nombre_grado for g in grados}
+
+    secciones = defaultdict(list)
+    nombres = {}
+    for s in db.session.query(Seccion.id_seccion, Seccion.id_grado, Seccion.nombre_seccion).order_by(Seccion.id_seccion):
+        secciones[s.id_grado].append((s.id_seccion, _clave(s.nombre_seccion)))
+        nombres[s.id_seccion] = f"{nombre_grado[s.id_grado]} {s.nombre_seccion}" if s.id_grado in nombre_grado else s.nombre_seccion
+
+    return [(g.id_grado, _clave(g.nombre_grado)) for g in grados], secciones, nombres
+
+def resolver_secciones(pares, grados, secciones):
+    """
+    Resuelve pares (grado normalizado, sección) a id_seccion
+    Misma regla que la búsqueda por ILIKE: el primer grado cuyo nombre contiene el texto
+    y, dentro de él, la primera sección cuyo nombre contiene la sección
+
+    Returns:
+        dict: (grado, sección) -> id_seccion o None
+    """
+    resultado = {}
+    for nombre_grado, nombre_seccion in pares:
+        clave_grado, clave_seccion = _clave(nombre_grado), _clave(nombre_seccion)
+        id_grado = next((i for i, nombre in grados if clave_grado in nombre), None)
+        resultado[(nombre_grado, nombre_seccion)] = next(
+            (i for i, nombre in secciones.get(id_grado, []) if clave_seccion in nombre), None
+        )
+    return resultado
+
+def detectar_fila_encabezado(crudo):
+    """
+    Detecta en qué fila están los encabezados del Excel (entre las 10 primeras)
+    Busca la fila que contiene 'Grado' y 'Nombre'
+    """
+    for idx, row in crudo.head(10).iterrows():
         row_str = ' '.join([str(val).lower() for val in row if pd.notna(val)])
         if 'grado' in row_str and 'nombre' in row_str:
             return idx
     
     return 0
 
+def _nombres_columnas(fila):
+    """Nombres de columna a partir de la fila de encabezados (sin espacios extra)"""
+    return [
+        str(valor).strip() if pd.notna(valor) else f'Unnamed: {i}'
+        for i, valor in enumerate(fila)
+    ]
+
+def leer_excel_estudiantes(file_path):
+    """
+    Lee la hoja una sola vez sin encabezado (celdas como objeto, sin inferir tipos),
+    detecta la fila de encabezados en memoria y recorta el DataFrame sin volver a leer el archivo
+    
+    Returns:
+        DataFrame con los nombres de columna del Excel (sin espacios extra)
+    """
+    crudo = pd.read_excel(file_path, header=None, dtype=object)
+    fila = detectar_fila_encabezado(crudo)
+    
+    columnas = _nombres_columnas(crudo.iloc[fila]) if len(crudo) else []
+    
+    df = crudo.iloc[fila + 1:].reset_index(drop=True)
+    df.columns = columnas
+    return df.loc[:, ~df.columns.duplicated()]
+
+# ==================== LECTURA POR BLOQUES ====================
+
+def _filas_xlsx(file_path):
+    """Filas de la primera hoja con openpyxl en modo solo lectura (no carga el libro completo)"""
+    libro = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        for fila in libro.worksheets[0].iter_rows(values_only=True):
+            yield fila
+    finally:
+        libro.close()
+
+def _filas_csv(file_path):
+    """Filas de un CSV (UTF-8 o Latin-1; separador detectado entre coma, punto y coma y tabulador)"""
+    with open(file_path, 'rb') as archivo:
+        muestra = archivo.read(65536)
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(muestra)
+        codificacion = 'utf-8-sig'
+    except UnicodeDecodeError:
+        codificacion = 'latin-1'
+    texto = muestra.decode(codificacion, errors='ignore')
+    try:
+        separador = csv.Sniffer().sniff(texto, delimiters=',;\t').delimiter
+    except csv.Error:
+        separador = ','
+
+    with open(file_path, newline='', encoding=codificacion) as archivo:
+        for fila in csv.reader(archivo, delimiter=separador):
+            yield tuple(valor if valor.strip() else None for valor in fila)
+
+def _filas_xls(file_path):
+    """Filas de un .xls (xlrd no permite lectura parcial: se lee la hoja y se recorre por bloques)"""
+    yield from pd.read_excel(file_path, header=None, dtype=object).itertuples(index=False, name=None)
+
+LECTORES = {'.xlsx': _filas_xlsx, '.csv': _filas_csv, '.xls': _filas_xls}
+
+def leer_por_bloques(file_path, tamano_bloque):
+    """
+    Lee el archivo fila a fila y lo entrega en DataFrames de tamano_bloque filas
+    con solo las seis columnas conocidas; el índice continúa entre bloques
+    
+    Returns:
+        tuple: (columnas encontradas, generador de DataFrames); el generador es None
+               si faltan columnas requeridas
+    """
+    filas = LECTORES[os.path.splitext(file_path)[1].lower()](file_path)
+    inicio = list(itertools.islice(filas, 10))
+    if not inicio:
+        return [], None
+
+    fila = detectar_fila_encabezado(pd.DataFrame(inicio, dtype=object))
+    columnas = _nombres_columnas(inicio[fila])
+    if any(col not in columnas for col in COLUMNAS_REQUERIDAS):
+        if hasattr(filas, 'close'):
+            filas.close()
+        return columnas, None
+
+    posiciones = [columnas.index(col) for col in COLUMNAS_REQUERIDAS]
+
+    def bloques():
+        desplazamiento = 0
+        restantes = itertools.chain(inicio[fila + 1:], filas)
+        while True:
+            bloque = [
+                tuple(f[i] if i < len(f) else None for i in posiciones)
+                for f in itertools.islice(restantes, tamano_bloque)
+            ]
+            if not bloque:
+                return
+            yield pd.DataFrame(
+                bloque, columns=COLUMNAS_REQUERIDAS, dtype=object,
+                index=range(desplazamiento, desplazamiento + len(bloque))
+            )
+            desplazamiento += len(bloque)
+
+    return columnas, bloques()
+
+# ==================== IMPORTACIÓN ====================
+
+def _nueva_importacion(sobrescribir, max_detalle=None):
+    """Estado de una importación: secciones precargadas y reporte acumulado"""
+    grados, secciones, nombres = cargar_secciones()
+    return {
+        'sobrescribir': sobrescribir,
+        'grados': grados,
+        'secciones': secciones,
+        'nombres_seccion': nombres,
+        'resueltas': {},
+        'max_detalle': max_detalle,
+        'total_filas': 0,
+        'conteos': {'procesados': 0, 'actualizados': 0, 'duplicados': 0, 'errores': 0, 'sin_cambios': 0},
+        'detalle': {'procesados': [], 'actualizados': [], 'duplicados': [], 'errores': []}
+    }
+
+def _anotar(importacion, tipo, detalle):
+    """Cuenta un resultado y guarda su detalle (hasta max_detalle por tipo, si se indicó)"""
+    importacion['conteos'][tipo] += 1
+    lista = importacion['detalle'][tipo]
+    if importacion['max_detalle'] is None or len(lista) < importacion['max_detalle']:
+        lista.append(detalle)
+
+def _procesar_bloque(df, importacion):
+    """
+    Valida y escribe un bloque de filas; no hace commit
+    Las filas se normalizan en bloque, las secciones se resuelven en memoria, las cédulas
+    existentes se buscan con una consulta IN y los cambios se escriben con un INSERT y
+    un UPDATE masivos. Solo se escribe el delta: las filas cuya huella coincide con el
+    registro actual se cuentan como sin_cambios
+    """
+    df = df[df['Nombre'].notna()]
+    importacion['total_filas'] += len(df)
+    if df.empty:
+        return
+
+    filas = normalizar_filas(df)
+    nombres_seccion = importacion['nombres_seccion']
+
+    # Secciones: una resolución por par (grado, sección) distinto en toda la importación
+    resueltas = importacion['resueltas']
+    pares = set(zip(filas['grado_busqueda'], filas['seccion'])) - resueltas.keys()
+    if pares:
+        resueltas.update(resolver_secciones(pares, importacion['grados'], importacion['secciones']))
+
+    # Estudiantes existentes: una sola consulta IN por cédula
+    # (la clave ignora mayúsculas, igual que la collation de la columna)
+    cedulas = [c for c in filas['cedula'].unique() if c]
+    registros = {}
+    if cedulas:
+        for e in db.session.query(
+            Estudiante.id_estudiante, Estudiante.cedula, Estudiante.nombre, Estudiante.apellido,
+            Estudiante.genero, Estudiante.id_seccion, Estudiante.activo
+        ).filter(Estudiante.cedula.in_(cedulas)):
+            registros[e.cedula.casefold()] = {
+                'id_estudiante': e.id_estudiante,
+                'id_seccion': e.id_seccion,
+                'huella': huella_estudiante(e.cedula, e.nombre, e.apellido, e.genero, e.id_seccion, e.activo)
+            }
+
+    ids_actualizados = []
+    secciones_anteriores = set()
+    nuevos = []
+    por_actualizar = {}
+
+    # Validar cada fila en memoria; una cédula repetida en el archivo se trata como existente
+    for fila in filas.itertuples():
+        fila_num = fila.Index + 2  # +2 porque Excel empieza en 1 y tiene header
+        cedula, nombre, apellido, genero = fila.cedula, fila.nombre, fila.apellido, fila.genero
+        
+        # Validaciones básicas
+        if not cedula:
+            _anotar(importacion, 'errores', f"Fila {fila_num}: Cédula vacía")
+            continue
+        
+        if not nombre or not apellido:
+            _anotar(importacion, 'errores', f"Fila {fila_num}: Nombre o apellido vacío para cédula {cedula}")
+            continue
+        
+        if not genero:
+            _anotar(importacion, 'errores', f"Fila {fila_num}: Género inválido '{fila.genero_original}' para {nombre} {apellido}")
+            continue
+        
+        id_seccion = resueltas[(fila.grado_busqueda, fila.seccion)]
+        
+        if not id_seccion:
+            _anotar(importacion, 'errores', f"Fila {fila_num}: No se encontró sección para '{fila.grado} - {fila.seccion}'")
+            continue
+        
+        registro = registros.get(cedula.casefold())
+        huella = huella_estudiante(cedula, nombre, apellido, genero, id_seccion)
+        
+        if registro and registro['huella'] == huella:
+            # Sin cambios respecto al registro actual (o a una fila anterior del archivo)
+            importacion['conteos']['sin_cambios'] += 1
+            continue
+        
+        if registro:
+            if importacion['sobrescribir']:
+                # Actualizar estudiante existente
+                if 'id_estudiante' in registro:
+                    ids_actualizados.append(registro['id_estudiante'])
+                    secciones_anteriores.add(registro['id_seccion'])
+                    por_actualizar[registro['id_estudiante']] = registro
+                registro.update(nombre=nombre, apellido=apellido, genero=genero, id_seccion=id_seccion, activo=True, huella=huella)
+                
+                _anotar(importacion, 'actualizados', {
+                    'cedula': cedula,
+                    'nombre': f"{nombre} {apellido}",
+                    'seccion': nombres_seccion[id_seccion],
+                    'accion': 'actualizado'
+                })
+            else:
+                # Omitir duplicado
+                _anotar(importacion, 'duplicados', {
+                    'cedula': cedula,
+                    'nombre': f"{nombre} {apellido}",
+                    'seccion_actual': nombres_seccion.get(registro['id_seccion']),
+                    'seccion_nueva': nombres_seccion[id_seccion]
+                })
+            continue
+        
+        # Crear nuevo estudiante
+        registro = {
+            'cedula': cedula,
+            'nombre': nombre,
+            'apellido': apellido,
+            'genero': genero,
+            'id_seccion': id_seccion,
+            'activo': True,
+            'huella': huella
+        }
+        nuevos.append(registro)
+        registros[cedula.casefold()] = registro
+        
+        _anotar(importacion, 'procesados', {
+            'cedula': cedula,
+            'nombre': f"{nombre} {apellido}",
+            'seccion': nombres_seccion[id_seccion],
+            'genero': 'Masculino' if genero == 'M' else 'Femenino'
+        })
+
+    # La huella solo se usa para comparar; no es columna de la tabla
+    if nuevos:
+        db.session.execute(insert(Estudiante), [_sin_huella(r) for r in nuevos])
+    if por_actualizar:
+        db.session.execute(update(Estudiante), [_sin_huella(r) for r in por_actualizar.values()])
+    if ids_actualizados:
+        actualizar_resumen_estudiantes(ids_actualizados, secciones_anteriores)
+
+def _sin_huella(registro):
+    return {clave: valor for clave, valor in registro.items() if clave != 'huella'}
+
+def _reporte(importacion):
+    """Resultado de la importación con el formato de procesar_excel_estudiantes"""
+    conteos, detalle = importacion['conteos'], importacion['detalle']
+    reporte = {
+        'success': True,
+        'total_filas': importacion['total_filas'],
+        **conteos,
+        **{f'detalle_{tipo}': lista for tipo, lista in detalle.items()}
+    }
+    if importacion['max_detalle'] is not None:
+        reporte['detalle_truncado'] = any(conteos[tipo] > len(detalle[tipo]) for tipo in detalle)
+    return reporte
+
 def procesar_excel_estudiantes(file_path, sobrescribir=False):
     """
     Procesa archivo Excel con estudiantes y los carga en la base de datos
+    Todas las filas se escriben en una sola transacción
     
     Args:
         file_path: Ruta al archivo Excel
@@ -118,18 +447,11 @@ def procesar_excel_estudiantes(file_path, sobrescribir=False):
         dict con resultados del procesamiento
     """
     try:
-        # Detectar fila de encabezado
-        header_row = detectar_fila_encabezado(file_path)
-        
-        # Leer archivo Excel con el encabezado correcto
-        df = pd.read_excel(file_path, header=header_row)
-        
-        # Limpiar nombres de columnas (quitar espacios extra)
-        df.columns = df.columns.str.strip()
+        # Leer la hoja una sola vez y ubicar el encabezado en memoria
+        df = leer_excel_estudiantes(file_path)
         
         # Validar columnas requeridas
-        columnas_requeridas = ['Grado', 'Sección', 'Nombre', 'Apellido', 'Cédula de identidad', 'Género']
-        columnas_faltantes = [col for col in columnas_requeridas if col not in df.columns]
+        columnas_faltantes = [col for col in COLUMNAS_REQUERIDAS if col not in df.columns]
         
         if columnas_faltantes:
             return {
@@ -138,107 +460,12 @@ def procesar_excel_estudiantes(file_path, sobrescribir=False):
                 'columnas_encontradas': list(df.columns)
             }
         
-        # Eliminar filas vacías
-        df = df.dropna(how='all')
-        df = df[df['Nombre'].notna()]
-        
-        # Resultados
-        estudiantes_procesados = []
-        estudiantes_actualizados = []
-        estudiantes_duplicados = []
-        errores = []
-        
-        # Procesar cada fila
-        for index, row in df.iterrows():
-            fila_num = index + 2  # +2 porque Excel empieza en 1 y tiene header
-            
-            try:
-                # Extraer y limpiar datos
-                cedula = limpiar_texto(row['Cédula de identidad'])
-                # Limpiar cédula (quitar V-, E-, guiones, espacios)
-                cedula = cedula.replace('V-', '').replace('E-', '').replace('-', '').replace(' ', '')
-                if cedula and not cedula.startswith(('V', 'E')):
-                    cedula = 'V' + cedula
-                
-                nombre = limpiar_texto(row['Nombre'])
-                apellido = limpiar_texto(row['Apellido'])
-                genero = normalizar_genero(row['Género'])
-                nombre_grado = limpiar_texto(row['Grado'])
-                nombre_seccion = normalizar_seccion(row['Sección'])
-                
-                # Validaciones básicas
-                if not cedula:
-                    errores.append(f"Fila {fila_num}: Cédula vacía")
-                    continue
-                
-                if not nombre or not apellido:
-                    errores.append(f"Fila {fila_num}: Nombre o apellido vacío para cédula {cedula}")
-                    continue
-                
-                if not genero:
-                    errores.append(f"Fila {fila_num}: Género inválido '{row['Género']}' para {nombre} {apellido}")
-                    continue
-                
-                # Buscar sección correspondiente
-                seccion = buscar_seccion(nombre_grado, nombre_seccion)
-                
-                if not seccion:
-                    errores.append(f"Fila {fila_num}: No se encontró sección para '{nombre_grado} - {nombre_seccion}'")
-                    continue
-                
-                # Verificar si el estudiante ya existe
-                estudiante_existente = Estudiante.query.filter_by(cedula=cedula).first()
-                
-                if estudiante_existente:
-                    if sobrescribir:
-                        # Actualizar estudiante existente
-                        estudiante_existente.nombre = nombre
-                        estudiante_existente.apellido = apellido
-                        estudiante_existente.genero = genero
-                        estudiante_existente.id_seccion = seccion.id_seccion
-                        estudiante_existente.activo = True
-                        
-                        estudiantes_actualizados.append({
-                            'cedula': cedula,
-                            'nombre': f"{nombre} {apellido}",
-                            'seccion': seccion.nombre_completo,
-                            'accion': 'actualizado'
-                        })
-                    else:
-                        # Omitir duplicado
-                        estudiantes_duplicados.append({
-                            'cedula': cedula,
-                            'nombre': f"{nombre} {apellido}",
-                            'seccion_actual': estudiante_existente.seccion.nombre_completo,
-                            'seccion_nueva': seccion.nombre_completo
-                        })
-                    continue
-                
-                # Crear nuevo estudiante
-                nuevo_estudiante = Estudiante(
-                    cedula=cedula,
-                    nombre=nombre,
-                    apellido=apellido,
-                    genero=genero,
-                    id_seccion=seccion.id_seccion,
-                    activo=True
-                )
-                
-                db.session.add(nuevo_estudiante)
-                
-                estudiantes_procesados.append({
-                    'cedula': cedula,
-                    'nombre': f"{nombre} {apellido}",
-                    'seccion': seccion.nombre_completo,
-                    'genero': 'Masculino' if genero == 'M' else 'Femenino'
-                })
-                
-            except Exception as e:
-                errores.append(f"Fila {fila_num}: Error al procesar - {str(e)}")
-                continue
+        importacion = _nueva_importacion(sobrescribir)
         
         # Guardar cambios en la base de datos
         try:
+            # Conservar solo las seis columnas conocidas
+            _procesar_bloque(df[COLUMNAS_REQUERIDAS], importacion)
             db.session.commit()
         except Exception as e:
             db.session.rollback()
@@ -247,19 +474,72 @@ def procesar_excel_estudiantes(file_path, sobrescribir=False):
                 'error': f'Error al guardar en base de datos: {str(e)}'
             }
         
-        # Retornar resultados
+        return _reporte(importacion)
+        
+    except FileNotFoundError:
+        return {
+            'success': False,
+            'error': 'Archivo no encontrado'
+        }
+    except Exception as e:
+        db.session.rollback()
         return {
-            'success': True,
-            'total_filas': len(df),
-            'procesados': len(estudiantes_procesados),
-            'actualizados': len(estudiantes_actualizados),
-            'duplicados': len(estudiantes_duplicados),
-            'errores': len(errores),
-            'detalle_procesados': estudiantes_procesados,
-            'detalle_actualizados': estudiantes_actualizados,
-            'detalle_duplicados': estudiantes_duplicados,
-            'detalle_errores': errores
+            'success': False,
+            'error': f'Error al procesar archivo: {str(e)}'
         }
+
+def importar_estudiantes_por_bloques(file_path, sobrescribir=False, tamano_bloque=None, progreso=None, max_detalle=None):
+    """
+    Importa un archivo .xlsx, .csv o .xls en bloques de tamano_bloque filas con memoria constante:
+    cada bloque se valida, se escribe con INSERT/UPDATE masivos y se confirma en su propia transacción
+    
+    Args:
+        file_path: Ruta al archivo
+        sobrescribir: Si True, actualiza estudiantes existentes. Si False, los omite.
+        tamano_bloque: Filas por bloque (default: IMPORTACION_BLOQUE o 500)
+        progreso: Función opcional progreso(filas_leidas, reporte_parcial) llamada tras cada bloque;
+                  si devuelve False la importación se detiene (los bloques confirmados se conservan)
+        max_detalle: Máximo de detalles guardados por tipo (los conteos siempre son completos)
+    
+    Returns:
+        dict con el formato de procesar_excel_estudiantes; si un bloque falla, los bloques
+        anteriores quedan guardados y se informa filas_confirmadas
+    """
+    tamano_bloque = tamano_bloque or int(os.environ.get('IMPORTACION_BLOQUE', 500))
+    try:
+        columnas, bloques = leer_por_bloques(file_path, tamano_bloque)
+        if bloques is None:
+            faltantes = [col for col in COLUMNAS_REQUERIDAS if col not in columnas]
+            return {
+                'success': False,
+                'error': f'Faltan columnas requeridas: {", ".join(faltantes)}',
+                'columnas_encontradas': columnas
+            }
+        
+        importacion = _nueva_importacion(sobrescribir, max_detalle)
+        filas_leidas = 0
+        for bloque in bloques:
+            try:
+                _procesar_bloque(bloque, importacion)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                return {
+                    'success': False,
+                    'error': f'Error al guardar en base de datos (filas {filas_leidas + 1} a {filas_leidas + len(bloque)}): {str(e)}',
+                    'filas_confirmadas': filas_leidas
+                }
+            filas_leidas += len(bloque)
+            if progreso and progreso(filas_leidas, _reporte(importacion)) is False:
+                return {
+                    **_reporte(importacion),
+                    'success': False,
+                    'cancelada': True,
+                    'error': f'Importación cancelada después de {filas_leidas} filas',
+                    'filas_confirmadas': filas_leidas
+                }
+        
+        return _reporte(importacion)
         
     except FileNotFoundError:
         return {
@@ -0,0 +1,101 @@
+"""
+Claves de idempotencia para los POST de asistencia
+El cliente envía el encabezado Idempotency-Key; la primera respuesta exitosa se guarda por
+IDEMPOTENCIA_TTL segundos (default: 600) y los reenvíos con la misma clave la reciben sin
+volver a ejecutar la vista ni tocar la base de datos.
+
+- Las claves se separan por usuario (id de la sesión firmada) y por endpoint
+- Reusar una clave con otro cuerpo responde 422; un reenvío mientras el original
+  sigue en curso responde 409
+- Solo se guardan respuestas 2xx que no sean {'success': false}
+
+Por defecto se usa un LRU en memoria por worker; IDEMPOTENCIA_CACHE_URL=redis://...
+comparte las claves entre workers de gunicorn.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from functools import wraps
+
+from flask import request, session, jsonify, make_response
+
+from utils.cache_estadisticas import BackendMemoria, BackendRedis
+
+# Tiempo máximo que una clave queda reservada mientras se procesa la primera solicitud
+TTL_EN_PROCESO = 60
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def obtener_backend():
+    """Devuelve el almacén de respuestas del proceso, creándolo según las variables de entorno"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                url = os.environ.get('IDEMPOTENCIA_CACHE_URL')
+                _backend = BackendRedis(
+                    url, prefijo='idempotencia', indexar=False, variable='IDEMPOTENCIA_CACHE_URL'
+                ) if url else BackendMemoria(4096)
+    return _backend
+
+
+def _respuesta_exitosa(respuesta):
+    if not 200 <= respuesta.status_code < 300:
+        return False
+    datos = respuesta.get_json(silent=True)
+    return not (isinstance(datos, dict) and datos.get('success') is False)
+
+
+def idempotente(vista):
+    """Decorador: reutiliza la respuesta guardada para reenvíos con el mismo Idempotency-Key"""
+    @wraps(vista)
+    def decorated_function(*args, **kwargs):
+        clave = request.headers.get('Idempotency-Key', '').strip()
+        id_usuario = session.get('_user_id')
+        if not clave or not id_usuario:
+            return vista(*args, **kwargs)
+
+        backend = obtener_backend()
+        ttl = int(os.environ.get('IDEMPOTENCIA_TTL', 600))
+        clave = f'{id_usuario}:{request.endpoint}:{clave[:200]}'
+        huella = hashlib.sha256(request.get_data()).hexdigest()
+
+        entrada = backend.obtener(clave)
+        if entrada is None and backend.reservar(
+            clave, {'huella': huella, 'en_proceso': True, 'expira': time.time() + TTL_EN_PROCESO}, TTL_EN_PROCESO
+        ):
+            try:
+                respuesta = make_response(vista(*args, **kwargs))
+            except Exception:
+                backend.eliminar([clave])
+                raise
+
+            if _respuesta_exitosa(respuesta):
+                backend.guardar(clave, {
+                    'huella': huella,
+                    'estado': respuesta.status_code,
+                    'cuerpo': respuesta.get_data(as_text=True),
+                    'mimetype': respuesta.mimetype,
+                    'expira': time.time() + ttl
+                }, ttl)
+            else:
+                backend.eliminar([clave])
+            return respuesta
+
+        entrada = entrada or backend.obtener(clave)
+        if entrada is None:
+            return jsonify({'success': False, 'error': 'Solicitud en proceso, intente de nuevo'}), 409
+        if entrada['huella'] != huella:
+            return jsonify({'success': False, 'error': 'Idempotency-Key ya usada con otro contenido'}), 422
+        if entrada.get('en_proceso'):
+            return jsonify({'success': False, 'error': 'Solicitud en proceso, intente de nuevo'}), 409
+
+        respuesta = make_response(entrada['cuerpo'], entrada['estado'])
+        respuesta.mimetype = entrada['mimetype']
+        respuesta.headers['Idempotent-Replayed'] = 'true'
+        return respuesta
+    return decorated_function
@@ -0,0 +1,310 @@
+"""
+Importación de estudiantes en segundo plano
+/api/estudiantes/cargar-excel guarda el archivo, registra la importación en la tabla
+importacion_estudiantes y responde 202 de inmediato; un pool de hilos del proceso la
+procesa por bloques (importar_estudiantes_por_bloques) sin ocupar el worker de gunicorn.
+El progreso y el reporte final se consultan en /api/estudiantes/import/<id>.
+
+Los archivos se guardan en data_estudiantes_akademia/ con el prefijo de su SHA-256: una
+copia idéntica reutiliza el archivo (y la importación, si sigue en curso) y solo se conservan
+los IMPORTACION_ARCHIVOS_MAX más recientes. Cada fila se compara con el registro actual por
+su huella (ver excel_processor.huella_estudiante), así que reimportar escribe solo el delta.
+
+Se configura con variables de entorno:
+- IMPORTACION_HILOS: importaciones simultáneas por proceso (default: 1)
+- IMPORTACION_ARCHIVOS_MAX: archivos subidos que se conservan (default: 10)
+- IMPORTACION_STREAMING_MB, IMPORTACION_BLOQUE, IMPORTACION_DETALLE_MAX: ver excel_processor
+
+La cancelación se revisa al terminar cada bloque: los bloques ya confirmados se conservan.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import re
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from models import db, ImportacionEstudiantes
+from utils.excel_processor import procesar_excel_estudiantes, importar_estudiantes_por_bloques
+
+ESTADOS_FINALES = ('completada', 'error', 'cancelada')
+# Archivos guardados por guardar_archivo: <16 hex del SHA-256>_<nombre>
+PATRON_ARCHIVO = re.compile(r'^[0-9a-f]{16}_')
+TAMANO_LECTURA = 1024 * 1024
+# Importaciones sin actualizar por más de este tiempo se consideran abandonadas (worker reiniciado)
+TIEMPO_ABANDONO = 900
+# Segundos entre renovaciones de fecha_actualizacion durante una importación de una sola transacción
+INTERVALO_LATIDO = 60
+
+
+def _latido(app, id_importacion, detener):
+    """
+    Renueva fecha_actualizacion hasta que se active `detener`
+    Usa una conexión aparte: la transacción de la importación no confirma hasta el final
+    """
+    tabla = ImportacionEstudiantes.__table__
+    while not detener.wait(INTERVALO_LATIDO):
+        try:
+            with app.app_context(), db.engine.begin() as conexion:
+                conexion.execute(tabla.update().where(
+                    tabla.c.id_importacion == id_importacion
+                ).values(fecha_actualizacion=datetime.utcnow()))
+        except Exception as e:
+            print(f'❌ Error renovando la importación {id_importacion}: {e}')
+
+
+def _importar(importacion):
+    """Ejecuta la importación; los archivos pequeños (no CSV) se importan en una sola transacción"""
+    ruta = importacion.ruta
+    limite_streaming = float(os.environ.get('IMPORTACION_STREAMING_MB', 5)) * 1024 * 1024
+    if not ruta.lower().endswith('.csv') and os.path.getsize(ruta) < limite_streaming:
+        # Sin bloques no hay progreso que registrar: un latido evita que se tome como abandonada
+        from flask import current_app
+        detener = threading.Event()
+        latido = threading.Thread(
+            target=_latido,
+            args=(current_app._get_current_object(), importacion.id_importacion, detener),
+            name='importacion-latido',
+            daemon=True
+        )
+        latido.start()
+        try:
+            return procesar_excel_estudiantes(ruta, sobrescribir=importacion.sobrescribir)
+        finally:
+            detener.set()
+            latido.join()
+
+    id_importacion = importacion.id_importacion
+
+    def progreso(filas_leidas, _):
+        # Cada bloque ya se confirmó: una consulta nueva ve la cancelación pedida por otro worker
+        ImportacionEstudiantes.query.filter_by(id_importacion=id_importacion).update(
+            {'filas_leidas': filas_leidas, 'fecha_actualizacion': datetime.utcnow()}
+        )
+        db.session.commit()
+        cancelar = db.session.query(ImportacionEstudiantes.cancelar).filter_by(id_importacion=id_importacion).scalar()
+        return not cancelar
+
+    return importar_estudiantes_por_bloques(
+        ruta, sobrescribir=importacion.sobrescribir, progreso=progreso,
+        max_detalle=int(os.environ.get('IMPORTACION_DETALLE_MAX', 1000))
+    )
+
+
+def _trabajador(app, id_importacion):
+    from utils.cache_estadisticas import obtener_cache
+    from utils.padron_seccion import invalidar_padron
+
+    with app.app_context():
+        try:
+            # UPDATE condicional: no arranca si se canceló mientras esperaba en el pool
+            reclamada = ImportacionEstudiantes.query.filter_by(
+                id_importacion=id_importacion, estado='pendiente', cancelar=False
+            ).update({'estado': 'procesando', 'fecha_actualizacion': datetime.utcnow()})
+            db.session.commit()
+            if not reclamada:
+                return
+            importacion = db.session.get(ImportacionEstudiantes, id_importacion)
+
+            try:
+                resultado = _importar(importacion)
+            except Exception as e:
+                db.session.rollback()
+                resultado = {'success': False, 'error': f'Error al procesar archivo: {str(e)}'}
+
+            # La matrícula cambia en múltiples secciones: vaciar la caché de estadísticas
+            # (también si la importación se canceló o falló después de confirmar bloques)
+            if resultado.get('procesados') or resultado.get('actualizados') or resultado.get('filas_confirmadas'):
+                obtener_cache().limpiar()
+                invalidar_padron()
+
+            importacion = db.session.get(ImportacionEstudiantes, id_importacion)
+            importacion.estado = 'completada' if resultado['success'] else (
+                'cancelada' if resultado.get('cancelada') else 'error'
+            )
+            importacion.filas_leidas = resultado.get('total_filas', resultado.get('filas_confirmadas', importacion.filas_leidas))
+            importacion.resultado = json.dumps(resultado, default=str)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f'❌ Error en la importación {id_importacion}: {e}')
+        finally:
+            db.session.remove()
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _obtener_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=int(os.environ.get('IMPORTACION_HILOS', 1)),
+                    thread_name_prefix='importacion-estudiantes'
+                )
+    return _executor
+
+
+def guardar_archivo(archivo, directorio, nombre):
+    """
+    Guarda un archivo subido calculando su SHA-256 mientras se escribe
+    Si ya hay un archivo con el mismo contenido se reutiliza y la copia nueva se descarta
+
+    Args:
+        archivo: FileStorage de la petición
+        directorio: Carpeta de destino
+        nombre: Nombre seguro del archivo (secure_filename)
+
+    Returns:
+        tuple: (ruta, hash_contenido)
+    """
+    os.makedirs(directorio, exist_ok=True)
+    temporal = os.path.join(directorio, f'.subida-{uuid.uuid4().hex}')
+    sha256 = hashlib.sha256()
+    with open(temporal, 'wb') as destino:
+        for trozo in iter(lambda: archivo.stream.read(TAMANO_LECTURA), b''):
+            sha256.update(trozo)
+            destino.write(trozo)
+    hash_contenido = sha256.hexdigest()
+
+    existentes = glob.glob(os.path.join(directorio, f'{hash_contenido[:16]}_*'))
+    if existentes:
+        os.remove(temporal)
+        ruta = existentes[0]
+        # Renovar la fecha para que la limpieza lo cuente como reciente
+        os.utime(ruta)
+    else:
+        ruta = os.path.join(directorio, f'{hash_contenido[:16]}_{nombre}')
+        os.replace(temporal, ruta)
+
+    limpiar_archivos(directorio)
+    return ruta, hash_contenido
+
+
+def limpiar_archivos(directorio, conservar=None):
+    """
+    Elimina los archivos subidos más antiguos, conservando los `conservar` más recientes
+    (default: IMPORTACION_ARCHIVOS_MAX) y los de importaciones pendientes o en proceso.
+    Solo considera archivos guardados por guardar_archivo.
+
+    Returns:
+        list: Rutas eliminadas
+    """
+    conservar = conservar if conservar is not None else int(os.environ.get('IMPORTACION_ARCHIVOS_MAX', 10))
+    archivos = sorted(
+        (os.path.join(directorio, nombre) for nombre in os.listdir(directorio) if PATRON_ARCHIVO.match(nombre)),
+        key=os.path.getmtime, reverse=True
+    )
+    if len(archivos) <= conservar:
+        return []
+
+    en_uso = {ruta for ruta, in db.session.query(ImportacionEstudiantes.ruta).filter(
+        ImportacionEstudiantes.estado.in_(('pendiente', 'procesando'))
+    )}
+    eliminadas = []
+    for ruta in archivos[conservar:]:
+        if ruta not in en_uso:
+            os.remove(ruta)
+            eliminadas.append(ruta)
+    return eliminadas
+
+
+def encolar_importacion(ruta, archivo, sobrescribir, id_usuario, hash_contenido=None, app=None):
+    """
+    Registra una importación y la envía al pool de hilos
+    Si el mismo contenido ya se está importando con las mismas opciones, devuelve esa importación
+
+    Args:
+        ruta: Ruta del archivo guardado
+        archivo: Nombre original del archivo
+        sobrescribir: Si True, actualiza estudiantes existentes
+        id_usuario: Usuario que sube el archivo
+        hash_contenido: SHA-256 del archivo (ver guardar_archivo)
+
+    Returns:
+        tuple: (id_importacion, duplicado)
+    """
+    if app is None:
+        from flask import current_app
+        app = current_app._get_current_object()
+
+    if hash_contenido:
+        en_curso = ImportacionEstudiantes.query.filter(
+            ImportacionEstudiantes.hash_contenido == hash_contenido,
+            ImportacionEstudiantes.estado.in_(('pendiente', 'procesando')),
+            ImportacionEstudiantes.sobrescribir == sobrescribir,
+            ImportacionEstudiantes.cancelar == False
+        ).first()
+        if en_curso:
+            return en_curso.id_importacion, True
+
+    importacion = ImportacionEstudiantes(
+        id_importacion=uuid.uuid4().hex,
+        archivo=archivo,
+        ruta=ruta,
+        hash_contenido=hash_contenido,
+        sobrescribir=sobrescribir,
+        id_usuario=id_usuario
+    )
+    db.session.add(importacion)
+    db.session.commit()
+
+    _obtener_executor().submit(_trabajador, app, importacion.id_importacion)
+    return importacion.id_importacion, False
+
+
+def cancelar_importacion(id_importacion):
+    """
+    Solicita la cancelación; una importación pendiente se cancela de inmediato
+    y una en proceso al terminar el bloque actual
+
+    Returns:
+        ImportacionEstudiantes o None si no existe
+    """
+    importacion = db.session.get(ImportacionEstudiantes, id_importacion)
+    if importacion is None or importacion.estado in ESTADOS_FINALES:
+        return importacion
+    importacion.cancelar = True
+    if importacion.estado == 'pendiente':
+        importacion.estado = 'cancelada'
+    db.session.commit()
+    return importacion
+
+
+def estado_importacion(id_importacion):
+    """
+    Estado, progreso y reporte final de una importación (None si no existe)
+    Una importación sin avance por TIEMPO_ABANDONO segundos se marca como error
+    """
+    importacion = db.session.get(ImportacionEstudiantes, id_importacion)
+    if importacion is None:
+        return None
+
+    if (importacion.estado not in ESTADOS_FINALES and importacion.fecha_actualizacion
+            and importacion.fecha_actualizacion < datetime.utcnow() - timedelta(seconds=TIEMPO_ABANDONO)):
+        importacion.estado = 'error'
+        importacion.resultado = json.dumps({
+            'success': False,
+            'error': 'La importación se interrumpió (el servidor se reinició); vuelva a cargar el archivo',
+            'filas_confirmadas': importacion.filas_leidas
+        })
+        db.session.commit()
+
+    return {
+        'id_importacion': importacion.id_importacion,
+        'id_usuario': importacion.id_usuario,
+        'archivo': importacion.archivo,
+        'estado': importacion.estado,
+        'filas_leidas': importacion.filas_leidas,
+        'cancelacion_solicitada': importacion.cancelar,
+        'resultado': json.loads(importacion.resultado) if importacion.resultado else None,
+        'creado': importacion.fecha_creacion.isoformat() if importacion.fecha_creacion else None,
+        'actualizado': importacion.fecha_actualizacion.isoformat() if importacion.fecha_actualizacion else None
+    }
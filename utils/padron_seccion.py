@@ -0,0 +1,99 @@
+"""
+Caché del padrón de cada sección (estudiantes activos ordenados por apellido y nombre)
+La pantalla de asistencia se abre muchas veces al día sobre la misma lista; con el padrón
+en caché, abrirla cuesta solo la consulta de asistencia del día.
+
+Se invalida al crear, editar o desactivar estudiantes y al importar desde Excel. Esa
+invalidación solo alcanza al worker que hizo el cambio, por eso cada padrón guarda un sello
+de la sección (cantidad de estudiantes y última fecha_actualizacion) y se reconstruye si el
+sello cambió en otro worker.
+
+Configuración por variables de entorno:
+- PADRON_CACHE_URL: redis://... para compartir el padrón entre workers
+- PADRON_TTL: segundos de vida de cada padrón (default: 300)
+- PADRON_CACHE_MAX: número máximo de secciones en memoria (default: 512)
+"""
+
+import os
+import threading
+import time
+
+from sqlalchemy import func
+
+from utils.cache_estadisticas import BackendMemoria, BackendRedis
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def obtener_backend():
+    """Devuelve el almacén de padrones del proceso, creándolo según las variables de entorno"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                url = os.environ.get('PADRON_CACHE_URL')
+                if url:
+                    _backend = BackendRedis(url, prefijo='padron', variable='PADRON_CACHE_URL')
+                else:
+                    _backend = BackendMemoria(int(os.environ.get('PADRON_CACHE_MAX', 512)))
+    return _backend
+
+
+def _construir(id_seccion):
+    from models import Estudiante
+
+    estudiantes = Estudiante.query.filter_by(
+        id_seccion=id_seccion,
+        activo=True
+    ).order_by(Estudiante.apellido, Estudiante.nombre).all()
+
+    return [[e.id_estudiante, e.cedula, e.nombre_completo, e.genero] for e in estudiantes]
+
+
+def _sello(id_seccion):
+    """
+    Sello de la matrícula de una sección: cambia al crear, editar, mover o desactivar estudiantes
+    Cuenta también los inactivos para detectar a quien sale de la sección
+    """
+    from models import db, Estudiante
+
+    total, ultima = db.session.query(
+        func.count(Estudiante.id_estudiante),
+        func.max(Estudiante.fecha_actualizacion)
+    ).filter(Estudiante.id_seccion == id_seccion).one()
+    return [total, ultima.isoformat() if ultima else None]
+
+
+def obtener_padron(id_seccion):
+    """
+    Padrón de estudiantes activos de una sección
+
+    Returns:
+        list: [id_estudiante, cedula, nombre_completo, genero] ordenados por apellido y nombre
+    """
+    backend = obtener_backend()
+    clave = str(int(id_seccion))
+    sello = _sello(id_seccion)
+    entrada = backend.obtener(clave)
+    if entrada is not None and entrada.get('sello') == sello:
+        return entrada['estudiantes']
+
+    ttl = int(os.environ.get('PADRON_TTL', 300))
+    estudiantes = _construir(id_seccion)
+    backend.guardar(clave, {'estudiantes': estudiantes, 'sello': sello, 'expira': time.time() + ttl}, ttl)
+    return estudiantes
+
+
+def invalidar_padron(secciones=None):
+    """
+    Descarta el padrón en caché tras un cambio de matrícula ya confirmado
+
+    Args:
+        secciones: IDs de sección modificados (None = todas)
+    """
+    backend = obtener_backend()
+    if secciones is None:
+        backend.eliminar([clave for clave, _ in backend.entradas()])
+    else:
+        backend.eliminar([str(int(s)) for s in secciones if s is not None])
@@ -0,0 +1,214 @@
+"""
+Utilidades para mantener la tabla resumen_asistencia
+Resumen diario pre-agregado por (fecha, sección, bloque, género) que alimenta /admin/estadisticas
+Con ASISTENCIA_ALMACEN=bitmap el resumen se calcula desde los mapas de bits
+"""
+
+from collections import defaultdict
+from sqlalchemy import func, case, literal
+from models import db, Estudiante, ResumenAsistencia
+from utils.almacen_asistencia import modo_bitmap, leer_marcas
+from utils.archivo_asistencia import asistencia_para_rango
+
+COLUMNAS_RESUMEN = ['fecha', 'id_seccion', 'bloque', 'genero', 'registros', 'presentes', 'estudiantes']
+
+
+def _select_resumen(asistencia, filtros, por_bloque):
+    """
+    Construye el SELECT agregado sobre asistencia_estudiante
+
+    Args:
+        asistencia: Entidad a agregar (ver archivo_asistencia.asistencia_para_rango)
+        filtros: Lista de condiciones adicionales sobre la entidad/Estudiante
+        por_bloque: Si True agrupa por bloque; si False agrega el día como bloque='todos'
+    """
+    bloque = asistencia.bloque if por_bloque else literal('todos')
+
+    query = db.session.query(
+        asistencia.fecha,
+        Estudiante.id_seccion,
+        bloque,
+        Estudiante.genero,
+        func.count(asistencia.id_asistencia_estudiante),
+        func.sum(case((asistencia.presente == True, 1), else_=0)),
+        func.count(func.distinct(asistencia.id_estudiante))
+    ).join(
+        Estudiante, asistencia.id_estudiante == Estudiante.id_estudiante
+    ).filter(
+        Estudiante.activo == True,
+        *filtros
+    )
+
+    grupo = [asistencia.fecha, Estudiante.id_seccion, Estudiante.genero]
+    if por_bloque:
+        grupo.append(asistencia.bloque)
+
+    return query.group_by(*grupo).statement
+
+
+def _insertar_resumen(asistencia, filtros):
+    """Inserta las filas de resumen (por bloque y 'todos') que cumplen los filtros"""
+    tabla = ResumenAsistencia.__table__
+    for por_bloque in (True, False):
+        db.session.execute(
+            tabla.insert().from_select(COLUMNAS_RESUMEN, _select_resumen(asistencia, filtros, por_bloque))
+        )
+
+
+def _insertar_resumen_bitmap(id_seccion=None, fechas=None, fecha_inicio=None, fecha_fin=None):
+    """Equivalente de _insertar_resumen para el modo bitmap: agrega las marcas en Python"""
+    query = db.session.query(
+        Estudiante.id_estudiante, Estudiante.id_seccion, Estudiante.genero
+    ).filter(Estudiante.activo == True)
+    if id_seccion is not None:
+        query = query.filter(Estudiante.id_seccion == id_seccion)
+    estudiantes = {e.id_estudiante: (e.id_seccion, e.genero) for e in query.all()}
+
+    grupos = defaultdict(lambda: [0, 0, set()])
+    for marca in leer_marcas(fecha_inicio, fecha_fin, fechas=fechas, ids_estudiantes=estudiantes):
+        seccion, genero = estudiantes[marca.id_estudiante]
+        for bloque in (marca.bloque, 'todos'):
+            grupo = grupos[(marca.fecha, seccion, bloque, genero)]
+            grupo[0] += 1
+            grupo[1] += marca.presente
+            grupo[2].add(marca.id_estudiante)
+
+    filas = [
+        dict(zip(COLUMNAS_RESUMEN, (*clave, registros, presentes, len(ids))))
+        for clave, (registros, presentes, ids) in grupos.items()
+    ]
+    if filas:
+        db.session.execute(ResumenAsistencia.__table__.insert(), filas)
+
+
+def actualizar_resumen(id_seccion, fechas):
+    """
+    Recalcula el resumen de una sección para las fechas indicadas
+    Debe llamarse dentro de la misma transacción que modifica asistencia_estudiante
+
+    Args:
+        id_seccion: ID de la sección (sección actual de los estudiantes)
+        fechas: Iterable de fechas (date) a recalcular
+    """
+    fechas = list(set(fechas))
+    if not fechas:
+        return
+
+    # Asegurar que los cambios pendientes de la sesión son visibles para el INSERT ... SELECT
+    db.session.flush()
+
+    ResumenAsistencia.query.filter(
+        ResumenAsistencia.id_seccion == id_seccion,
+        ResumenAsistencia.fecha.in_(fechas)
+    ).delete(synchronize_session=False)
+
+    if modo_bitmap():
+        _insertar_resumen_bitmap(id_seccion=id_seccion, fechas=fechas)
+        return
+
+    asistencia = asistencia_para_rango(min(fechas), max(fechas))
+    _insertar_resumen(asistencia, [
+        Estudiante.id_seccion == id_seccion,
+        asistencia.fecha.in_(fechas)
+    ])
+
+
+def actualizar_resumen_secciones(fechas_por_seccion):
+    """
+    Recalcula el resumen para varias secciones
+
+    Args:
+        fechas_por_seccion: dict {id_seccion: iterable de fechas}
+    """
+    for id_seccion, fechas in fechas_por_seccion.items():
+        actualizar_resumen(id_seccion, fechas)
+
+
+def fechas_por_seccion_estudiantes(ids_estudiantes):
+    """
+    Obtiene las fechas con registros de asistencia de los estudiantes, agrupadas por su sección actual
+    Se usa antes y después de editar estudiantes (cambio de sección o de estado activo)
+
+    Returns:
+        dict {id_seccion: set de fechas}
+    """
+    ids_estudiantes = list(ids_estudiantes)
+    resultado = defaultdict(set)
+    if not ids_estudiantes:
+        return resultado
+
+    if modo_bitmap():
+        seccion_de = dict(db.session.query(Estudiante.id_estudiante, Estudiante.id_seccion).filter(
+            Estudiante.id_estudiante.in_(ids_estudiantes)
+        ).all())
+        for marca in leer_marcas(ids_estudiantes=seccion_de):
+            resultado[seccion_de[marca.id_estudiante]].add(marca.fecha)
+        return resultado
+
+    asistencia = asistencia_para_rango()
+    filas = db.session.query(
+        Estudiante.id_seccion,
+        asistencia.fecha
+    ).join(
+        asistencia, Estudiante.id_estudiante == asistencia.id_estudiante
+    ).filter(
+        Estudiante.id_estudiante.in_(ids_estudiantes)
+    ).distinct().all()
+
+    for id_seccion, fecha in filas:
+        resultado[id_seccion].add(fecha)
+
+    return resultado
+
+
+def reconstruir_resumen(fecha_inicio=None, fecha_fin=None):
+    """
+    Reconstruye el resumen completo (o un rango de fechas) desde asistencia_estudiante
+    (y su archivo, si el rango lo alcanza)
+    No hace commit; el llamador decide cuándo confirmar
+
+    Returns:
+        int: Número de filas de resumen generadas
+    """
+    db.session.flush()
+
+    asistencia = asistencia_para_rango(fecha_inicio, fecha_fin)
+    borrar = ResumenAsistencia.query
+    filtros = []
+    if fecha_inicio:
+        borrar = borrar.filter(ResumenAsistencia.fecha >= fecha_inicio)
+        filtros.append(asistencia.fecha >= fecha_inicio)
+    if fecha_fin:
+        borrar = borrar.filter(ResumenAsistencia.fecha <= fecha_fin)
+        filtros.append(asistencia.fecha <= fecha_fin)
+
+    borrar.delete(synchronize_session=False)
+    if modo_bitmap():
+        _insertar_resumen_bitmap(fecha_inicio=fecha_inicio, fecha_fin=fecha_fin)
+    else:
+        _insertar_resumen(asistencia, filtros)
+
+    contar = ResumenAsistencia.query
+    if fecha_inicio:
+        contar = contar.filter(ResumenAsistencia.fecha >= fecha_inicio)
+    if fecha_fin:
+        contar = contar.filter(ResumenAsistencia.fecha <= fecha_fin)
+    return contar.count()
+
+
+def actualizar_resumen_estudiantes(ids_estudiantes, secciones_anteriores=()):
+    """
+    Recalcula el resumen tras editar estudiantes (sección, género o estado activo)
+
+    Args:
+        ids_estudiantes: IDs de los estudiantes modificados
+        secciones_anteriores: Secciones a las que pertenecían antes del cambio
+    """
+    db.session.flush()
+
+    afectados = fechas_por_seccion_estudiantes(ids_estudiantes)
+    fechas = set().union(*afectados.values())
+    for id_seccion in secciones_anteriores:
+        afectados[id_seccion] |= fechas
+
+    actualizar_resumen_secciones(afectados)
@@ -0,0 +1,114 @@
+"""
+Script para verificar con EXPLAIN que las consultas de estadísticas y logs usan los índices de cobertura
+Ejecuta los endpoints como administrador, captura las consultas sobre asistencia_estudiante
+y comprueba que se resuelven solo con índices (sin leer las filas de la tabla).
+Ejecutar: python verificar_indices.py [fecha_inicio] [fecha_fin]
+
+Termina con código 1 si alguna consulta lee la tabla; usar tras aplicar
+migrations/add_covering_indexes_asistencia.sql o al cambiar las consultas.
+"""
+
+import re
+import sys
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import event
+
+from app import app, db
+from models import Usuario, Etapa, Seccion
+from utils.cache_estadisticas import obtener_cache
+from utils.almacen_asistencia import modo_bitmap
+
+# Tablas que deben leerse solo por índice (incluye el archivo de años escolares)
+TABLAS = re.compile(r'\basistencia_estudiante(?:_archivo)?\b')
+
+def _endpoints(fecha_inicio, fecha_fin):
+    """Endpoints cuyas consultas recorren asistencia_estudiante por rango de fechas"""
+    rango = f'fecha_inicio={fecha_inicio}&fecha_fin={fecha_fin}'
+    secciones = ','.join(str(s.id_seccion) for s in Seccion.query.all())
+    etapa = Etapa.query.first()
+    urls = [
+        f'/admin/estadisticas?{rango}&bloque=completo',
+        f'/api/logs_asistencia?{rango}',
+        f'/api/asistencia-individual/estadisticas?{rango}&secciones={secciones}',
+        f'/api/asistencia-individual/reporte-ausentismo?{rango}',
+        f'/api/asistencia-individual/reporte-ausentismo?{rango}&bloque=bloque_1',
+    ]
+    if etapa:
+        urls.append(f'/api/asistencia-individual/reporte-ausentismo?{rango}&etapa={etapa.nombre_etapa}')
+    return urls
+
+def _explicar(conexion, sentencia, parametros):
+    """
+    Plan de una consulta: lista de (tabla, detalle, usa_solo_indice)
+    MariaDB/MySQL: columna Extra con 'Using index'; SQLite: 'COVERING INDEX'
+    """
+    if conexion.dialect.name in ('mysql', 'mariadb'):
+        filas = conexion.exec_driver_sql(f'EXPLAIN {sentencia}', parametros).mappings().all()
+        return [
+            (f['table'], f"type={f['type']} key={f['key']} extra={f['Extra']}",
+             f['type'] != 'ALL' and 'Using index' in (f['Extra'] or '') and 'Using index condition' not in (f['Extra'] or ''))
+            for f in filas if f['table'] and TABLAS.fullmatch(f['table'])
+        ]
+
+    filas = conexion.exec_driver_sql(f'EXPLAIN QUERY PLAN {sentencia}', parametros).all()
+    planes = []
+    for fila in filas:
+        detalle = fila[-1]
+        tabla = TABLAS.search(detalle)
+        if tabla and detalle.startswith(('SCAN', 'SEARCH')):
+            planes.append((tabla.group(0), detalle, 'COVERING INDEX' in detalle))
+    return planes
+
+def verificar(fecha_inicio, fecha_fin):
+    """Devuelve True si todas las consultas capturadas usan solo índices"""
+    with app.app_context():
+        if modo_bitmap():
+            print("⚠️ ASISTENCIA_ALMACEN=bitmap: las estadísticas no leen asistencia_estudiante")
+            return True
+
+        admin = Usuario.query.filter_by(rol='administrador').first()
+        if not admin:
+            print("❌ No hay usuarios administradores para ejecutar los endpoints")
+            return False
+
+        capturadas = []
+
+        def capturar(conn, cursor, sentencia, parametros, context, executemany):
+            if sentencia.lstrip().upper().startswith('SELECT') and TABLAS.search(sentencia):
+                capturadas.append((url_actual[0], sentencia, parametros))
+
+        url_actual = [None]
+        cliente = app.test_client()
+        with cliente.session_transaction() as sesion:
+            sesion['_user_id'] = str(admin.id_usuario)
+            sesion['_fresh'] = True
+
+        event.listen(db.engine, 'before_cursor_execute', capturar)
+        try:
+            for url in _endpoints(fecha_inicio, fecha_fin):
+                obtener_cache().limpiar()
+                url_actual[0] = url
+                respuesta = cliente.get(url)
+                if respuesta.status_code != 200:
+                    print(f"⚠️ {url} respondió {respuesta.status_code}")
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', capturar)
+
+        print(f"🔍 {len(capturadas)} consultas sobre asistencia_estudiante ({fecha_inicio} a {fecha_fin})")
+        correcto = True
+        with db.engine.connect() as conexion:
+            for url, sentencia, parametros in capturadas:
+                for tabla, detalle, solo_indice in _explicar(conexion, sentencia, parametros):
+                    print(f"{'✅' if solo_indice else '❌'} {url}\n    {tabla}: {detalle}")
+                    correcto = correcto and solo_indice
+
+        print("✅ Todas las consultas usan índices de cobertura" if correcto else
+              "❌ Hay consultas que leen la tabla; revisar los índices de asistencia_estudiante")
+        return correcto
+
+if __name__ == '__main__':
+    fechas = [datetime.strptime(arg, '%Y-%m-%d').date() for arg in sys.argv[1:3]]
+    fecha_fin = fechas[1] if len(fechas) > 1 else date.today()
+    fecha_inicio = fechas[0] if fechas else fecha_fin - timedelta(days=30)
+    sys.exit(0 if verificar(fecha_inicio, fecha_fin) else 1)